@@ -1,8 +1,33 @@
+import difflib
+
 import javalang
 
 
 class ASTComparatorError(Exception):
-    pass
+    def __init__(self, message: str, mismatches: list = None):
+        super().__init__(message)
+        # Every mismatch found, when the trees were compared with collect
+        self.mismatches = mismatches or []
+
+
+class StructuralMismatch:
+    def __init__(self, position, description: str):
+        self.position = position
+        self.description = description
+
+    def __str__(self):
+        return self.description
+
+
+def format_mismatches(mismatches: [StructuralMismatch], limit=10) -> str:
+    """
+    Formats mismatches as a compact report, one per line, listing at most limit of them.
+    """
+    lines = [f'{len(mismatches)} structural mismatch{"es" if len(mismatches) != 1 else ""}:']
+    lines += [f'- {mismatch}' for mismatch in mismatches[:limit]]
+    if len(mismatches) > limit:
+        lines.append(f'- ... and {len(mismatches) - limit} more')
+    return '\n'.join(lines)
 
 
 class IdentifierDifference:
@@ -58,103 +83,423 @@ def check_identifier_diff_positions(identifier_diffs: [IdentifierDifference], so
                              f' "{source[start_index:end_index]}".)')
 
 
-def compare_ast(tree_1: javalang.ast.Node, tree_2: javalang.ast.Node, tree_1_source: str, system_testing=False) -> [IdentifierDifference]:
+def dimension_shape(dimensions: list) -> list:
+    """
+    Returns dimensions with the expressions of array creators replaced by their type names. The expressions are
+    nodes, which are compared by the tree walk, and which are never equal to nodes of another tree.
+    """
+    if not dimensions:
+        return dimensions
+    return [type(dimension).__name__ if isinstance(dimension, javalang.ast.Node) else dimension
+            for dimension in dimensions]
+
+
+class ComparisonPlan:
+    """
+    What compare_ast checks for one node type, worked out from its attrs.
+    """
+    def __init__(self, node_type: type):
+        attrs = set(node_type.attrs)
+        self.skip = issubclass(node_type, javalang.tree.SuperMethodInvocation)
+
+        # Attrs that must be equal, with the error raised when they are not, and a function to apply to their values
+        # before comparing them, if any
+        self.equal_attrs = []
+        if node_type is javalang.tree.Literal:
+            self.equal_attrs.append(('value', 'Literal values are not equivalent: {value_1} != {value_2}', None))
+        if node_type is javalang.tree.CatchClauseParameter:
+            self.equal_attrs.append(('types', 'Catch clause types are not equivalent: {value_1} != {value_2} @ '
+                                              '{position}', None))
+        if issubclass(node_type, (javalang.tree.BasicType, javalang.tree.PackageDeclaration)):
+            self.equal_attrs.append(('name', '{type_name} names are not equivalent: {value_1} != {value_2} @ '
+                                             '{position}', None))
+        if 'modifiers' in attrs:
+            self.equal_attrs.append(('modifiers', '{type_name} modifiers are not equivalent: {value_1} != '
+                                                  '{value_2} @ {position}', None))
+        if 'dimensions' in attrs:
+            self.equal_attrs.append(('dimensions', '{type_name} dimensions are not equivalent: {value_1} != '
+                                                   '{value_2} @ {position}', dimension_shape))
+        if 'static' in attrs:
+            self.equal_attrs.append(('static', '{type_name} static status is not equivalent @ {position}', None))
+
+        # Identifier slots, and dotted paths compared segment by segment
+        self.name = 'name' in attrs
+        self.member = 'member' in attrs
+        self.qualified_attrs = []
+        if 'qualifier' in attrs:
+            self.qualified_attrs.append('qualifier')
+        if issubclass(node_type, javalang.tree.Import):
+            self.qualified_attrs.append('path')
+
+
+def compile_plans() -> dict:
+    """
+    Builds the comparison plan of every node type in javalang.tree.
+    """
+    plans = {}
+    for value in vars(javalang.tree).values():
+        if isinstance(value, type) and issubclass(value, javalang.ast.Node):
+            plans[value] = ComparisonPlan(value)
+    return plans
+
+
+COMPARISON_PLANS = compile_plans()
+
+
+def compare_reference_sequence(node_1: javalang.ast.Node, seq_1: str, seq_2: str, position,
+                               identifier_diffs: [IdentifierDifference], system_testing: bool) -> None:
+    """
+    Compares two dotted paths segment by segment, adding renamed segments to identifier_diffs.
+    """
+    seg_1 = [i for i in seq_1.split('.') if len(i) > 0]
+    seg_2 = [i for i in seq_2.split('.') if len(i) > 0]
+    if len(seg_1) != len(seg_2):
+        raise ASTComparatorError(f'Qualifier segments lengths are not equivalent: "{seq_1}" != '
+                                 f'"{seq_2}" @ {position}')
+    running_offset = 0
+    for seg_1, seg_2 in zip(seg_1, seg_2):
+        if seg_1 != seg_2 or system_testing:
+            identifier_diffs.append(IdentifierDifference(type(node_1), seg_1, seg_2, node_1.position.line,
+                                                         node_1.position.column + running_offset))
+        running_offset += len(seg_1) + 1
+
+
+def compare_nodes(node_1: javalang.ast.Node, node_2: javalang.ast.Node, identifier_diffs: [IdentifierDifference],
+                  system_testing=False) -> None:
+    """
+    Compares two nodes, leaving out the nodes below them, adding their identifier changes to identifier_diffs.
+    Raises ASTComparatorError if the nodes are not structurally equivalent.
+    """
+    # Get position for error reporting purposes
+    position = node_1.position
+    node_type = type(node_1)
+
+    # Perform type check
+    if node_type is not type(node_2):
+        raise ASTComparatorError(f'Node types are not equivalent: {node_type.__name__} != '
+                                 f'{type(node_2).__name__} @ {position}')
+
+    plan = COMPARISON_PLANS.get(node_type)
+    if plan is None:
+        plan = COMPARISON_PLANS[node_type] = ComparisonPlan(node_type)
+
+    # Skip useless node types
+    if plan.skip:
+        return
+
+    for attr, message, normalize in plan.equal_attrs:
+        value_1 = getattr(node_1, attr)
+        value_2 = getattr(node_2, attr)
+        if normalize is not None:
+            value_1 = normalize(value_1)
+            value_2 = normalize(value_2)
+        if value_1 != value_2:
+            raise ASTComparatorError(message.format(type_name=node_type.__name__, value_1=value_1,
+                                                    value_2=value_2, position=position))
+
+    # Check for name attribute
+    if plan.name:
+        if node_1.name != node_2.name or system_testing:
+            if not position:
+                raise ValueError(f'Node position is not defined. Type: {node_type.__name__} Name: {node_1.name} @ {position}')
+            identifier_diffs.append(IdentifierDifference(node_type, node_1.name, node_2.name, position.line, position.column))
+
+    # Check for member attribute
+    if plan.member:
+        if not position:
+            raise ValueError(f'Node position is not defined. Type: {node_type.__name__} Name: {node_1.member} @ {position}')
+        if node_1.member != node_2.member or system_testing:
+            # Find out actual index
+            offset = 0
+            if plan.qualified_attrs and node_1.qualifier:
+                offset += len(node_1.qualifier) + 1
+            identifier_diffs.append(IdentifierDifference(node_type, node_1.member, node_2.member, position.line, position.column + offset))
+
+    # Check qualifiers and static import paths
+    for attr in plan.qualified_attrs:
+        seq_1 = getattr(node_1, attr)
+        seq_2 = getattr(node_2, attr)
+        if seq_1 != seq_2:
+            compare_reference_sequence(node_1, seq_1, seq_2, position, identifier_diffs, system_testing)
+
+
+def compare_ast(tree_1: javalang.ast.Node, tree_2: javalang.ast.Node, tree_1_source: str, system_testing=False,
+                collect=False) -> [IdentifierDifference]:
     """
     Compares two ASTs for structural equivalence.
     Returns a list containing changes between two ASTs.
-    Raises ASTComparatorError if the trees are not structurally equivalent.
+    Raises ASTComparatorError if the trees are not structurally equivalent, including when one has nodes the other
+    does not.
+    With collect, the whole trees are compared before raising, and the error lists every mismatch found. Either way the
+    same trees are equivalent.
     """
-    identifier_diffs = []
-    for (path_1, node_1), (path_2, node_2) in zip(tree_1, tree_2):
+    return compare_subtrees(tree_1, tree_2, tree_1_source, system_testing=system_testing, collect=collect)
 
-        # Get position for error reporting purposes
-        position = None
-        if hasattr(node_1, 'position'):
-            position = node_1.position
 
-        # Perform type check
-        if type(node_1) != type(node_2):
-            raise ASTComparatorError(f'Node types are not equivalent: {type(node_1).__name__} != '
-                                     f'{type(node_2).__name__} @ {position}')
+def child_nodes(node: javalang.ast.Node) -> [javalang.ast.Node]:
+    """
+    Returns the nodes directly below a node, in the order of a tree walk.
+    """
+    children = []
+    for value in node.children:
+        if isinstance(value, javalang.ast.Node):
+            children.append(value)
+        elif isinstance(value, (list, tuple)) and value:
+            # Lists may hold further lists
+            stack = [value]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, javalang.ast.Node):
+                    children.append(item)
+                elif isinstance(item, (list, tuple)):
+                    stack.extend(reversed(item))
+    return children
+
+
+def last_position(node: javalang.ast.Node):
+    """
+    Returns the last position found going down the last children of a node, which tells where its subtree ends.
+    """
+    position = node.position
+    while True:
+        children = child_nodes(node)
+        if not children:
+            return position
+        node = children[-1]
+        position = node.position or position
 
-        # Skip useless node types
-        if isinstance(node_1, javalang.tree.SuperMethodInvocation):
+
+def report_mismatch(mismatches: [StructuralMismatch], position, description: str) -> None:
+    """
+    Adds a mismatch to mismatches, or raises it as ASTComparatorError if mismatches are not collected.
+    """
+    if mismatches is None:
+        raise ASTComparatorError(description)
+    mismatches.append(StructuralMismatch(position, description))
+
+
+def pair_children(node_1: javalang.ast.Node, children_1: [javalang.ast.Node], children_2: [javalang.ast.Node],
+                  mismatches: [StructuralMismatch]) -> [(int, int)]:
+    """
+    Pairs up the indexes of the children of two nodes to compare.
+    If their numbers differ, the children are aligned by type, and the ones left over are reported.
+    """
+    if len(children_1) == len(children_2):
+        return list(zip(range(len(children_1)), range(len(children_2))))
+
+    report_mismatch(mismatches, node_1.position,
+                    f'{type(node_1).__name__} child counts are not equivalent: {len(children_1)} != '
+                    f'{len(children_2)} @ {node_1.position}')
+
+    pairs = []
+    matcher = difflib.SequenceMatcher(None, [type(child) for child in children_1],
+                                      [type(child) for child in children_2], autojunk=False)
+    for _, i_1, j_1, i_2, j_2 in matcher.get_opcodes():
+        paired = min(j_1 - i_1, j_2 - i_2)
+        pairs.extend(zip(range(i_1, i_1 + paired), range(i_2, i_2 + paired)))
+        for child in children_1[i_1 + paired:j_1]:
+            report_mismatch(mismatches, child.position, f'{type(child).__name__} is missing @ {child.position}')
+        for child in children_2[i_2 + paired:j_2]:
+            report_mismatch(mismatches, child.position,
+                            f'{type(child).__name__} was added @ {child.position} of the response')
+    return pairs
+
+
+def compare_subtrees(tree_1: javalang.ast.Node, tree_2: javalang.ast.Node, tree_1_source: str,
+                     lines_1: (int, int) = None, lines_2: (int, int) = None, system_testing=False,
+                     collect=False) -> [IdentifierDifference]:
+    """
+    Compares two ASTs by going down both trees together, pairing up the children of each pair of nodes, so nodes
+    missing from either tree are found.
+    With lines_1 and lines_2, only the subtrees that may overlap that segment are compared, as in compare_ast_segment.
+    With collect, mismatches do not stop the comparison. Nodes of different types are reported without comparing
+    what is below them, as are renamed nodes without a position, and ASTComparatorError is raised at the end with a
+    report of all mismatches.
+    """
+    if lines_1 is None:
+        start, end_1, shift = float('-inf'), float('inf'), 0
+    else:
+        start, end_1 = lines_1
+        if lines_2[0] != start:
+            raise ValueError(f'Segments start on different lines: {start} != {lines_2[0]}')
+        shift = lines_2[1] - end_1
+
+    identifier_diffs = []
+    mismatches = [] if collect else None
+    # Pairs of nodes to compare, with the lowest and highest line their subtrees can take up in the first source
+    stack = [(tree_1, tree_2, 0, float('inf'))]
+    while stack:
+        node_1, node_2, low, high = stack.pop()
+        try:
+            compare_nodes(node_1, node_2, identifier_diffs, system_testing)
+        except ASTComparatorError as e:
+            report_mismatch(mismatches, node_1.position, str(e))
+            if type(node_1) is not type(node_2):
+                continue
+        except ValueError as e:
+            # A renamed node without a position is reported along with the other mismatches
+            if mismatches is None:
+                raise
+            report_mismatch(mismatches, node_1.position, str(e))
+
+        children_1 = child_nodes(node_1)
+        children_2 = child_nodes(node_2)
+        pairs = pair_children(node_1, children_1, children_2, mismatches)
+
+        # Without a segment, every pair of children is compared
+        if lines_1 is None:
+            stack.extend((children_1[i], children_2[j], low, high) for i, j in reversed(pairs))
             continue
 
-        # Literal value check
-        if type(node_1) is javalang.tree.Literal:
-            if node_1.value != node_2.value:
-                raise ASTComparatorError(f'Literal values are not equivalent: {node_1.value} != {node_2.value}')
-
-        # Catch type check
-        if type(node_1) is javalang.tree.CatchClauseParameter:
-            if node_1.types != node_2.types:
-                raise ASTComparatorError(f'Catch clause types are not equivalent: {node_1.types} != {node_2.types} @ {position}')
-
-        # These are all the ones wit name attribute
-        if isinstance(node_1, (javalang.tree.BasicType,
-                               javalang.tree.PackageDeclaration)):
-            if node_1.name != node_2.name:
-                raise ASTComparatorError(f'{type(node_1).__name__} names are not equivalent: {node_1.name} != '
-                                         f'{node_2.name} @ {position}')
-
-        # Check nodes with modifier attributes
-        if hasattr(node_1, 'modifiers'):
-            if node_1.modifiers != node_2.modifiers:
-                raise ASTComparatorError(f'{type(node_1).__name__} modifiers are not equivalent: {node_1.modifiers} != '
-                                         f'{node_2.modifiers} @ {position}')
-
-        # # Check dimensions
-        if hasattr(node_1, 'dimensions'):
-            if node_1.dimensions != node_2.dimensions:
-                raise ASTComparatorError(f'{type(node_1).__name__} dimensions are not equivalent: {node_1.dimensions} !'
-                                         f'= {node_2.dimensions} @ {position}')
-
-        # Check static import status
-        if hasattr(node_1, 'static'):
-            if node_1.static != node_2.static:
-                raise ASTComparatorError(f'{type(node_1).__name__} static status is not equivalent @ {position}')
-
-        # Check for name attribute
-        if hasattr(node_1, 'name'):
-            if node_1.name != node_2.name or system_testing:
-                if not node_1.position:
-                    raise ValueError(f'Node position is not defined. Type: {type(node_1).__name__} Name: {node_1.name} @ {position}')
-                identifier_diffs.append(IdentifierDifference(type(node_1), node_1.name, node_2.name, node_1.position.line, node_1.position.column))
-
-        # Check for member attribute
-        if hasattr(node_1, 'member'):
-            if not node_1.position:
-                raise ValueError(f'Node position is not defined. Type: {type(node_1).__name__} Name: {node_1.member} @ {position}')
-            if node_1.member != node_2.member or system_testing:
-                # Find out actual index
-                offset = 0
-                if hasattr(node_1, 'qualifier') and node_1.qualifier:
-                    offset += len(node_1.qualifier) + 1
-                identifier_diffs.append(IdentifierDifference(type(node_1), node_1.member, node_2.member, node_1.position.line, node_1.position.column + offset))
-
-        def compare_reference_sequence(seq_1: str, seq_2: str, node_1_pos, error_message):
-            seg_1 = [i for i in seq_1.split('.') if len(i) > 0]
-            seg_2 = [i for i in seq_2.split('.') if len(i) > 0]
-            if len(seg_1) != len(seg_2):
-                raise ASTComparatorError(f'Qualifier segments lengths are not equivalent: "{node_1.qualifier}" != '
-                                         f'"{node_2.qualifier}" @ {position}')
-            running_offset = 0
-            for seg_1, seg_2 in zip(seg_1, seg_2):
-                if seg_1 != seg_2 or system_testing:
-                    identifier_diffs.append(IdentifierDifference(type(node_1), seg_1, seg_2, node_1_pos.line, node_1_pos.column + running_offset))
-                running_offset += len(seg_1) + 1
-
-        # Check for qualifier attribute
-        if hasattr(node_1, 'qualifier'):
-            if node_1.qualifier != node_2.qualifier:
-                compare_reference_sequence(node_1.qualifier, node_2.qualifier, node_1.position, "Qualifier segments lengths are not equivalent @ {position}")
-
-        # Check for static import path
-        if isinstance(node_1, javalang.tree.Import):
-            if node_1.path != node_2.path:
-                compare_reference_sequence(node_1.path, node_2.path, node_1.position,"Import segments lengths are not equivalent @ {position}")
+        # Sibling subtrees do not overlap, so a subtree starts after the position of the previous positioned sibling in
+        # the source and ends before the position of the next one. Children are not kept in source order.
+        bounds = [(low, high)] * len(children_1)
+        positioned = sorted((child.position, i) for i, child in enumerate(children_1) if child.position)
+        for k, (position, i) in enumerate(positioned):
+            bounds[i] = (positioned[k - 1][0].line if k > 0 else low,
+                         positioned[k + 1][0].line if k + 1 < len(positioned) else high)
+
+        # Subtrees outside of the segment are ordered and start in the same place in both trees, so only the ones
+        # next to the segment could have taken in code from it, and need their ends checked as well
+        adjacent = set()
+        for k, (position, i) in enumerate(positioned):
+            if bounds[i][1] < start and (k + 1 == len(positioned) or bounds[positioned[k + 1][1]][1] >= start):
+                adjacent.add(i)
+            if bounds[i][0] >= end_1 and (k == 0 or bounds[positioned[k - 1][1]][0] < end_1):
+                adjacent.add(i)
+
+        overlapping = []
+        for i, j in pairs:
+            child_1 = children_1[i]
+            child_2 = children_2[j]
+            child_low, child_high = bounds[i]
+            if child_high < start or child_low >= end_1:
+                expected = (child_1.position, last_position(child_1) if i in adjacent else None)
+                if child_low >= end_1:
+                    expected = tuple(position._replace(line=position.line + shift) if position else None
+                                     for position in expected)
+                found = (child_2.position, last_position(child_2) if i in adjacent else None)
+                if type(child_1) is not type(child_2) or found != expected:
+                    report_mismatch(mismatches, child_1.position,
+                                    f'Nodes outside of the segment are not equivalent: '
+                                    f'{type(child_1).__name__} @ {child_1.position} != '
+                                    f'{type(child_2).__name__} @ {child_2.position}')
+            else:
+                overlapping.append((child_1, child_2, child_low, child_high))
+
+        # Compare in pre-order, so identifier changes come in the order of compare_ast
+        stack.extend(reversed(overlapping))
+
+    if mismatches:
+        raise ASTComparatorError(format_mismatches(mismatches), mismatches)
 
     check_identifier_diff_positions(identifier_diffs, tree_1_source)
     return identifier_diffs
 
+
+def compare_ast_segment(tree_1: javalang.ast.Node, tree_2: javalang.ast.Node, tree_1_source: str,
+                        lines_1: (int, int), lines_2: (int, int), system_testing=False,
+                        collect=False) -> [IdentifierDifference]:
+    """
+    Compares two ASTs whose sources only differ in one segment, like compare_ast.
+    lines_1 and lines_2 are the (first, end) lines of the segment in each source, counted from 1 with end excluded,
+    so lines after the segment are shifted by the difference of the ends.
+    Only the nodes whose subtree may overlap the segment are compared. For subtrees outside of it, it is only checked
+    that both trees have them, with the same node type and (shifted) first and last positions, so identifier changes are only
+    reported for the subtrees that may overlap the segment, even with system_testing.
+    Raises ASTComparatorError if the trees are not structurally equivalent.
+    With collect, the segment is compared in full before raising, and the error lists every mismatch found.
+    """
+    return compare_subtrees(tree_1, tree_2, tree_1_source, lines_1, lines_2, system_testing, collect)
+
+
+IDENTIFIER_KIND = javalang.tokenizer.TOKEN_KINDS[javalang.tokenizer.Identifier]
+MODIFIER_KIND = javalang.tokenizer.TOKEN_KINDS[javalang.tokenizer.Modifier]
+
+
+def token_text(tokens: javalang.tokenizer.TokenArray, start: int, end: int, limit=40) -> str:
+    """
+    Returns the values of a run of tokens, shortened to about limit characters.
+    """
+    text = ' '.join(tokens.values[start:end])
+    if len(text) > limit:
+        text = text[:limit] + ' ...'
+    return f'"{text}"'
+
+
+def token_keys(tokens: javalang.tokenizer.TokenArray) -> list:
+    """
+    Returns what has to be equal for tokens to match. Identifiers match each other whatever their names, except in
+    package declarations, which compare_ast requires to be the same, and other tokens only match equal tokens.
+    Modifiers are compared as sets by compare_ast, so each run of modifiers is sorted.
+    """
+    keys = []
+    in_package = False
+    modifiers_start = None
+    for kind, value in zip(tokens.kinds, tokens.values):
+        if kind == MODIFIER_KIND:
+            if modifiers_start is None:
+                modifiers_start = len(keys)
+        elif modifiers_start is not None:
+            keys[modifiers_start:] = sorted(keys[modifiers_start:])
+            modifiers_start = None
+
+        if kind == IDENTIFIER_KIND and not in_package:
+            keys.append(kind)
+        else:
+            keys.append((kind, value))
+            if value == 'package' or value == ';':
+                in_package = value == 'package'
+    if modifiers_start is not None:
+        keys[modifiers_start:] = sorted(keys[modifiers_start:])
+    return keys
+
+
+def compare_tokens(segment_1: str, segment_2: str, first_line=1, collect=False) -> [IdentifierDifference]:
+    """
+    Checks that two versions of a segment only differ in identifiers by aligning their tokens, which is much cheaper
+    than parsing and comparing their ASTs, and catches most structural changes.
+    Unlike compare_ast, it also requires operators and redundant parentheses to be the same, so segments it rejects
+    may still have equivalent trees.
+    Returns the identifier changes of the alignment, with the token type as node type, positioned for a source in
+    which the segment starts on first_line.
+    Raises ASTComparatorError if any other token differs, and the errors of the tokenizer, such as
+    javalang.tokenizer.LexerError, if a segment cannot be tokenized. With collect, the error lists every difference.
+    """
+    tokens_1 = javalang.tokenizer.tokenize_array(segment_1)
+    tokens_2 = javalang.tokenizer.tokenize_array(segment_2)
+
+    keys_1 = token_keys(tokens_1)
+    keys_2 = token_keys(tokens_2)
+
+    def position(tokens, index):
+        # Differences at the end are reported at the last token
+        index = min(index, len(tokens) - 1)
+        if index < 0:
+            return javalang.tokenizer.Position(first_line, 1)
+        line, column = tokens.position(index)
+        return javalang.tokenizer.Position(line + first_line - 1, column)
+
+    if keys_1 != keys_2:
+        mismatches = [] if collect else None
+        matcher = difflib.SequenceMatcher(None, keys_1, keys_2, autojunk=False)
+        for tag, i_1, j_1, i_2, j_2 in matcher.get_opcodes():
+            if tag == 'replace':
+                report_mismatch(mismatches, position(tokens_1, i_1),
+                                f'{token_text(tokens_1, i_1, j_1)} was changed to {token_text(tokens_2, i_2, j_2)} @ '
+                                f'{position(tokens_1, i_1)}')
+            elif tag == 'delete':
+                report_mismatch(mismatches, position(tokens_1, i_1),
+                                f'{token_text(tokens_1, i_1, j_1)} is missing @ {position(tokens_1, i_1)}')
+            elif tag == 'insert':
+                report_mismatch(mismatches, position(tokens_1, i_1),
+                                f'{token_text(tokens_2, i_2, j_2)} was added @ {position(tokens_2, i_2)} of the '
+                                f'response')
+        raise ASTComparatorError(format_mismatches(mismatches), mismatches)
+
+    identifier_diffs = []
+    for i, (key, name_1, name_2) in enumerate(zip(keys_1, tokens_1.values, tokens_2.values)):
+        if key == IDENTIFIER_KIND and name_1 != name_2:
+            line, column = position(tokens_1, i)
+            identifier_diffs.append(IdentifierDifference(javalang.tokenizer.Identifier, name_1, name_2, line, column))
+    return identifier_diffs
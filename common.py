@@ -12,3 +12,5 @@ color_5 = (0, 0, 0)
 refactoring_directory = ""
 sampling_ratio = 1
 API_KEY = ""
+# Directory to keep parse trees in across runs, or empty to only keep them in memory
+parse_cache_directory = ""
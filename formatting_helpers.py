@@ -1,3 +1,5 @@
+import bisect
+import itertools
 import math
 import re
 import javalang
@@ -12,30 +14,184 @@ class BalanceType:
     UNCLOSED = 0
     UNINITIATED = 1
 
+# Braces, and the starts of comments and literals, in which braces are skipped
+BRACE_PATTERN = re.compile(r'[{}]|//|/\*|"""|"|\'')
+STRING_END_PATTERN = re.compile(r'(?:[^"\\\n]|\\.)*"?')
+CHAR_END_PATTERN = re.compile(r"(?:[^'\\\n]|\\.)*'?")
+TEXT_BLOCK_END_PATTERN = re.compile(r'(?:[^\\]|\\.)*?"""', re.DOTALL)
+# Characters that may follow the first unbalanced closing brace of a suitable segment
+CLOSING_CHARS = ' }();'
+
+
+class BraceIndex:
+    """
+    Brace depths of the lines of a source, from one scan of it, to check the balance of any range of its lines in constant
+    time. Braces in comments and in string, text block and character literals are skipped.
+    Ranges are read in the context of the whole source, so a range starting inside a comment skips the rest of it.
+    """
+
+    def __init__(self, source_lines: [str]):
+        self.source_lines = source_lines
+        line_count = len(source_lines)
+        source = '\n'.join(source_lines)
+        line_starts = list(itertools.accumulate((len(line) + 1 for line in source_lines), initial=0))
+
+        # Brace depth at the start of each line and at the end of the source, and the lowest depth reached in each line
+        self.depths = [0] * (line_count + 1)
+        self.min_depths = [0] * line_count
+        # Line -> (column, depth after, whether opening) of its braces
+        self.braces = {}
+
+        depth = 0
+        line = 0
+        pos = 0
+        while True:
+            match = BRACE_PATTERN.search(source, pos)
+            if match is None:
+                break
+            i = match.start()
+            while line + 1 < line_count and line_starts[line + 1] <= i:
+                line += 1
+                self.depths[line] = self.min_depths[line] = depth
+
+            token = match.group()
+            if token == '{' or token == '}':
+                depth += 1 if token == '{' else -1
+                self.min_depths[line] = min(self.min_depths[line], depth)
+                self.braces.setdefault(line, []).append((i - line_starts[line], depth, token == '{'))
+                pos = i + 1
+                continue
+
+            # Skip the comment or literal
+            if token == '//':
+                end = source.find('\n', i)
+                pos = len(source) if end == -1 else end
+            elif token == '/*':
+                end = source.find('*/', i + 2)
+                pos = len(source) if end == -1 else end + 2
+            elif token == '"""':
+                end = TEXT_BLOCK_END_PATTERN.match(source, i + 3)
+                pos = len(source) if end is None else end.end()
+            elif token == '"':
+                pos = STRING_END_PATTERN.match(source, i + 1).end()
+            else:
+                pos = CHAR_END_PATTERN.match(source, i + 1).end()
+
+        while line + 1 < line_count:
+            line += 1
+            self.depths[line] = self.min_depths[line] = depth
+        self.depths[line_count] = depth
+
+        # Opening braces, counted before each line
+        self.opening_counts = [0] * (line_count + 1)
+        for i in range(line_count):
+            self.opening_counts[i + 1] = self.opening_counts[i] + sum(
+                1 for _, _, opening in self.braces.get(i, ()) if opening)
+
+        # Lines with characters other than CLOSING_CHARS, counted before each line
+        self.unclosing_counts = list(itertools.accumulate(
+            (1 if line.strip(CLOSING_CHARS) else 0 for line in source_lines), initial=0))
+
+        # The first line at or after each line that goes below the depth at its start, found with a stack of the
+        # lines that go lower than all lines before them
+        self.next_below = [line_count] * line_count
+        stack_lines = []
+        stack_depths = []
+        for line in reversed(range(line_count)):
+            while stack_depths and stack_depths[-1] >= self.min_depths[line]:
+                stack_lines.pop()
+                stack_depths.pop()
+            stack_lines.append(line)
+            stack_depths.append(self.min_depths[line])
+            i = bisect.bisect_left(stack_depths, self.depths[line]) - 1
+            if i >= 0:
+                self.next_below[line] = stack_lines[i]
+
+    @classmethod
+    def from_source(cls, s: str) -> 'BraceIndex':
+        return cls(s.split('\n'))
+
+    def first_unbalanced_closing_brace(self, start_line: int, end_line: int) -> (int, int):
+        """
+        Finds the (line, column) of the first closing brace in lines [start_line, end_line) without an opening brace
+        before it in the range, or None.
+        """
+        if start_line >= end_line:
+            return None
+        line = self.next_below[start_line]
+        if line >= end_line:
+            return None
+        depth = self.depths[start_line] - 1
+        column = next(column for column, depth_after, _ in self.braces[line] if depth_after == depth)
+        return line, column
+
+    def balance(self, start_line: int, end_line: int) -> (BalanceType, int):
+        """
+        Gets the balance type of lines [start_line, end_line) and the number of braces to add or remove, as
+        balance_source does, or None if they are balanced.
+        """
+        if start_line >= end_line:
+            return None
+        position = self.first_unbalanced_closing_brace(start_line, end_line)
+        brace_change = self.depths[end_line] - self.depths[start_line]
+        if position is None:
+            if brace_change == 0:
+                return None
+            return BalanceType.UNCLOSED, brace_change
+
+        # No opening brace may follow an unbalanced closing brace
+        line, column = position
+        opening_count = self.opening_counts[end_line] - self.opening_counts[line + 1]
+        opening_count += sum(1 for c, _, opening in self.braces[line] if opening and c > column)
+        if opening_count > 0:
+            raise SubstringBalancingError('Format Error')
+        return BalanceType.UNINITIATED, -brace_change
+
+    def is_suitable_segment(self, start_line: int, end_line: int) -> bool:
+        """
+        Checks if lines [start_line, end_line) are suitable as a segment, as is_suitable_segment_after_cut does.
+        Unsuitable closing characters include opening braces, so segments that fail balancing are never suitable.
+        """
+        position = self.first_unbalanced_closing_brace(start_line, end_line)
+        # Balanced or unclosed
+        if position is None:
+            return True
+        # Uninitiated, only closing characters may follow the first unbalanced closing brace
+        line, column = position
+        if self.source_lines[line][column:].strip(CLOSING_CHARS):
+            return False
+        return self.unclosing_counts[end_line] == self.unclosing_counts[line + 1]
+
+
+def get_offset(source_lines: [str], start_line: int, line: int, column: int) -> int:
+    """Gets the offset of a (line, column) position in the text of the lines from start_line"""
+    return sum(len(source_line) + 1 for source_line in source_lines[start_line:line]) + column
+
+
 def find_first_unbalanced_closing_brace(s: str) -> int:
     """Helper function to find the first unbalanced closing brace in a string."""
-    stack = []
-    i = 0
-    while i < len(s):
-        c = s[i]
-        # Check for the start of a Javadoc comment
-        if c == '/' and i + 2 < len(s) and s[i + 1] == '*' and s[i + 2] == '*':
-            # Skip until the end of the Javadoc comment
-            i += 3
-            while i + 1 < len(s) and not (s[i] == '*' and s[i + 1] == '/'):
-                i += 1
-            i += 2  # Skip past the '*/'
-            continue
+    brace_index = BraceIndex.from_source(s)
+    position = brace_index.first_unbalanced_closing_brace(0, len(brace_index.source_lines))
+    if position is None:
+        raise SubstringBalancingError('Unable to find unbalanced closing brace')
+    return get_offset(brace_index.source_lines, 0, *position)
 
-        if c == '{':
-            stack.append(i)
-        elif c == '}':
-            if len(stack) == 0:
-                return i
-            stack.pop()
-        i += 1
 
-    raise SubstringBalancingError('Unable to find unbalanced closing brace')
+def balance_lines(brace_index: BraceIndex, start_line: int, end_line: int, s: str) -> (BalanceType, int, str):
+    """
+    Balances lines [start_line, end_line) of an indexed source, given as s, as balance_source does.
+    """
+    balance_result = brace_index.balance(start_line, end_line)
+    if balance_result is None:
+        return None
+    balance_type, brace_count = balance_result
+    # Unclosed string
+    if balance_type == BalanceType.UNCLOSED:
+        return balance_type, brace_count, s + '}' * brace_count
+    # Uninitiated string
+    end_position = get_offset(brace_index.source_lines, start_line,
+                              *brace_index.first_unbalanced_closing_brace(start_line, end_line))
+    return balance_type, brace_count, s[:end_position]
 
 
 def balance_source(s: str) -> (BalanceType, (int, int), str):
@@ -45,74 +201,18 @@ def balance_source(s: str) -> (BalanceType, (int, int), str):
     If unclosed braces: returns the number of added braces.
     If uninitiated braces: returns the number of removed braces.
     """
-    stack = []
-    i = 0
-    while i < len(s):
-        c = s[i]
-
-        # Check for the start of a Javadoc comment
-        if c == '/' and i + 2 < len(s) and s[i + 1] == '*' and s[i + 2] == '*':
-            # Skip until the end of the Javadoc comment
-            i += 3
-            while i + 1 < len(s) and not (s[i] == '*' and s[i + 1] == '/'):
-                i += 1
-            i += 2  # Skip past the '*/'
-            continue
-
-        if c == '{':
-            if len(stack) > 0 and stack[-1] == '}':
-                raise SubstringBalancingError('Format Error')
-            stack.append(c)
-        elif c == '}':
-            if len(stack) > 0 and stack[-1] == '{':
-                stack.pop()
-            else:
-                stack.append(c)
-
-        i += 1
-
-    # If the stack is empty, the string is balanced
-    if len(stack) == 0:
-        return None
-    # Determine balance type
-    stack_length = len(stack)
-    # Unclosed string
-    if stack[0] == '{':
-        result_string = s + ''.join(['}' for _ in range(stack_length)])
-        return BalanceType.UNCLOSED, stack_length, result_string
-    # Uninitiated string
-    else:
-        end_position = find_first_unbalanced_closing_brace(s)
-        result_string = s[:end_position]
-        return BalanceType.UNINITIATED, stack_length, result_string
+    brace_index = BraceIndex.from_source(s)
+    return balance_lines(brace_index, 0, len(brace_index.source_lines), s)
 
 
 def is_suitable_segment_after_cut(s: str) -> bool:
     """
     Checks if a segment is suitable after cutting.
+    Balanced and unclosed segments are suitable, uninitiated ones if only braces, parentheses, semicolons and
+    whitespace follow the first unbalanced closing brace.
     """
-    # First, try to balance the segment
-    try:
-        balance_result = balance_source(s)
-    except SubstringBalancingError:
-        # If balancing fails, this is automatically a fail
-        return False
-    # If the segment is balanced is it suitable
-    if balance_result is None:
-        return True
-    # If the segment is unclosed, it is suitable
-    balance_type, brace_count, result_string = balance_result
-    if balance_type == BalanceType.UNCLOSED:
-        return True
-    # Find the removed braces
-    removed_length = len(s) - len(result_string)
-    removed_string = s[-removed_length:]
-    # If the removed string contains anything other than whitespace, braces, or newlines, it is not suitable
-    allowed_chars = set([' ', '\n', '{', '}', '(', ')', ';'])
-    for c in removed_string:
-        if c not in allowed_chars:
-            return False
-    return True
+    brace_index = BraceIndex.from_source(s)
+    return brace_index.is_suitable_segment(0, len(brace_index.source_lines))
 
 
 def remove_ending_braces(s: str, num_braces: int) -> str:
@@ -1,8 +1,8 @@
 import javalang
 
 from intelij_helpers import *
-from ast_comparator import compare_ast, ASTComparatorError
-from segmentation_helpers import temp_replace_segment
+from ast_comparator import compare_ast_segment, ASTComparatorError
+from segmentation_helpers import SegmentMap, LabelError
 from formatting_helpers import get_tab_replaced_source
 import common
 
@@ -15,9 +15,11 @@ class IntelijRefactorError(Exception):
     pass
 
 
-def refactor_changed_identifiers(source_path_index: int, segment_index: int, segment: str, debug=True):
+def refactor_changed_identifiers(source_path_index: int, segment_map: SegmentMap, segment_index: int, segment: str,
+                                 debug=True):
     """
     Refactors changed identifiers in a segment.
+    The segment map is kept up to date with the renames, which IntelliJ makes in the file on disk.
     """
 
     prior_identifier_change = None
@@ -39,14 +41,19 @@ def refactor_changed_identifiers(source_path_index: int, segment_index: int, seg
         # Load current source
         source_path = common.file_manager.get_file_path(source_path_index)
         # Replace tab
-        curr_source = get_tab_replaced_source(open(source_path, "r").read())
+        try:
+            segment_map.update(get_tab_replaced_source(open(source_path, "r").read()))
+        except LabelError as e:
+            raise GlobalRefactorError(f'Failed to reload source: {e}')
+        curr_source = segment_map.source
 
         # Create temp source with the new segment
-        temp_source = temp_replace_segment(curr_source, segment_index, segment)
+        temp_source = segment_map.replaced_source(segment_index, segment)
 
         # Parse both sources
         try:
-            curr_tree = javalang.parse.parse(curr_source)
+            # The source only changes when identifiers were renamed, so the tree is usually cached
+            curr_tree = javalang.cache.parse(curr_source)
         except javalang.parser.JavaSyntaxError as e:
             print(f'Current source:\n{curr_source}')
             print(f'Temporary source:\n{temp_source}')
@@ -61,7 +68,10 @@ def refactor_changed_identifiers(source_path_index: int, segment_index: int, seg
 
         # Find changed identifiers
         try:
-            identifier_changes = compare_ast(curr_tree, temp_tree, curr_source)
+            # Only the segment changed, so only its subtrees are compared
+            identifier_changes = compare_ast_segment(curr_tree, temp_tree, curr_source,
+                                                     segment_map.line_range(segment_index),
+                                                     segment_map.line_range(segment_index, segment))
         except ASTComparatorError as e:
             print(f'Current source:\n{curr_source}')
             print(f'Temporary source:\n{temp_source}')
@@ -3,6 +3,7 @@ from . import parser
 from . import parse
 from . import tokenizer
 from . import javadoc
+from . import cache
 
 
 __version__ = "0.13.0"
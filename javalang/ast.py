@@ -1,8 +1,39 @@
+import bisect
+import keyword
 import pickle
+import re
 
 import six
 
 
+INIT_TEMPLATE = """def __init__(self, %(parameters)s**extraneous):
+    if extraneous:
+        raise ValueError('Extraneous arguments')
+%(assignments)s    self._position = None
+"""
+
+
+def make_init(attrs):
+    """ returns an __init__ that assigns each of attrs from a keyword
+        argument defaulting to None, like Node.__init__ but without looping
+        over a kwargs dict for every node the parser builds.
+    """
+
+    identifiers = all(isinstance(attr, str) and not keyword.iskeyword(attr)
+                      and re.match(r'^[A-Za-z_]\w*$', attr)
+                      for attr in attrs)
+    if not identifiers or len(set(attrs)) != len(attrs):
+        return None
+
+    namespace = dict()
+    source = INIT_TEMPLATE % {
+        'parameters': ''.join('%s=None, ' % (attr,) for attr in attrs),
+        'assignments': ''.join('    self.%s = %s\n' % (attr, attr)
+                               for attr in attrs)}
+    exec(source, namespace)
+    return namespace['__init__']
+
+
 class MetaNode(type):
     def __new__(mcs, name, bases, dict):
         attrs = list(dict['attrs'])
@@ -14,12 +45,39 @@ class MetaNode(type):
 
         dict['attrs'].extend(attrs)
 
-        return type.__new__(mcs, name, bases, dict)
+        # Nodes are small and numerous, so give each class __slots__ for its
+        # attrs instead of a per instance __dict__. Abstract mixins that are
+        # combined through multiple inheritance declare empty __slots__ so
+        # that their layouts do not conflict.
+        if '__slots__' not in dict:
+            inherited = set()
+            for base in bases:
+                inherited.update(getattr(base, 'slots', ()))
+            dict['__slots__'] = tuple(attr for attr in dict['attrs']
+                                      if attr not in inherited)
+
+        if '__init__' not in dict:
+            init = make_init(dict['attrs'])
+            if init is not None:
+                dict['__init__'] = init
+
+        cls = type.__new__(mcs, name, bases, dict)
+
+        slots = list()
+        for klass in reversed(cls.__mro__):
+            for slot in klass.__dict__.get('__slots__', ()):
+                if slot not in slots:
+                    slots.append(slot)
+        cls.slots = tuple(slots)
+
+        return cls
 
 
 @six.add_metaclass(MetaNode)
 class Node(object):
     attrs = ()
+    __slots__ = ('_position', '_modifier_position', '_parent', '_depth',
+                 '_enclosing_declaration')
 
     def __init__(self, **kwargs):
         values = kwargs.copy()
@@ -31,6 +89,16 @@ class Node(object):
         if values:
             raise ValueError('Extraneous arguments')
 
+        self._position = None
+
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.slots
+                    if hasattr(self, slot))
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
     def __equals__(self, other):
         if type(other) is not type(self):
             return False
@@ -62,22 +130,204 @@ class Node(object):
     
     @property
     def position(self):
-        if hasattr(self, "_position"):
-            return self._position
+        return self._position
+
+    # parent, depth and enclosing_declaration are only known for trees that
+    # went through link_parents, and are None otherwise
+
+    @property
+    def parent(self):
+        return getattr(self, '_parent', None)
+
+    @property
+    def depth(self):
+        return getattr(self, '_depth', None)
+
+    @property
+    def enclosing_declaration(self):
+        return getattr(self, '_enclosing_declaration', None)
 
 def walk_tree(root):
-    children = None
-
-    if isinstance(root, Node):
-        yield (), root
-        children = root.children
-    else:
-        children = root
-
-    for child in children:
-        if isinstance(child, (Node, list, tuple)):
-            for path, node in walk_tree(child):
-                yield (root,) + path, node
+    """ yields (path, node) for root and every node below it, in pre-order.
+        The path holds the nodes and lists enclosing the node, outermost
+        first. The walk uses an explicit stack, so deep trees do not hit the
+        recursion limit.
+    """
+
+    stack = [((), root)]
+    while stack:
+        path, item = stack.pop()
+
+        if isinstance(item, Node):
+            yield path, item
+            children = item.children
+        else:
+            children = item
+
+        path = path + (item,)
+        for child in reversed(children):
+            if isinstance(child, (Node, list, tuple)):
+                stack.append((path, child))
+
+def walk_nodes(root):
+    """ yields the nodes of walk_tree without building their paths. """
+
+    stack = [root]
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, Node):
+            yield item
+            children = item.children
+        else:
+            children = item
+
+        for child in reversed(children):
+            if isinstance(child, (Node, list, tuple)):
+                stack.append(child)
+
+def walk_parents(root):
+    """ yields (parent, depth, node) in the order of walk_tree, where parent
+        is the closest enclosing node (None for the outermost nodes) and
+        depth the number of enclosing nodes.
+    """
+
+    stack = [(None, 0, root)]
+    while stack:
+        parent, depth, item = stack.pop()
+
+        if isinstance(item, Node):
+            yield parent, depth, item
+            children = item.children
+            parent = item
+            depth += 1
+        else:
+            children = item
+
+        for child in reversed(children):
+            if isinstance(child, (Node, list, tuple)):
+                stack.append((parent, depth, child))
+
+def link_parents(root, declaration_types=()):
+    """ records on every node below root its parent, depth and the nearest
+        enclosing node that is an instance of declaration_types, as yielded
+        for it by walk_parents.
+    """
+
+    stack = [(None, 0, None, root)]
+    while stack:
+        parent, depth, declaration, item = stack.pop()
+
+        if isinstance(item, Node):
+            item._parent = parent
+            item._depth = depth
+            item._enclosing_declaration = declaration
+
+            children = item.children
+            parent = item
+            depth += 1
+            if isinstance(item, declaration_types):
+                declaration = item
+        else:
+            children = item
+
+        for child in children:
+            if isinstance(child, (Node, list, tuple)):
+                stack.append((parent, depth, declaration, child))
+
+def walk_pair(tree_1, tree_2):
+    """ walks two trees in lockstep, yielding (node_1, node_2) for the nodes
+        at the same place in the pre-order of each tree. Like zipping two
+        walk_tree iterators, the walk stops at the end of the shorter tree.
+    """
+
+    stack_1 = [tree_1]
+    stack_2 = [tree_2]
+    while True:
+        node_1 = next_node(stack_1)
+        node_2 = next_node(stack_2)
+        if node_1 is None or node_2 is None:
+            return
+        yield node_1, node_2
+
+def next_node(stack):
+    """ pops and returns the next node of a pre-order walk over stack,
+        pushing its children, or returns None once the walk is finished.
+    """
+
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, Node):
+            children = item.children
+        else:
+            children = item
+
+        for child in reversed(children):
+            if isinstance(child, (Node, list, tuple)):
+                stack.append(child)
+
+        if isinstance(item, Node):
+            return item
+
+    return None
+
+class NodeIndex(object):
+    """ The nodes of a tree by type. Nodes of a type are listed in the order
+    of walk_tree, and can be looked up by position with between(). The index
+    reflects the tree when it was built and is not updated when the tree
+    changes.
+
+    """
+
+    def __init__(self, root):
+        self.nodes = list(walk_nodes(root))
+
+        # Positions in self.nodes of the nodes of each exact type
+        self.types = dict()
+        for i, node in enumerate(self.nodes):
+            self.types.setdefault(type(node), list()).append(i)
+
+        self.found = dict()
+        self.sorted = dict()
+
+    def find(self, node_type):
+        """ returns the nodes that are instances of node_type, which may be a
+            class or a tuple of classes, in the order of walk_tree.
+        """
+
+        found = self.found.get(node_type)
+        if found is None:
+            matches = [indexes for exact_type, indexes in self.types.items()
+                       if issubclass(exact_type, node_type)]
+            if len(matches) == 1:
+                indexes = matches[0]
+            else:
+                indexes = sorted(i for indexes in matches for i in indexes)
+            found = self.found[node_type] = [self.nodes[i] for i in indexes]
+
+        return list(found)
+
+    def between(self, node_type, start, end):
+        """ returns the nodes that are instances of node_type and have a
+            position from start up to but excluding end, in position order.
+            start and end are (line, column) tuples, so lines 120 to 150 are
+            between(node_type, (120, 0), (151, 0)).
+        """
+
+        positions, nodes = self.sorted.get(node_type, (None, None))
+        if positions is None:
+            found = [(node.position, i, node) for i, node
+                     in enumerate(self.find(node_type))
+                     if node.position is not None]
+            found.sort()
+            positions = [position for position, _, _ in found]
+            nodes = [node for _, _, node in found]
+            self.sorted[node_type] = positions, nodes
+
+        first = bisect.bisect_left(positions, tuple(start))
+        last = bisect.bisect_left(positions, tuple(end))
+        return nodes[first:last]
 
 def dump(ast, file):
     pickle.dump(ast, file)
@@ -0,0 +1,188 @@
+""" A cache of parse trees, keyed by the source they were parsed from.
+
+ParseCache.parse() returns the same CompilationUnit for the same source text
+and options, keeping the most recently used trees in memory and, if it is
+given a directory, all of them on disk as pickles, so that a later run over
+unchanged files does not parse them again. A tree parsed with parents also
+serves lookups without them. Sources that fail to parse are
+remembered as well, and parsing them again raises the same error.
+
+Cached trees are shared by everyone parsing the same source and must be
+treated as immutable. Copy a tree (copy.deepcopy() or ast.load(ast.dump()))
+before changing it.
+
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from collections import OrderedDict, namedtuple
+
+import six
+
+from . import parse as parse_module
+from .parser import JavaSyntaxError
+from .tokenizer import LexerError
+
+
+# Part of every key, so that trees pickled by another version of the node
+# classes are not loaded
+CACHE_VERSION = 1
+
+# Errors that are remembered for a source. Any other error is raised without
+# being cached
+CACHED_ERRORS = (JavaSyntaxError, LexerError)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'disk_hits', 'misses', 'size',
+                                     'maxsize'])
+
+def source_key(source, parents=False):
+    """ returns the hex digest identifying source parsed with the options """
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(('%d:%d:' % (CACHE_VERSION, parents)).encode('ascii'))
+    digest.update(source.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+def error_state(error):
+    """ returns the type, args and attributes of an exception. Exceptions
+    such as JavaSyntaxError cannot be copied or pickled the usual way, as
+    their __init__ takes arguments that are not kept in args.
+
+    """
+
+    return type(error), error.args, dict(error.__dict__)
+
+def make_error(state):
+    """ returns a new exception, without a traceback, from error_state() """
+
+    error_type, args, attrs = state
+    error = Exception.__new__(error_type)
+    error.args = args
+    error.__dict__.update(attrs)
+    return error
+
+class ParseCache(object):
+    """ Parse trees of recently parsed sources. maxsize bounds the number of
+    trees and errors kept in memory, and directory, if given, is where every
+    result is also stored on disk.
+
+    hits counts the results found in memory, disk_hits those loaded from
+    disk and misses the sources that had to be parsed.
+
+    """
+
+    def __init__(self, maxsize=16, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+
+        # key -> (tree, error_state() of the error), most recently used last
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def parse(self, source, parents=False):
+        """ returns the CompilationUnit of source, as javalang.parse.parse()
+        with parents. The tree is shared with other callers and must not be
+        changed. A tree parsed with parents is also returned without them,
+        as linking only adds to it.
+
+        """
+
+        keys = [source_key(source, parents)]
+        if not parents:
+            keys.append(source_key(source, True))
+
+        for key in keys:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.hits += 1
+                break
+        else:
+            for key in keys:
+                entry = self.load(key)
+                if entry is not None:
+                    self.disk_hits += 1
+                    break
+            else:
+                key = keys[0]
+                self.misses += 1
+                try:
+                    entry = (parse_module.parse(source, parents=parents), None)
+                except CACHED_ERRORS as e:
+                    # Only the state is kept, so that the traceback and the
+                    # parser it refers to can be freed
+                    entry = (None, error_state(e))
+                self.store(key, entry)
+
+        self.entries[key] = entry
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        tree, error = entry
+        if error is not None:
+            six.reraise(error[0], make_error(error), None)
+        return tree
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key):
+        """ returns the entry stored on disk for key, or None """
+
+        if not self.directory:
+            return None
+
+        try:
+            with io.open(self.path(key), 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def store(self, key, entry):
+        """ writes entry to disk, replacing the file at once so that readers
+        never see part of it. Trees that cannot be pickled, such as ones
+        deeper than the recursion limit, are only kept in memory.
+
+        """
+
+        if not self.directory:
+            return
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with io.open(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(key))
+        except (pickle.PicklingError, RuntimeError, TypeError):
+            os.remove(temp_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def info(self):
+        return CacheInfo(self.hits, self.disk_hits, self.misses,
+                         len(self.entries), self.maxsize)
+
+    def clear(self):
+        """ empties the memory of the cache and resets its counters. Files on
+        disk are kept.
+
+        """
+
+        self.entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+default_cache = ParseCache()
+
+def parse(source, parents=False):
+    """ parses source through the default cache """
+
+    return default_cache.parse(source, parents=parents)
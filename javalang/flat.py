@@ -0,0 +1,483 @@
+""" A flat, array backed form of javalang.tree parse trees.
+
+A FlatTree keeps a tree in a single buffer of typed arrays: one entry per
+node for its kind, parent, first child, next sibling and positions, the
+values of its fields as a stream of tagged integers, and one table of the
+strings in the tree. The buffer pickles as one bytes object and can be placed
+in multiprocessing.shared_memory, where other processes read it in place.
+
+"""
+
+import struct
+import sys
+from array import array
+
+import six
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
+from . import tree
+from .ast import Node
+from .tokenizer import Position
+
+
+MAGIC = b'JLFT'
+VERSION = 1
+
+# MAGIC, VERSION, byte order, then the node, value, string and kind counts and
+# the length of the string data
+HEADER = struct.Struct('<4sHH5I')
+
+# Tags of the value stream. Lists, tuples and sets are followed by their items
+UNSET, NONE, FALSE, TRUE, STRING, NODE, INT, LIST, TUPLE, SET = range(10)
+
+# The node arrays, each holding one int32 per node
+NODE_ARRAYS = ('kinds', 'parents', 'first_children', 'next_siblings', 'lines',
+               'columns', 'modifier_lines', 'modifier_columns')
+
+# Stands in for the value of a slot that was never set
+MISSING = object()
+
+FIELDS = dict()
+
+def fields(node_type):
+    """ returns the attrs of node_type followed by the other public slots,
+        which the parser sets on some nodes outside of the attrs.
+    """
+
+    try:
+        return FIELDS[node_type]
+    except KeyError:
+        pass
+
+    extra = [slot for slot in node_type.slots
+             if not slot.startswith('_') and slot not in node_type.attrs]
+    result = FIELDS[node_type] = tuple(node_type.attrs) + tuple(extra)
+    return result
+
+class FlatTreeError(Exception):
+    pass
+
+# ------------------------------------------------------------------------------
+# -- Flattening --
+
+class Flattener(object):
+    """ Builds the arrays of a FlatTree """
+
+    def __init__(self):
+        self.nodes = list()
+        self.indexes = dict()
+        self.strings = dict()
+        self.kinds = dict()
+
+        self.tags = array('b')
+        self.data = array('i')
+        self.add_tag = self.tags.append
+        self.add_data = self.data.append
+
+    def order(self, root):
+        """ numbers the nodes under root in pre-order over their fields """
+
+        stack = [root]
+        while stack:
+            item = stack.pop()
+
+            if isinstance(item, Node):
+                self.indexes[id(item)] = len(self.nodes)
+                self.nodes.append(item)
+                children = [getattr(item, field, None)
+                            for field in fields(type(item))]
+            else:
+                children = item
+
+            for child in reversed(children):
+                if isinstance(child, (Node, list, tuple)):
+                    stack.append(child)
+
+    def string(self, value):
+        return self.strings.setdefault(value, len(self.strings))
+
+    def add_value(self, value, children):
+        """ appends value to the value stream, and the indexes of the nodes
+            in it to children
+        """
+
+        if value is None:
+            tag, data = NONE, 0
+        elif isinstance(value, Node):
+            tag, data = NODE, self.indexes[id(value)]
+            children.append(data)
+        elif isinstance(value, six.string_types):
+            tag, data = STRING, self.strings.setdefault(value, len(self.strings))
+        elif isinstance(value, bool):
+            tag, data = (TRUE if value else FALSE), 0
+        elif isinstance(value, int):
+            tag, data = INT, value
+        elif isinstance(value, (list, tuple, set)):
+            if isinstance(value, set):
+                tag = SET
+                value = sorted(value)
+            elif isinstance(value, list):
+                tag = LIST
+            else:
+                tag = TUPLE
+            self.add_tag(tag)
+            self.add_data(len(value))
+            for item in value:
+                self.add_value(item, children)
+            return
+        else:
+            raise FlatTreeError('Cannot flatten %r' % (value,))
+
+        self.add_tag(tag)
+        self.add_data(data)
+
+    def flatten(self, root):
+        self.order(root)
+
+        count = len(self.nodes)
+        arrays = dict((name, array('i', [-1]) * count) for name in NODE_ARRAYS)
+        kinds = arrays['kinds']
+        parents = arrays['parents']
+        first_children = arrays['first_children']
+        next_siblings = arrays['next_siblings']
+        offsets = array('i')
+
+        for i, node in enumerate(self.nodes):
+            node_type = type(node)
+            kinds[i] = self.kinds.setdefault(node_type, len(self.kinds))
+
+            for prefix, attr in (('', '_position'),
+                                 ('modifier_', '_modifier_position')):
+                position = getattr(node, attr, None)
+                if position is not None:
+                    arrays[prefix + 'lines'][i] = position[0]
+                    arrays[prefix + 'columns'][i] = position[1]
+
+            offsets.append(len(self.tags))
+            children = list()
+            for field in fields(node_type):
+                value = getattr(node, field, MISSING)
+                if value is MISSING:
+                    self.add_tag(UNSET)
+                    self.add_data(0)
+                else:
+                    self.add_value(value, children)
+
+            previous = -1
+            for child in children:
+                parents[child] = i
+                if previous == -1:
+                    first_children[i] = child
+                else:
+                    next_siblings[previous] = child
+                previous = child
+
+        offsets.append(len(self.tags))
+
+        kind_names = sorted(self.kinds, key=self.kinds.get)
+        kind_names = [self.string(node_type.__name__)
+                      for node_type in kind_names]
+        strings = sorted(self.strings, key=self.strings.get)
+
+        encoded = [value.encode('utf-8', 'surrogatepass') for value in strings]
+        string_offsets = array('i', [0])
+        for value in encoded:
+            string_offsets.append(string_offsets[-1] + len(value))
+
+        sections = [arrays[name] for name in NODE_ARRAYS]
+        sections += [offsets, self.data, string_offsets,
+                     array('i', kind_names), self.tags]
+        return pack(sections, count, len(self.tags), len(strings),
+                    len(kind_names), b''.join(encoded))
+
+def pack(sections, nodes, values, strings, kinds, string_data):
+    """ returns the buffer of a FlatTree. The header is a multiple of four
+        bytes long and the byte sized sections come last, so that every int32
+        section is aligned.
+    """
+
+    header = HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', nodes,
+                         values, strings, kinds, len(string_data))
+    parts = [header]
+    parts.extend(section.tobytes() for section in sections)
+    parts.append(string_data)
+    return b''.join(parts)
+
+def flatten(root):
+    """ returns a FlatTree holding the tree under the node root """
+
+    return FlatTree(Flattener().flatten(root))
+
+# ------------------------------------------------------------------------------
+# -- Flat trees --
+
+class FlatTree(object):
+    """ A parse tree held in one buffer, which may be a bytes object, a
+    bytearray or the memory of a multiprocessing.shared_memory block. Nodes
+    are numbered from 0, the root, in pre-order over their fields; a node's
+    fields are its attrs followed by any values the parser set outside of
+    them. The arrays are read in place with memoryview.cast (Python 3).
+
+    The structure can be read without building nodes, through kind(),
+    parent(), children() and position(); to_tree() rebuilds the
+    javalang.tree objects.
+
+    """
+
+    def __init__(self, buf, block=None):
+        self.buffer = buf
+        self.block = block
+
+        view = memoryview(buf)
+        (magic, version, little_endian, self.node_count, value_count,
+         string_count, kind_count, string_bytes) = HEADER.unpack_from(view)
+
+        if magic != MAGIC or version != VERSION:
+            raise FlatTreeError('Not a flat tree')
+        if bool(little_endian) != (sys.byteorder == 'little'):
+            raise FlatTreeError('Flat tree has a different byte order')
+
+        offset = HEADER.size
+        views = list()
+
+        def section(length, size=4, fmt='i'):
+            start = offset
+            views.append(view[start:start + length * size].cast(fmt))
+            return start + length * size
+
+        for _ in NODE_ARRAYS:
+            offset = section(self.node_count)
+        offset = section(self.node_count + 1)
+        offset = section(value_count)
+        offset = section(string_count + 1)
+        offset = section(kind_count)
+        offset = section(value_count, 1, 'b')
+
+        (self.kinds, self.parents, self.first_children, self.next_siblings,
+         self.lines, self.columns, self.modifier_lines,
+         self.modifier_columns, self.value_offsets, self.value_data,
+         self.string_offsets, kind_names, self.value_tags) = views
+
+        self.string_data = view[offset:offset + string_bytes]
+        self.views = views + [self.string_data, view]
+
+        self.strings = [None] * string_count
+        self.kind_types = [getattr(tree, self.string(name))
+                           for name in kind_names]
+
+    def __len__(self):
+        return self.node_count
+
+    def __reduce__(self):
+        return (FlatTree, (bytes(self.buffer),))
+
+    @property
+    def nbytes(self):
+        return len(self.views[-1])
+
+    # -- Reading --
+
+    def string(self, index):
+        value = self.strings[index]
+        if value is None:
+            start = self.string_offsets[index]
+            end = self.string_offsets[index + 1]
+            encoded = self.string_data[start:end].tobytes()
+            value = self.strings[index] = encoded.decode('utf-8', 'surrogatepass')
+        return value
+
+    def kind(self, index):
+        """ returns the javalang.tree class of the node """
+        return self.kind_types[self.kinds[index]]
+
+    def parent(self, index):
+        """ returns the index of the parent node, or -1 for the root """
+        return self.parents[index]
+
+    def children(self, index):
+        """ returns the indexes of the child nodes """
+        children = list()
+        child = self.first_children[index]
+        while child != -1:
+            children.append(child)
+            child = self.next_siblings[child]
+        return children
+
+    def position(self, index):
+        if self.lines[index] == -1:
+            return None
+        return Position(self.lines[index], self.columns[index])
+
+    def find(self, node_type):
+        """ returns the indexes of the nodes that are instances of node_type,
+            in order
+        """
+        kinds = set(i for i, kind_type in enumerate(self.kind_types)
+                    if issubclass(kind_type, node_type))
+        return [i for i, kind in enumerate(self.kinds) if kind in kinds]
+
+    def value(self, index, field):
+        """ returns the value of a field of the node, with nodes given as
+            their indexes
+        """
+
+        node_type = self.kind(index)
+        position = self.value_offsets[index]
+        for name in fields(node_type):
+            if name == field:
+                value, _ = self.decode(position, None)
+                return value
+            position = self.skip(position)
+        raise AttributeError(field)
+
+    def skip(self, position):
+        tag = self.value_tags[position]
+        if tag in (LIST, TUPLE, SET):
+            count = self.value_data[position]
+            position += 1
+            for _ in range(count):
+                position = self.skip(position)
+            return position
+        return position + 1
+
+    def decode(self, position, nodes):
+        """ returns the value at position in the value stream and the position
+            after it, with nodes taken from the list nodes or given as their
+            indexes if it is None
+        """
+
+        tag = self.value_tags[position]
+        data = self.value_data[position]
+        position += 1
+
+        if tag == NONE:
+            return None, position
+        elif tag == STRING:
+            return self.string(data), position
+        elif tag == NODE:
+            return (data if nodes is None else nodes[data]), position
+        elif tag in (LIST, TUPLE, SET):
+            items = list()
+            for _ in range(data):
+                item, position = self.decode(position, nodes)
+                items.append(item)
+            if tag == TUPLE:
+                return tuple(items), position
+            elif tag == SET:
+                return set(items), position
+            return items, position
+        elif tag == TRUE:
+            return True, position
+        elif tag == FALSE:
+            return False, position
+        elif tag == INT:
+            return data, position
+        raise FlatTreeError('Unknown value tag %d' % (tag,))
+
+    def to_tree(self):
+        """ returns the root node of a javalang.tree copy of the tree """
+
+        kind_types = self.kind_types
+        nodes = [kind_types[kind].__new__(kind_types[kind])
+                 for kind in self.kinds]
+
+        for i, node in enumerate(nodes):
+            position = self.value_offsets[i]
+            for field in fields(type(node)):
+                if self.value_tags[position] == UNSET:
+                    position += 1
+                    continue
+                value, position = self.decode(position, nodes)
+                setattr(node, field, value)
+
+            if self.lines[i] == -1:
+                node._position = None
+            else:
+                node._position = Position(self.lines[i], self.columns[i])
+            if self.modifier_lines[i] != -1:
+                node._modifier_position = Position(self.modifier_lines[i],
+                                                   self.modifier_columns[i])
+
+        return nodes[0]
+
+    # -- Shared memory --
+
+    def share(self, name=None):
+        """ copies the tree into a new shared memory block, which is left in
+            place for another process to attach() to, and returns its name.
+            The name is chosen by the caller if given, so that the block can
+            still be found with unlink_shared() if it is never attached to.
+        """
+
+        if shared_memory is None:
+            raise FlatTreeError('multiprocessing.shared_memory is not available')
+
+        block = shared_memory.SharedMemory(name=name, create=True,
+                                           size=max(self.nbytes, 1))
+        block.buf[:self.nbytes] = self.views[-1]
+        name = block.name
+        block.close()
+
+        # The block belongs to whoever attaches to it, so it must not be
+        # freed when this process, such as a pool worker, exits first
+        if getattr(shared_memory, '_USE_POSIX', False):
+            resource_tracker.unregister(block._name, 'shared_memory')
+
+        return name
+
+    @classmethod
+    def attach(cls, name):
+        """ returns the FlatTree in the shared memory block name, reading it
+            in place. The tree owns the block: close() frees it.
+        """
+
+        if shared_memory is None:
+            raise FlatTreeError('multiprocessing.shared_memory is not available')
+
+        block = shared_memory.SharedMemory(name=name)
+        return cls(block.buf, block)
+
+    def release(self):
+        for view in getattr(self, 'views', ()):
+            view.release()
+        self.views = list()
+        self.buffer = None
+
+    def __del__(self):
+        # A shared memory block cannot close while views of it exist
+        self.release()
+
+    def close(self):
+        """ releases the buffer, and frees the shared memory block the tree
+            was attached to
+        """
+
+        self.release()
+
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def unlink_shared(name):
+    """ frees the shared memory block name, if it exists, without reading the
+        tree in it
+    """
+
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    block.unlink()
+    return True
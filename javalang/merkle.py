@@ -0,0 +1,132 @@
+""" Structural hashes of parse trees.
+
+The structural hash of a node covers its type and the values of its attrs,
+such as literals, modifiers, dimensions and operators, and the structural
+hashes of the nodes below it, but not identifier names. Two subtrees with the
+same hash differ at most in the identifiers they use, so once hashed they
+can be compared in constant time, and a structural difference between two
+trees is found by descending only into the subtrees whose hashes differ.
+
+Hashes are BLAKE2 digests, so they are the same in every process and can be
+used to find structurally identical code across files.
+
+"""
+
+import hashlib
+
+import six
+
+from . import tree
+from .ast import Node
+
+
+DIGEST_SIZE = 16
+
+# Attrs holding identifiers. Only whether they are set is part of the
+# structure, except for qualified names, whose number of parts is
+IDENTIFIER_ATTRS = frozenset(['name', 'member', 'label'])
+QUALIFIED_ATTRS = frozenset(['qualifier', 'path'])
+
+# Attrs left out of the structure altogether
+IGNORED_ATTRS = frozenset(['documentation'])
+
+# Node types whose name is not an identifier
+NAMED_TYPES = (tree.BasicType, tree.PackageDeclaration)
+
+def describe(value, children):
+    """ returns a hashable description of an attr value, with nodes in it
+        replaced by None and appended to children
+    """
+
+    if value is None or isinstance(value, six.string_types):
+        return value
+    elif isinstance(value, Node):
+        children.append(value)
+        return None
+    elif isinstance(value, (list, tuple)):
+        return tuple([describe(item, children) for item in value])
+    elif isinstance(value, (set, frozenset)):
+        return ('set',) + tuple(sorted(value))
+    return value
+
+def signature(node, children):
+    """ returns the structure of node itself, leaving out the nodes below it,
+        which are appended to children
+    """
+
+    parts = [type(node).__name__]
+    named = isinstance(node, NAMED_TYPES)
+
+    for attr in node.attrs:
+        value = getattr(node, attr)
+
+        if attr in IGNORED_ATTRS:
+            continue
+        elif attr in IDENTIFIER_ATTRS and not named:
+            value = value is not None
+        elif attr in QUALIFIED_ATTRS and isinstance(value, six.string_types):
+            value = len([part for part in value.split('.') if part])
+        else:
+            value = describe(value, children)
+
+        parts.append((attr, value))
+
+    return repr(tuple(parts)).encode('utf-8', 'surrogatepass')
+
+def structure_hash(node, hashes=None):
+    """ returns the structural hash of node as a bytes digest. The hashes of
+        the nodes below it are worked out on the way and kept in hashes, by
+        id(node), if it is given, so hashing a subtree of the same tree again
+        takes constant time as long as the tree is not changed in place.
+    """
+
+    if hashes is None:
+        hashes = dict()
+    result = hashes.get(id(node))
+    if result is not None:
+        return result
+
+    # Post-order walk, hashing each node once all nodes below it are
+    stack = [(node, None, None)]
+    while stack:
+        current, described, children = stack.pop()
+
+        if described is None:
+            children = list()
+            stack.append((current, signature(current, children), children))
+            for child in children:
+                if id(child) not in hashes:
+                    stack.append((child, None, None))
+            continue
+
+        digest = hashlib.blake2b(described, digest_size=DIGEST_SIZE)
+        for child in children:
+            digest.update(hashes[id(child)])
+        hashes[id(current)] = digest.digest()
+
+    return hashes[id(node)]
+
+def mismatches(tree_1, tree_2):
+    """ yields the (node_1, node_2) pairs at which the structure of two trees
+        differs, descending only into subtrees with different hashes. Each
+        pair differs in its own type or attrs, or in the number of nodes
+        below it, rather than just somewhere further down.
+    """
+
+    hashes_1 = dict()
+    hashes_2 = dict()
+    stack = [(tree_1, tree_2)]
+    while stack:
+        node_1, node_2 = stack.pop()
+
+        if structure_hash(node_1, hashes_1) == structure_hash(node_2, hashes_2):
+            continue
+
+        children_1 = list()
+        children_2 = list()
+        if (signature(node_1, children_1) != signature(node_2, children_2)
+                or len(children_1) != len(children_2)):
+            yield node_1, node_2
+            continue
+
+        stack.extend(reversed(list(zip(children_1, children_2))))
@@ -1,6 +1,18 @@
 
-from .parser import Parser
-from .tokenizer import tokenize
+import binascii
+import bisect
+import copy
+import io
+import multiprocessing
+import os
+from collections import namedtuple
+
+from . import flat, tree
+from .ast import Node
+from .parser import Parser, JavaSyntaxError
+from .tokenizer import (
+    Position, tokenize, tokenize_array, retokenize_window,
+    )
 
 def parse_expression(exp):
     if not exp.endswith(';'):
@@ -47,7 +59,447 @@ def parse_type_signature(sig):
 
     return parser.parse_class_or_interface_declaration()
 
-def parse(s):
-    tokens = tokenize(s)
-    parser = Parser(tokens)
+def parse(s, compact=False, memoize=False, parents=False):
+    """ Parses a compilation unit. With compact set the source is tokenized
+    into a TokenArray instead of a list of JavaToken objects. With memoize set
+    the parser remembers the outcome of its speculative rules, which bounds
+    backtracking on deeply nested casts and lambdas to linear time. With
+    parents set every node records its parent, depth and enclosing method or
+    type declaration.
+
+    """
+
+    if compact:
+        tokens = tokenize_array(s)
+    else:
+        tokens = tokenize(s)
+    parser = Parser(tokens, memoize=memoize, parents=parents)
     return parser.parse()
+
+def parse_members(s, line=1, column=1, context='members', parents=False):
+    """ Parses a segment of a larger file holding class body declarations,
+    or with context set to 'interface_members' or 'types' interface body
+    declarations or type declarations, and returns them as a list. line and
+    column give the position in the file at which s starts and all positions
+    in the result are relative to the file.
+
+    """
+
+    tokens = list(tokenize(s))
+
+    line_offset = line - 1
+    column_offset = column - 1
+    if line_offset or column_offset:
+        for token in tokens:
+            token_line, token_column = token.position
+            if token_line == 1:
+                token_column += column_offset
+            token.position = Position(token_line + line_offset, token_column)
+
+    parser = Parser(tokens, parents=parents)
+    return parser.parse_members(context)
+
+# ------------------------------------------------------------------------------
+# ---- Incremental reparsing ----
+
+class DeclarationNotFound(Exception):
+    """ Raised when an edit cannot be narrowed down to declarations that can
+    be parsed on their own.
+
+    """
+
+def reparse(previous_tree, previous_tokens, source, edit_start, edit_end, new_text):
+    """ Parses source with source[edit_start:edit_end] replaced by new_text and
+    returns a (tree, tokens) tuple, where previous_tree and previous_tokens
+    are the CompilationUnit and TokenArray of source.
+
+    Only the smallest member or type declaration enclosing the edit is parsed
+    again. Other declarations are shared with previous_tree, except that
+    those whose positions move are copied with the positions shifted, so
+    previous_tree is left as it was. Edits that do not fall within a single
+    declaration, such as those to the package or imports, cause the whole
+    source to be parsed.
+
+    If previous_tree was parsed with parents the new tree is linked as well.
+    Its parent pointers cannot be shared, so the nodes the two trees have in
+    common then belong to the new tree, and previous_tree should no longer be
+    used for parent queries.
+
+    """
+
+    tokens, first, last = retokenize_window(previous_tokens, source, edit_start,
+                                            edit_end, new_text)
+    edit = TokenEdit(previous_tokens, tokens, first, last)
+
+    parents = previous_tree.depth is not None
+    parser = Parser(tokens, parents=parents)
+
+    try:
+        tree = edit.reparse_compilation_unit(previous_tree)
+    except (DeclarationNotFound, JavaSyntaxError):
+        tree = parser.parse()
+    else:
+        if parents:
+            parser.link_parents(tree)
+
+    return tree, tokens
+
+class TokenEdit(object):
+    """ Relates the tokens of a source before and after an edit, and rebuilds
+    the parse tree for the edited tokens from the previous one.
+
+    """
+
+    def __init__(self, previous, tokens, first, last):
+        self.previous = previous
+        self.tokens = tokens
+
+        # Tokens after the edit move by shift in index and delta in offset
+        self.shift = len(tokens) - len(previous)
+        self.delta = len(tokens.data) - len(previous.data)
+
+        # Narrow the relexed window down to the tokens that really changed
+        while (first < last and first < last + self.shift
+               and self.same_token(first, first, 0)):
+            first += 1
+
+        while (first < last and first < last + self.shift
+               and self.same_token(last - 1, last - 1 + self.shift, self.delta)):
+            last -= 1
+
+        self.first = first
+        self.last = last
+
+        # Offset in the previous source from which positions are shifted
+        if last < len(previous):
+            self.edit_end = previous.starts[last]
+        else:
+            self.edit_end = len(previous.data)
+
+        # Positions on lines after the edit only move if lines were added or
+        # removed
+        self.edit_end_line = bisect.bisect_left(previous.line_starts, self.edit_end)
+        self.line_shift = len(tokens.line_starts) - len(previous.line_starts)
+
+    def same_token(self, index, new_index, delta):
+        previous = self.previous
+        tokens = self.tokens
+
+        return (previous.starts[index] + delta == tokens.starts[new_index]
+                and previous.kinds[index] == tokens.kinds[new_index]
+                and previous.values[index] == tokens.values[new_index]
+                and previous.javadocs.get(index) == tokens.javadocs.get(new_index))
+
+    # -- Positions --
+
+    def previous_offset(self, position):
+        return self.previous.line_starts[position.line - 1] + position.column
+
+    def token_index(self, position):
+        """ Returns the index of the previous token at position """
+
+        if position is None:
+            raise DeclarationNotFound()
+
+        offset = self.previous_offset(position)
+        index = bisect.bisect_left(self.previous.starts, offset)
+
+        if index == len(self.previous) or self.previous.starts[index] != offset:
+            raise DeclarationNotFound()
+
+        return index
+
+    def shift_position(self, position):
+        offset = self.previous_offset(position)
+        if offset < self.edit_end:
+            return position
+
+        offset += self.delta
+        line_starts = self.tokens.line_starts
+        line = bisect.bisect_left(line_starts, offset)
+        return Position(line, offset - line_starts[line - 1])
+
+    def shift_node(self, node):
+        """ Returns node with the positions in it shifted past the edit,
+        copying only the parts that changed.
+
+        """
+
+        if isinstance(node, Node):
+            shifted = None
+
+            for attr in ('_position', '_modifier_position'):
+                position = getattr(node, attr, None)
+                if position is None:
+                    continue
+                new_position = self.shift_position(position)
+                if new_position != position:
+                    shifted = shifted or copy.copy(node)
+                    setattr(shifted, attr, new_position)
+
+            for attr in node.attrs:
+                value = getattr(node, attr)
+                new_value = self.shift_node(value)
+                if new_value is not value:
+                    shifted = shifted or copy.copy(node)
+                    setattr(shifted, attr, new_value)
+
+            return shifted or node
+
+        elif isinstance(node, (list, tuple)):
+            items = [self.shift_node(item) for item in node]
+            if all(new_item is item for new_item, item in zip(items, node)):
+                return node
+            return type(node)(items)
+
+        return node
+
+    # -- Declarations --
+
+    def parse_declarations(self, start, end, context):
+        """ Parses the previous tokens start:end after the edit """
+
+        parser = Parser([self.tokens[i] for i in range(start, end + self.shift)])
+        return parser.parse_members(context)
+
+    def reparse_compilation_unit(self, compilation_unit):
+        if not compilation_unit.types:
+            raise DeclarationNotFound()
+
+        start = self.token_index(compilation_unit.types[0]._modifier_position)
+        end = len(self.previous)
+
+        if not start <= self.first:
+            raise DeclarationNotFound()
+
+        result = copy.copy(compilation_unit)
+        result.types = self.reparse_declarations(compilation_unit.types,
+                                                 start, end, 'types')
+        result.reset_index()
+        return result
+
+    def reparse_declarations(self, declarations, start, end, context):
+        """ Returns declarations, the nodes for the previous tokens
+        start:end, rebuilt for the edit that falls within them.
+
+        """
+
+        # Initializer blocks are plain lists of statements without a position,
+        # so they are grouped with the declaration before them. Group i holds
+        # declarations[groups[i]:groups[i + 1]], the tokens bounds[i]:bounds[i + 1]
+        groups = [0]
+        bounds = [start]
+        for i, declaration in enumerate(declarations):
+            if i and isinstance(declaration, Node):
+                groups.append(i)
+                bounds.append(self.token_index(declaration._modifier_position))
+        groups.append(len(declarations))
+        bounds.append(end)
+
+        for i in range(len(groups) - 1):
+            if bounds[i] <= self.first and self.last <= bounds[i + 1]:
+                break
+        else:
+            return self.parse_declarations(start, end, context)
+
+        group = declarations[groups[i]:groups[i + 1]]
+        try:
+            if len(group) != 1:
+                raise DeclarationNotFound()
+            replacement = [self.reparse_body(group[0], bounds[i], bounds[i + 1])]
+        except DeclarationNotFound:
+            replacement = self.parse_declarations(bounds[i], bounds[i + 1], context)
+
+        following = declarations[groups[i + 1]:]
+        if self.line_shift:
+            following = [self.shift_node(declaration) for declaration in following]
+        else:
+            # Declarations starting on a later line than the edit are unchanged
+            for j in range(i + 1, len(groups) - 1):
+                line = bisect.bisect_left(self.previous.line_starts,
+                                          self.previous.starts[bounds[j]])
+                if line > self.edit_end_line:
+                    break
+                for k in range(groups[j], groups[j + 1]):
+                    k -= groups[i + 1]
+                    following[k] = self.shift_node(following[k])
+
+        return declarations[:groups[i]] + replacement + following
+
+    def reparse_body(self, declaration, start, end):
+        """ Rebuilds a class or interface declaration, given as the previous
+        tokens start:end, for an edit that is inside its body.
+
+        """
+
+        if isinstance(declaration, tree.ClassDeclaration):
+            context = 'members'
+        elif isinstance(declaration, tree.InterfaceDeclaration):
+            context = 'interface_members'
+        else:
+            raise DeclarationNotFound()
+
+        previous = self.previous
+
+        # The body opens at the first brace outside of any parentheses, such
+        # as those of annotation arguments
+        depth = 0
+        body_start = start
+        while body_start < end:
+            value = previous.values[body_start]
+            body_start += 1
+            if value == '(':
+                depth += 1
+            elif value == ')':
+                depth -= 1
+            elif value == '{' and depth == 0:
+                break
+
+        # and closes at the last brace, which may be followed by semicolons
+        body_end = end - 1
+        while body_end > body_start and previous.values[body_end] == ';':
+            body_end -= 1
+
+        if not (previous.values[body_end] == '}'
+                and body_start <= self.first and self.last <= body_end):
+            raise DeclarationNotFound()
+
+        result = copy.copy(declaration)
+        if declaration.body:
+            result.body = self.reparse_declarations(declaration.body, body_start,
+                                                    body_end, context)
+        else:
+            result.body = self.parse_declarations(body_start, body_end, context)
+        return result
+
+# ------------------------------------------------------------------------------
+# ---- Bulk parsing ----
+
+# Result of parsing one of the inputs to parse_many(). Exactly one of value
+# and error is set
+ParseResult = namedtuple('ParseResult', ['index', 'value', 'error'])
+
+# A failure to parse, with the position of the offending token if known
+ParseFailure = namedtuple('ParseFailure', ['type', 'description', 'position'])
+
+ParseSummary = namedtuple('ParseSummary', ['line_count', 'package', 'imports',
+                                           'declarations'])
+
+def summarize(compilation_unit, source):
+    """ Returns a ParseSummary of a compilation unit. Declarations are listed
+    as (node type, name, position) tuples for every type, field, method and
+    constructor declaration.
+
+    """
+
+    declarations = list()
+    for _, node in compilation_unit:
+        if isinstance(node, (tree.TypeDeclaration, tree.MethodDeclaration,
+                             tree.ConstructorDeclaration)):
+            declarations.append((type(node).__name__, node.name, node.position))
+        elif isinstance(node, tree.FieldDeclaration):
+            for declarator in node.declarators:
+                declarations.append((type(node).__name__, declarator.name,
+                                     node.position))
+
+    package = compilation_unit.package
+    return ParseSummary(line_count=source.count('\n') + 1,
+                        package=package.name if package else None,
+                        imports=[import_.path for import_ in compilation_unit.imports],
+                        declarations=declarations)
+
+def parse_job(job):
+    """ Parses one input to parse_many(), in a worker process """
+
+    index, path_or_source, mode, parents, block_name = job
+
+    try:
+        if os.path.isfile(path_or_source):
+            with io.open(path_or_source, encoding='utf-8') as f:
+                source = f.read()
+        else:
+            source = path_or_source
+
+        compilation_unit = parse(source, parents=parents)
+
+        if mode == 'tree':
+            value = compilation_unit
+        elif mode == 'summary':
+            value = summarize(compilation_unit, source)
+        elif mode == 'flat':
+            value = flat.flatten(compilation_unit)
+        elif mode == 'shared':
+            # Only the name of the shared memory block goes back
+            value = flat.flatten(compilation_unit).share(block_name)
+        else:
+            value = mode(compilation_unit, source)
+
+    except JavaSyntaxError as e:
+        position = getattr(e.at, 'position', None)
+        failure = ParseFailure(type(e).__name__, e.description, position)
+        return ParseResult(index, None, failure)
+
+    except Exception as e:
+        failure = ParseFailure(type(e).__name__, str(e), None)
+        return ParseResult(index, None, failure)
+
+    return ParseResult(index, value, None)
+
+def parse_many(paths_or_sources, workers=None, chunksize=1, mode='tree',
+               parents=False):
+    """ Parses many compilation units in a pool of worker processes and
+    yields a ParseResult for each as soon as it is done, so not in input
+    order. Inputs naming an existing file are read from it, anything else is
+    parsed as source. The pool defaults to one worker per CPU, with workers
+    set to 1 everything is parsed in this process.
+
+    mode selects what is sent back from the workers: 'tree' for the
+    CompilationUnit, 'summary' for a ParseSummary, 'flat' for a
+    flat.FlatTree, or a function taking the CompilationUnit and the source
+    and returning anything picklable, so that whole trees need not be
+    pickled when only a little is wanted from them. Where
+    multiprocessing.shared_memory is available flat trees are handed over
+    in shared memory blocks, which the FlatTree frees when it is closed.
+    Blocks not yet handed over when iteration stops early are freed then.
+    Failures are given as a ParseFailure. parents is passed on to parse().
+
+    """
+
+    if mode not in ('tree', 'summary', 'flat') and not callable(mode):
+        raise ValueError('Unknown parse mode %r' % (mode,))
+
+    if workers == 1:
+        for index, path_or_source in enumerate(paths_or_sources):
+            yield parse_job((index, path_or_source, mode, parents, None))
+        return
+
+    shared = mode == 'flat' and flat.shared_memory is not None
+    if shared:
+        mode = 'shared'
+        # Blocks are named by this process, so that the ones never attached
+        # to, such as when iteration stops early, can be freed
+        block_prefix = 'jlft_%s_' % binascii.hexlify(os.urandom(4)).decode('ascii')
+
+    # Indices of the jobs handed to the pool whose result was not yet taken
+    pending = set()
+
+    def jobs():
+        for index, path_or_source in enumerate(paths_or_sources):
+            pending.add(index)
+            block_name = block_prefix + str(index) if shared else None
+            yield index, path_or_source, mode, parents, block_name
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap_unordered(parse_job, jobs(), chunksize):
+            pending.discard(result.index)
+            if shared and result.error is None:
+                result = result._replace(value=flat.FlatTree.attach(result.value))
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if shared:
+            for index in pending:
+                flat.unlink_shared(block_prefix + str(index))
@@ -1,10 +1,11 @@
 import six
 
+from . import ast
 from . import util
 from . import tree
 from .tokenizer import (
     EndOfInput, Keyword, Modifier, BasicType, Identifier,
-    Annotation, Literal, Operator, JavaToken,
+    Annotation, Literal, Operator, JavaToken, TokenArray, TokenArrayIterator,
     )
 
 ENABLE_DEBUG_SUPPORT = False
@@ -59,6 +60,40 @@ def parse_debug(method):
     else:
         return method
 
+def parse_memo(method):
+    """ Memoizes a parse method by the token index it starts at when the
+    parser was created with memoize set. Both the resulting node and a syntax
+    error are remembered, so the rule is never parsed twice from the same
+    index. The rule must not depend on any state other than the tokens.
+
+    """
+
+    name = method.__name__
+
+    def _method(self):
+        if self.memo is None:
+            return method(self)
+
+        key = (name, self.tokens.marker)
+        entry = self.memo.get(key)
+        if entry is None:
+            try:
+                result = method(self)
+            except JavaSyntaxError as e:
+                self.memo[key] = (e, None)
+                raise
+            self.memo[key] = (result, self.tokens.marker)
+            return result
+
+        result, end = entry
+        if end is None:
+            raise result
+        self.tokens.marker = end
+        return result
+
+    _method.__name__ = name
+    return _method
+
 # ------------------------------------------------------------------------------
 # ---- Parsing exception ----
 
@@ -76,6 +111,9 @@ class JavaSyntaxError(JavaParserBaseException):
 class JavaParserError(JavaParserBaseException):
     pass
 
+# Returned by Parser.speculate() when the attempted rule does not match
+SPECULATION_FAILED = object()
+
 # ------------------------------------------------------------------------------
 # ---- Parser class ----
 
@@ -91,12 +129,32 @@ class Parser(object):
                             set(('+', '-')),
                             set(('*', '/', '%')) ]
 
-    def __init__(self, tokens):
-        self.tokens = util.LookAheadListIterator(tokens)
+    # Binding power of each binary operator, higher binds tighter
+    operator_levels = dict((operator, level)
+                           for level, operators in enumerate(operator_precedence)
+                           for operator in operators)
+
+    # Declarations recorded as the enclosing_declaration of the nodes below
+    # them when parents are linked
+    enclosing_declaration_types = (tree.MethodDeclaration,
+                                   tree.ConstructorDeclaration,
+                                   tree.TypeDeclaration)
+
+    def __init__(self, tokens, memoize=False, parents=False):
+        if isinstance(tokens, TokenArray):
+            self.tokens = TokenArrayIterator(tokens)
+        else:
+            self.tokens = util.LookAheadListIterator(tokens)
         self.tokens.set_default(EndOfInput(None))
 
         self.debug = False
 
+        # Packrat memo table, keyed by (rule name, token index)
+        self.memo = dict() if memoize else None
+
+        # Whether parsed trees get parent, depth and enclosing declarations
+        self.parents = parents
+
 # ------------------------------------------------------------------------------
 # ---- Debug control ----
 
@@ -107,7 +165,44 @@ class Parser(object):
 # ---- Parsing entry point ----
 
     def parse(self):
-        return self.parse_compilation_unit()
+        compilation_unit = self.parse_compilation_unit()
+        if self.parents:
+            self.link_parents(compilation_unit)
+        return compilation_unit
+
+    def parse_members(self, context='members'):
+        """ Parses declarations up to the end of the input. With context
+        'members' these are class body declarations, with 'interface_members'
+        interface body declarations and with 'types' they are type
+        declarations as found at the top level of a compilation unit.
+
+        """
+
+        if context == 'members':
+            parse_declaration = self.parse_class_body_declaration
+        elif context == 'interface_members':
+            parse_declaration = self.parse_interface_body_declaration
+        elif context == 'types':
+            parse_declaration = self.parse_type_declaration
+        else:
+            raise ValueError('Unknown declaration context %r' % (context,))
+
+        declarations = list()
+        while not isinstance(self.tokens.look(), EndOfInput):
+            try:
+                declaration = parse_declaration()
+            except StopIteration:
+                self.illegal("Unexpected end of input")
+
+            if declaration:
+                declarations.append(declaration)
+
+        if self.parents:
+            self.link_parents(declarations)
+        return declarations
+
+    def link_parents(self, root):
+        ast.link_parents(root, self.enclosing_declaration_types)
 
 # ------------------------------------------------------------------------------
 # ---- Helper methods ----
@@ -169,39 +264,106 @@ class Parser(object):
 
         return True
 
-    def build_binary_operation(self, parts, start_level=0):
-        if len(parts) == 1:
-            return parts[0]
+    # Single argument fast paths for accept, would_accept and try_accept
 
-        operands = list()
-        operators = list()
+    def accept1(self, accept):
+        token = next(self.tokens)
 
-        i = 0
+        if isinstance(accept, six.string_types):
+            if not token.value == accept:
+                self.illegal("Expected '%s'" % (accept,))
+        elif not isinstance(token, accept):
+            self.illegal("Expected %s" % (accept.__name__,))
 
-        for level in range(start_level, len(self.operator_precedence)):
-            for j in range(1, len(parts) - 1, 2):
-                if parts[j] in self.operator_precedence[level]:
-                    operand = self.build_binary_operation(parts[i:j], level + 1)
-                    operator = parts[j]
-                    i = j + 1
+        return token.value
 
-                    operands.append(operand)
-                    operators.append(operator)
+    def would_accept1(self, accept):
+        token = self.tokens.look()
 
-            if operands:
-                break
+        if isinstance(accept, six.string_types):
+            return token.value == accept
+        return isinstance(token, accept)
+
+    def try_accept1(self, accept):
+        token = self.tokens.look()
+
+        if isinstance(accept, six.string_types):
+            if not token.value == accept:
+                return False
+        elif not isinstance(token, accept):
+            return False
+
+        next(self.tokens)
+        return True
 
-        operand = self.build_binary_operation(parts[i:], level + 1)
-        operands.append(operand)
+    def speculate(self, rule):
+        """ Attempt to parse the named rule at the current token. On success
+        the node is returned and the tokens are consumed, otherwise the
+        iterator is left untouched and SPECULATION_FAILED is returned.
 
-        operation = operands[0]
+        When memoizing, the outcome is recorded against the starting token
+        index so a repeated attempt costs a single lookup.
 
-        for operator, operandr in zip(operators, operands[1:]):
-            operation = tree.BinaryOperation(operandl=operation)
-            operation.operator = operator
-            operation.operandr = operandr
+        """
+
+        start = self.tokens.marker
+
+        if self.memo is not None:
+            entry = self.memo.get((rule, start))
+            if entry is not None:
+                result, end = entry
+                if end is None:
+                    return SPECULATION_FAILED
+                self.tokens.marker = end
+                return result
+
+        self.tokens.push_marker()
+        try:
+            result = getattr(self, rule)()
+        except JavaSyntaxError as e:
+            self.tokens.pop_marker(True)
+            if self.memo is not None:
+                self.memo[(rule, start)] = (e, None)
+            return SPECULATION_FAILED
+
+        self.tokens.pop_marker(False)
+        if self.memo is not None:
+            self.memo[(rule, start)] = (result, self.tokens.marker)
+        return result
 
-        return operation
+    def build_binary_operation(self, parts):
+        """ Builds the tree for a flat list of alternating operands and binary
+        operators using operator precedence. All operators are left
+        associative. This is a single pass over the list with an explicit
+        stack, so long chains neither recurse nor rescan the list.
+
+        """
+
+        levels = self.operator_levels
+        operands = [parts[0]]
+        operators = list()
+
+        for j in range(1, len(parts), 2):
+            operator = parts[j]
+            level = levels[operator]
+
+            # Reduce everything on the stack that binds at least as tightly
+            while operators and levels[operators[-1]] >= level:
+                operandr = operands.pop()
+                operands[-1] = tree.BinaryOperation(operator=operators.pop(),
+                                                    operandl=operands[-1],
+                                                    operandr=operandr)
+
+            operators.append(operator)
+            operands.append(parts[j + 1])
+
+        while operators:
+            operandr = operands.pop()
+            operands[-1] = tree.BinaryOperation(operator=operators.pop(),
+                                                operandl=operands[-1],
+                                                operandr=operandr)
+
+        return operands[0]
 
     def is_annotation(self, i=0):
         """ Returns true if the position is the start of an annotation application
@@ -229,7 +391,7 @@ class Parser(object):
 
     @parse_debug
     def parse_identifier(self):
-        return self.accept(Identifier)
+        return self.accept1(Identifier)
 
     @parse_debug
     def parse_qualified_identifier(self):
@@ -239,7 +401,7 @@ class Parser(object):
             identifier = self.parse_identifier()
             qualified_identifier.append(identifier)
 
-            if not self.try_accept('.'):
+            if not self.try_accept1('.'):
                 break
 
         return '.'.join(qualified_identifier)
@@ -252,7 +414,7 @@ class Parser(object):
             qualified_identifier = self.parse_qualified_identifier()
             qualified_identifiers.append(qualified_identifier)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return qualified_identifiers
@@ -276,7 +438,7 @@ class Parser(object):
         if self.is_annotation():
             package_annotations = self.parse_annotations()
 
-        if self.try_accept('package'):
+        if self.try_accept1('package'):
             self.tokens.pop_marker(False)
             
             token = self.tokens.look()
@@ -286,12 +448,12 @@ class Parser(object):
                                               documentation=javadoc)
             package._position = token.position
             
-            self.accept(';')
+            self.accept1(';')
         else:
             self.tokens.pop_marker(True)
             package_annotations = None
 
-        while self.would_accept('import'):
+        while self.would_accept1('import'):
             import_declaration = self.parse_import_declaration()
             import_declarations.append(import_declaration)
 
@@ -314,9 +476,9 @@ class Parser(object):
         static = False
         import_all = False
 
-        self.accept('import')
+        self.accept1('import')
 
-        if self.try_accept('static'):
+        if self.try_accept1('static'):
             static = True
 
         import_position = self.tokens.look().position
@@ -325,14 +487,14 @@ class Parser(object):
             identifier = self.parse_identifier()
             qualified_identifier.append(identifier)
 
-            if self.try_accept('.'):
-                if self.try_accept('*'):
-                    self.accept(';')
+            if self.try_accept1('.'):
+                if self.try_accept1('*'):
+                    self.accept1(';')
                     import_all = True
                     break
 
             else:
-                self.accept(';')
+                self.accept1(';')
                 break
 
         import_node = tree.Import(path='.'.join(qualified_identifier),
@@ -345,7 +507,7 @@ class Parser(object):
 
     @parse_debug
     def parse_type_declaration(self):
-        if self.try_accept(';'):
+        if self.try_accept1(';'):
             return None
         else:
             return self.parse_class_or_interface_declaration()
@@ -385,19 +547,19 @@ class Parser(object):
         implements = None
         body = None
 
-        self.accept('class')
+        self.accept1('class')
 
         name_position = self.tokens.look().position
 
         name = self.parse_identifier()
 
-        if self.would_accept('<'):
+        if self.would_accept1('<'):
             type_params = self.parse_type_parameters()
 
-        if self.try_accept('extends'):
+        if self.try_accept1('extends'):
             extends = self.parse_type()
 
-        if self.try_accept('implements'):
+        if self.try_accept1('implements'):
             implements = self.parse_type_list()
 
         body = self.parse_class_body()
@@ -418,12 +580,12 @@ class Parser(object):
         implements = None
         body = None
 
-        self.accept('enum')
+        self.accept1('enum')
 
         enum_position = self.tokens.look().position
         name = self.parse_identifier()
 
-        if self.try_accept('implements'):
+        if self.try_accept1('implements'):
             implements = self.parse_type_list()
 
         body = self.parse_enum_body()
@@ -443,14 +605,14 @@ class Parser(object):
         extends = None
         body = None
 
-        self.accept('interface')
+        self.accept1('interface')
         name_position = self.tokens.look().position
         name = self.parse_identifier()
 
-        if self.would_accept('<'):
+        if self.would_accept1('<'):
             type_parameters = self.parse_type_parameters()
 
-        if self.try_accept('extends'):
+        if self.try_accept1('extends'):
             extends = self.parse_type_list()
 
         body = self.parse_interface_body()
@@ -501,7 +663,7 @@ class Parser(object):
 
     @parse_debug
     def parse_basic_type(self):
-        return tree.BasicType(name=self.accept(BasicType))
+        return tree.BasicType(name=self.accept1(BasicType))
 
     @parse_debug
     def parse_reference_type(self):
@@ -516,10 +678,10 @@ class Parser(object):
             tail.name = self.parse_identifier()
             tail._position = name_position
 
-            if self.would_accept('<'):
+            if self.would_accept1('<'):
                 tail.arguments = self.parse_type_arguments()
 
-            if self.try_accept('.'):
+            if self.try_accept1('.'):
                 tail.sub_type = tree.ReferenceType()
                 # Added functionality to include position with reference type
                 tail.sub_type._position = self.tokens.look().position
@@ -533,16 +695,16 @@ class Parser(object):
     def parse_type_arguments(self):
         type_arguments = list()
 
-        self.accept('<')
+        self.accept1('<')
 
         while True:
             type_argument = self.parse_type_argument()
             type_arguments.append(type_argument)
 
-            if self.try_accept('>'):
+            if self.try_accept1('>'):
                 break
 
-            self.accept(',')
+            self.accept1(',')
 
         return type_arguments
 
@@ -551,13 +713,13 @@ class Parser(object):
         pattern_type = None
         base_type = None
 
-        if self.try_accept('?'):
+        if self.try_accept1('?'):
             if self.tokens.look().value in ('extends', 'super'):
                 pattern_type = self.tokens.next().value
             else:
                 return tree.TypeArgument(pattern_type='?')
 
-        if self.would_accept(BasicType):
+        if self.would_accept1(BasicType):
             base_type = self.parse_basic_type()
             self.accept('[', ']')
             base_type.dimensions = [None]
@@ -572,9 +734,9 @@ class Parser(object):
 
     @parse_debug
     def parse_nonwildcard_type_arguments(self):
-        self.accept('<')
+        self.accept1('<')
         type_arguments = self.parse_type_list()
-        self.accept('>')
+        self.accept1('>')
 
         return [tree.TypeArgument(type=t) for t in type_arguments]
 
@@ -583,7 +745,7 @@ class Parser(object):
         types = list()
 
         while True:
-            if self.would_accept(BasicType):
+            if self.would_accept1(BasicType):
                 base_type = self.parse_basic_type()
                 self.accept('[', ']')
                 base_type.dimensions = [None]
@@ -594,7 +756,7 @@ class Parser(object):
             base_type.dimensions += self.parse_array_dimension()
             types.append(base_type)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return types
@@ -617,16 +779,16 @@ class Parser(object):
     def parse_type_parameters(self):
         type_parameters = list()
 
-        self.accept('<')
+        self.accept1('<')
 
         while True:
             type_parameter = self.parse_type_parameter()
             type_parameters.append(type_parameter)
 
-            if self.try_accept('>'):
+            if self.try_accept1('>'):
                 break
             else:
-                self.accept(',')
+                self.accept1(',')
 
         return type_parameters
 
@@ -635,14 +797,14 @@ class Parser(object):
         identifier = self.parse_identifier()
         extends = None
 
-        if self.try_accept('extends'):
+        if self.try_accept1('extends'):
             extends = list()
 
             while True:
                 reference_type = self.parse_reference_type()
                 extends.append(reference_type)
 
-                if not self.try_accept('&'):
+                if not self.try_accept1('&'):
                     break
 
         return tree.TypeParameter(name=identifier,
@@ -672,8 +834,8 @@ class Parser(object):
 
         while True:
             token = self.tokens.look()
-            if self.would_accept(Modifier):
-                modifiers.add(self.accept(Modifier))
+            if self.would_accept1(Modifier):
+                modifiers.add(self.accept1(Modifier))
 
             elif self.is_annotation():
                 annotation = self.parse_annotation()
@@ -706,13 +868,13 @@ class Parser(object):
         qualified_identifier = None
         annotation_element = None
 
-        self.accept('@')
+        self.accept1('@')
         qualified_identifier = self.parse_qualified_identifier()
 
-        if self.try_accept('('):
-            if not self.would_accept(')'):
+        if self.try_accept1('('):
+            if not self.would_accept1(')'):
                 annotation_element = self.parse_annotation_element()
-            self.accept(')')
+            self.accept1(')')
 
         return tree.Annotation(name=qualified_identifier,
                                element=annotation_element)
@@ -734,7 +896,7 @@ class Parser(object):
             pair._position = token.position
             pairs.append(pair)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return pairs
@@ -742,7 +904,7 @@ class Parser(object):
     @parse_debug
     def parse_element_value_pair(self):
         identifier = self.parse_identifier()
-        self.accept('=')
+        self.accept1('=')
         value = self.parse_element_value()
 
         return tree.ElementValuePair(name=identifier,
@@ -756,7 +918,7 @@ class Parser(object):
             annotation._position = token.position
             return annotation
 
-        elif self.would_accept('{'):
+        elif self.would_accept1('{'):
             return self.parse_element_value_array_initializer()
 
         else:
@@ -764,14 +926,14 @@ class Parser(object):
 
     @parse_debug
     def parse_element_value_array_initializer(self):
-        self.accept('{')
+        self.accept1('{')
 
-        if self.try_accept('}'):
+        if self.try_accept1('}'):
             return list()
 
         element_values = self.parse_element_values()
-        self.try_accept(',')
-        self.accept('}')
+        self.try_accept1(',')
+        self.accept1('}')
 
         return tree.ElementArrayValue(values=element_values)
 
@@ -783,10 +945,10 @@ class Parser(object):
             element_value = self.parse_element_value()
             element_values.append(element_value)
 
-            if self.would_accept('}') or self.would_accept(',', '}'):
+            if self.would_accept1('}') or self.would_accept(',', '}'):
                 break
 
-            self.accept(',')
+            self.accept1(',')
 
         return element_values
 
@@ -797,14 +959,14 @@ class Parser(object):
     def parse_class_body(self):
         declarations = list()
 
-        self.accept('{')
+        self.accept1('{')
 
-        while not self.would_accept('}'):
+        while not self.would_accept1('}'):
             declaration = self.parse_class_body_declaration()
             if declaration:
                 declarations.append(declaration)
 
-        self.accept('}')
+        self.accept1('}')
 
         return declarations
 
@@ -812,14 +974,14 @@ class Parser(object):
     def parse_class_body_declaration(self):
         token = self.tokens.look()
 
-        if self.try_accept(';'):
+        if self.try_accept1(';'):
             return None
 
         elif self.would_accept('static', '{'):
-            self.accept('static')
+            self.accept1('static')
             return self.parse_block()
 
-        elif self.would_accept('{'):
+        elif self.would_accept1('{'):
             return self.parse_block()
 
         else:
@@ -832,7 +994,7 @@ class Parser(object):
         member = None
 
         token = self.tokens.look()
-        if self.try_accept('void'):
+        if self.try_accept1('void'):
             method_position = self.tokens.look().position
             method_name = self.parse_identifier()
             member = self.parse_void_method_declarator_rest()
@@ -896,11 +1058,11 @@ class Parser(object):
     def parse_method_or_field_rest(self, name_pos):
         token = self.tokens.look()
         
-        if self.would_accept('('):
+        if self.would_accept1('('):
             return self.parse_method_declarator_rest()
         else:
             rest = self.parse_field_declarators_rest(name_pos)
-            self.accept(';')
+            self.accept1(';')
             return rest
 
     @parse_debug
@@ -910,7 +1072,7 @@ class Parser(object):
                                                initializer=initializer)]
         declarators[0]._position = name_pos
 
-        while self.try_accept(','):
+        while self.try_accept1(','):
             declarator = self.parse_variable_declarator()
             declarators.append(declarator)
 
@@ -926,13 +1088,13 @@ class Parser(object):
         throws = None
         body = None
 
-        if self.try_accept('throws'):
+        if self.try_accept1('throws'):
             throws = self.parse_qualified_identifier_list()
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             body = self.parse_block()
         else:
-            self.accept(';')
+            self.accept1(';')
 
         method_declaration = tree.MethodDeclaration(parameters=formal_parameters,
                                      throws=throws,
@@ -947,13 +1109,13 @@ class Parser(object):
         throws = None
         body = None
 
-        if self.try_accept('throws'):
+        if self.try_accept1('throws'):
             throws = self.parse_qualified_identifier_list()
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             body = self.parse_block()
         else:
-            self.accept(';')
+            self.accept1(';')
 
         method_declaration = tree.MethodDeclaration(parameters=formal_parameters,
                                       throws=throws,
@@ -967,7 +1129,7 @@ class Parser(object):
         throws = None
         body = None
 
-        if self.try_accept('throws'):
+        if self.try_accept1('throws'):
             throws = self.parse_qualified_identifier_list()
 
         body = self.parse_block()
@@ -989,7 +1151,7 @@ class Parser(object):
             method = self.parse_constructor_declarator_rest()
             method.name = constructor_name
             method._position = constructor_position
-        elif self.try_accept('void'):
+        elif self.try_accept1('void'):
             method_position = self.tokens.look().position
             method_name = self.parse_identifier()
             method = self.parse_void_method_declarator_rest()
@@ -1019,19 +1181,19 @@ class Parser(object):
     def parse_interface_body(self):
         declarations = list()
 
-        self.accept('{')
-        while not self.would_accept('}'):
+        self.accept1('{')
+        while not self.would_accept1('}'):
             declaration = self.parse_interface_body_declaration()
 
             if declaration:
                 declarations.append(declaration)
-        self.accept('}')
+        self.accept1('}')
 
         return declarations
 
     @parse_debug
     def parse_interface_body_declaration(self):
-        if self.try_accept(';'):
+        if self.try_accept1(';'):
             return None
 
         modifier_position = self.tokens.look().position
@@ -1050,17 +1212,17 @@ class Parser(object):
         declaration = None
 
         token = self.tokens.look()
-        if self.would_accept('class'):
+        if self.would_accept1('class'):
             declaration = self.parse_normal_class_declaration()
-        elif self.would_accept('interface'):
+        elif self.would_accept1('interface'):
             declaration = self.parse_normal_interface_declaration()
-        elif self.would_accept('enum'):
+        elif self.would_accept1('enum'):
             declaration = self.parse_enum_declaration()
         elif self.is_annotation_declaration():
             declaration = self.parse_annotation_type_declaration()
-        elif self.would_accept('<'):
+        elif self.would_accept1('<'):
             declaration = self.parse_interface_generic_method_declarator()
-        elif self.try_accept('void'):
+        elif self.try_accept1('void'):
             method_name_location = self.tokens.look().position
             method_name = self.parse_identifier()
             declaration = self.parse_void_interface_method_declarator_rest()
@@ -1095,11 +1257,11 @@ class Parser(object):
     def parse_interface_method_or_field_rest(self):
         rest = None
 
-        if self.would_accept('('):
+        if self.would_accept1('('):
             rest = self.parse_interface_method_declarator_rest()
         else:
             rest = self.parse_constant_declarators_rest()
-            self.accept(';')
+            self.accept1(';')
 
         return rest
 
@@ -1109,7 +1271,7 @@ class Parser(object):
         declarators = [tree.VariableDeclarator(dimensions=array_dimension,
                                                initializer=initializer)]
 
-        while self.try_accept(','):
+        while self.try_accept1(','):
             declarator = self.parse_constant_declarator()
             declarators.append(declarator)
 
@@ -1118,7 +1280,7 @@ class Parser(object):
     @parse_debug
     def parse_constant_declarator_rest(self):
         array_dimension = self.parse_array_dimension()
-        self.accept('=')
+        self.accept1('=')
         initializer = self.parse_variable_initializer()
 
         return (array_dimension, initializer)
@@ -1142,13 +1304,13 @@ class Parser(object):
         throws = None
         body = None
 
-        if self.try_accept('throws'):
+        if self.try_accept1('throws'):
             throws = self.parse_qualified_identifier_list()
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             body = self.parse_block()
         else:
-            self.accept(';')
+            self.accept1(';')
 
         method_declaration = tree.MethodDeclaration(parameters=parameters,
                                       throws=throws,
@@ -1163,13 +1325,13 @@ class Parser(object):
         throws = None
         body = None
 
-        if self.try_accept('throws'):
+        if self.try_accept1('throws'):
             throws = self.parse_qualified_identifier_list()
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             body = self.parse_block()
         else:
-            self.accept(';')
+            self.accept1(';')
 
         method_declaration = tree.MethodDeclaration(parameters=parameters,
                                       throws=throws,
@@ -1183,7 +1345,7 @@ class Parser(object):
         return_type = None
         method_name = None
 
-        if not self.try_accept('void'):
+        if not self.try_accept1('void'):
             return_type = self.parse_type()
 
         method_name_position = self.tokens.look().position
@@ -1203,9 +1365,9 @@ class Parser(object):
     def parse_formal_parameters(self):
         formal_parameters = list()
 
-        self.accept('(')
+        self.accept1('(')
 
-        if self.try_accept(')'):
+        if self.try_accept1(')'):
             return formal_parameters
 
         while True:
@@ -1215,7 +1377,7 @@ class Parser(object):
             parameter_type = self.parse_type()
             varargs = False
 
-            if self.try_accept('...'):
+            if self.try_accept1('...'):
                 varargs = True
 
             identifier_position = self.tokens.look().position
@@ -1236,10 +1398,10 @@ class Parser(object):
                 # varargs parameter must be the last
                 break
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
-        self.accept(')')
+        self.accept1(')')
 
         return formal_parameters
 
@@ -1250,7 +1412,7 @@ class Parser(object):
 
         while True:
             token = self.tokens.look()
-            if self.try_accept('final'):
+            if self.try_accept1('final'):
                 modifiers.add('final')
             elif self.is_annotation():
                 annotation = self.parse_annotation()
@@ -1269,7 +1431,7 @@ class Parser(object):
             declarator = self.parse_variable_declator()
             declarators.append(declarator)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return declarators
@@ -1282,7 +1444,7 @@ class Parser(object):
             declarator = self.parse_variable_declarator()
             declarators.append(declarator)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return declarators
@@ -1305,14 +1467,14 @@ class Parser(object):
         array_dimension = self.parse_array_dimension()
         initializer = None
 
-        if self.try_accept('='):
+        if self.try_accept1('='):
             initializer = self.parse_variable_initializer()
 
         return (array_dimension, initializer)
 
     @parse_debug
     def parse_variable_initializer(self):
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             return self.parse_array_initializer()
         else:
             return self.parse_expression()
@@ -1321,23 +1483,23 @@ class Parser(object):
     def parse_array_initializer(self):
         array_initializer = tree.ArrayInitializer(initializers=list())
 
-        self.accept('{')
+        self.accept1('{')
 
-        if self.try_accept(','):
-            self.accept('}')
+        if self.try_accept1(','):
+            self.accept1('}')
             return array_initializer
 
-        if self.try_accept('}'):
+        if self.try_accept1('}'):
             return array_initializer
 
         while True:
             initializer = self.parse_variable_initializer()
             array_initializer.initializers.append(initializer)
 
-            if not self.would_accept('}'):
-                self.accept(',')
+            if not self.would_accept1('}'):
+                self.accept1(',')
 
-            if self.try_accept('}'):
+            if self.try_accept1('}'):
                 return array_initializer
 
 # ------------------------------------------------------------------------------
@@ -1347,12 +1509,12 @@ class Parser(object):
     def parse_block(self):
         statements = list()
 
-        self.accept('{')
+        self.accept1('{')
 
-        while not self.would_accept('}'):
+        while not self.would_accept1('}'):
             statement = self.parse_block_statement()
             statements.append(statement)
-        self.accept('}')
+        self.accept1('}')
 
         return statements
 
@@ -1362,7 +1524,7 @@ class Parser(object):
             # Labeled statement
             return self.parse_statement()
 
-        if self.would_accept('synchronized'):
+        if self.would_accept1('synchronized'):
             return self.parse_statement()
 
         token = None
@@ -1419,14 +1581,13 @@ class Parser(object):
 
         # We can't easily determine the statement type. Try parsing as a variable
         # declaration first and fall back to a statement
-        try:
-            with self.tokens:
-                statement = self.parse_local_variable_declaration_statement()
-                statement._position = token.position
-                return statement
-        except JavaSyntaxError:
+        statement = self.speculate('parse_local_variable_declaration_statement')
+        if statement is SPECULATION_FAILED:
             return self.parse_statement()
 
+        statement._position = token.position
+        return statement
+
     @parse_debug
     def parse_local_variable_declaration_statement(self):
         modifiers, annotations = self.parse_variable_modifiers()
@@ -1436,7 +1597,7 @@ class Parser(object):
         var_position = self.tokens.look().position
 
         declarators = self.parse_variable_declarators()
-        self.accept(';')
+        self.accept1(';')
 
         var = tree.LocalVariableDeclaration(modifiers=modifiers,
                                             annotations=annotations,
@@ -1451,20 +1612,20 @@ class Parser(object):
     @parse_debug
     def parse_statement(self):
         token = self.tokens.look()
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             block = self.parse_block()
             statement = tree.BlockStatement(statements=block)
             statement._position = token.position
             return statement
 
-        elif self.try_accept(';'):
+        elif self.try_accept1(';'):
             statement = tree.Statement()
             statement._position = token.position
             return statement
 
         elif self.would_accept(Identifier, ':'):
             identifer = self.parse_identifier()
-            self.accept(':')
+            self.accept1(':')
 
             statement = self.parse_statement()
             statement.label = identifer
@@ -1472,12 +1633,12 @@ class Parser(object):
 
             return statement
 
-        elif self.try_accept('if'):
+        elif self.try_accept1('if'):
             condition = self.parse_par_expression()
             then = self.parse_statement()
             else_statement = None
 
-            if self.try_accept('else'):
+            if self.try_accept1('else'):
                 else_statement = self.parse_statement()
 
             statement = tree.IfStatement(condition=condition,
@@ -1486,30 +1647,30 @@ class Parser(object):
             statement._position = token.position
             return statement
 
-        elif self.try_accept('assert'):
+        elif self.try_accept1('assert'):
             condition = self.parse_expression()
             value = None
 
-            if self.try_accept(':'):
+            if self.try_accept1(':'):
                 value = self.parse_expression()
 
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.AssertStatement(condition=condition, value=value)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('switch'):
+        elif self.try_accept1('switch'):
             switch_expression = self.parse_par_expression()
-            self.accept('{')
+            self.accept1('{')
             switch_block = self.parse_switch_block_statement_groups()
-            self.accept('}')
+            self.accept1('}')
 
             statement = tree.SwitchStatement(expression=switch_expression, cases=switch_block)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('while'):
+        elif self.try_accept1('while'):
             condition = self.parse_par_expression()
             action = self.parse_statement()
 
@@ -1517,71 +1678,71 @@ class Parser(object):
             statement._position = token.position
             return statement
 
-        elif self.try_accept('do'):
+        elif self.try_accept1('do'):
             action = self.parse_statement()
-            self.accept('while')
+            self.accept1('while')
             condition = self.parse_par_expression()
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.DoStatement(condition=condition, body=action)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('for'):
-            self.accept('(')
+        elif self.try_accept1('for'):
+            self.accept1('(')
             for_control = self.parse_for_control()
-            self.accept(')')
+            self.accept1(')')
             for_statement = self.parse_statement()
 
             statement = tree.ForStatement(control=for_control, body=for_statement)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('break'):
+        elif self.try_accept1('break'):
             label = None
 
-            if self.would_accept(Identifier):
+            if self.would_accept1(Identifier):
                 label = self.parse_identifier()
 
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.BreakStatement(goto=label)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('continue'):
+        elif self.try_accept1('continue'):
             label = None
 
-            if self.would_accept(Identifier):
+            if self.would_accept1(Identifier):
                 label = self.parse_identifier()
 
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.ContinueStatement(goto=label)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('return'):
+        elif self.try_accept1('return'):
             value = None
 
-            if not self.would_accept(';'):
+            if not self.would_accept1(';'):
                 value = self.parse_expression()
 
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.ReturnStatement(expression=value)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('throw'):
+        elif self.try_accept1('throw'):
             value = self.parse_expression()
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.ThrowStatement(expression=value)
             statement._position = token.position
             return statement
 
-        elif self.try_accept('synchronized'):
+        elif self.try_accept1('synchronized'):
             lock = self.parse_par_expression()
             block = self.parse_block()
 
@@ -1589,19 +1750,19 @@ class Parser(object):
             statement._position = token.position
             return statement
 
-        elif self.try_accept('try'):
+        elif self.try_accept1('try'):
             resource_specification = None
             block = None
             catches = None
             finally_block = None
 
-            if self.would_accept('{'):
+            if self.would_accept1('{'):
                 block = self.parse_block()
 
-                if self.would_accept('catch'):
+                if self.would_accept1('catch'):
                     catches = self.parse_catches()
 
-                if self.try_accept('finally'):
+                if self.try_accept1('finally'):
                     finally_block = self.parse_block()
 
                 if catches == None and finally_block == None:
@@ -1611,10 +1772,10 @@ class Parser(object):
                 resource_specification = self.parse_resource_specification()
                 block = self.parse_block()
 
-                if self.would_accept('catch'):
+                if self.would_accept1('catch'):
                     catches = self.parse_catches()
 
-                if self.try_accept('finally'):
+                if self.try_accept1('finally'):
                     finally_block = self.parse_block()
 
             statement = tree.TryStatement(resources=resource_specification,
@@ -1626,7 +1787,7 @@ class Parser(object):
 
         else:
             expression = self.parse_expression()
-            self.accept(';')
+            self.accept1(';')
 
             statement = tree.StatementExpression(expression=expression)
             statement._position = token.position
@@ -1643,7 +1804,7 @@ class Parser(object):
             catch = self.parse_catch_clause()
             catches.append(catch)
 
-            if not self.would_accept('catch'):
+            if not self.would_accept1('catch'):
                 break
 
         return catches
@@ -1660,14 +1821,14 @@ class Parser(object):
             catch_type = self.parse_qualified_identifier()
             catch_parameter.types.append(catch_type)
 
-            if not self.try_accept('|'):
+            if not self.try_accept1('|'):
                 break
 
         name_position = self.tokens.look().position
         catch_parameter.name = self.parse_identifier()
         catch_parameter._position = name_position
 
-        self.accept(')')
+        self.accept1(')')
         block = self.parse_block()
 
         return tree.CatchClause(parameter=catch_parameter, block=block)
@@ -1676,16 +1837,16 @@ class Parser(object):
     def parse_resource_specification(self):
         resources = list()
 
-        self.accept('(')
+        self.accept1('(')
 
         while True:
             resource = self.parse_resource()
             resources.append(resource)
 
-            if not self.would_accept(')'):
-                self.accept(';')
+            if not self.would_accept1(')'):
+                self.accept1(';')
 
-            if self.try_accept(')'):
+            if self.try_accept1(')'):
                 break
 
         return resources
@@ -1697,7 +1858,7 @@ class Parser(object):
         reference_type.dimensions = self.parse_array_dimension()
         name = self.parse_identifier()
         reference_type.dimensions += self.parse_array_dimension()
-        self.accept('=')
+        self.accept1('=')
         value = self.parse_expression()
 
         try_resource = tree.TryResource(modifiers=modifiers,
@@ -1742,7 +1903,7 @@ class Parser(object):
             elif not case_type == 'default':
                 self.illegal("Expected switch case")
 
-            self.accept(':')
+            self.accept1(':')
 
             if self.tokens.look().value not in ('case', 'default'):
                 break
@@ -1757,26 +1918,24 @@ class Parser(object):
     def parse_for_control(self):
         # Try for_var_control and fall back to normal three part for control
 
-        try:
-            with self.tokens:
-                return self.parse_for_var_control()
-        except JavaSyntaxError:
-            pass
+        for_var_control = self.speculate('parse_for_var_control')
+        if for_var_control is not SPECULATION_FAILED:
+            return for_var_control
 
         init = None
-        if not self.would_accept(';'):
+        if not self.would_accept1(';'):
             init = self.parse_for_init_or_update()
 
-        self.accept(';')
+        self.accept1(';')
 
         condition = None
-        if not self.would_accept(';'):
+        if not self.would_accept1(';'):
             condition = self.parse_expression()
 
-        self.accept(';')
+        self.accept1(';')
 
         update = None
-        if not self.would_accept(')'):
+        if not self.would_accept1(')'):
             update = self.parse_for_init_or_update()
 
         return tree.ForControl(init=init,
@@ -1819,24 +1978,24 @@ class Parser(object):
 
     @parse_debug
     def parse_for_var_control_rest(self):
-        if self.try_accept(':'):
+        if self.try_accept1(':'):
             expression = self.parse_expression()
             return expression
 
         declarators = None
-        if not self.would_accept(';'):
+        if not self.would_accept1(';'):
             declarators = self.parse_for_variable_declarator_rest()
         else:
             declarators = [tree.VariableDeclarator()]
-        self.accept(';')
+        self.accept1(';')
 
         condition = None
-        if not self.would_accept(';'):
+        if not self.would_accept1(';'):
             condition = self.parse_expression()
-        self.accept(';')
+        self.accept1(';')
 
         update = None
-        if not self.would_accept(')'):
+        if not self.would_accept1(')'):
             update = self.parse_for_init_or_update()
 
         return (declarators, condition, update)
@@ -1845,12 +2004,12 @@ class Parser(object):
     def parse_for_variable_declarator_rest(self):
         initializer = None
 
-        if self.try_accept('='):
+        if self.try_accept1('='):
             initializer = self.parse_variable_initializer()
 
         declarators = [tree.VariableDeclarator(initializer=initializer)]
 
-        while self.try_accept(','):
+        while self.try_accept1(','):
             declarator = self.parse_variable_declarator()
             declarators.append(declarator)
 
@@ -1864,7 +2023,7 @@ class Parser(object):
             expression = self.parse_expression()
             expressions.append(expression)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
         return expressions
@@ -1893,19 +2052,19 @@ class Parser(object):
         true_expression = None
         false_expression = None
 
-        if self.try_accept('?'):
+        if self.try_accept1('?'):
             true_expression = self.parse_expression()
-            self.accept(':')
+            self.accept1(':')
             false_expression = self.parse_expressionl()
 
             return tree.TernaryExpression(condition=expression_2,
                                           if_true=true_expression,
                                           if_false=false_expression)
-        if self.would_accept('->'):
+        if self.would_accept1('->'):
             body = self.parse_lambda_method_body()
             return tree.LambdaExpression(parameters=[expression_2],
                                          body=body)
-        if self.try_accept('::'):
+        if self.try_accept1('::'):
             method_reference, type_arguments = self.parse_method_reference()
             return tree.MethodReference(
                 expression=expression_2,
@@ -1930,7 +2089,7 @@ class Parser(object):
 
         token = self.tokens.look()
         while token.value in Operator.INFIX or token.value == 'instanceof':
-            if self.try_accept('instanceof'):
+            if self.try_accept1('instanceof'):
                 comparison_type = self.parse_type()
                 parts.extend(('instanceof', comparison_type))
             else:
@@ -1946,30 +2105,20 @@ class Parser(object):
 # -- Expression operators --
 
     @parse_debug
+    @parse_memo
     def parse_expression_3(self):
         prefix_operators = list()
         while self.tokens.look().value in Operator.PREFIX:
             prefix_operators.append(self.tokens.next().value)
 
-        if self.would_accept('('):
-            try:
-                with self.tokens:
-                        lambda_exp = self.parse_lambda_expression()
-                        if lambda_exp:
-                            return lambda_exp
-            except JavaSyntaxError:
-                pass
-            try:
-                with self.tokens:
-                    self.accept('(')
-                    cast_target = self.parse_type()
-                    self.accept(')')
-                    expression = self.parse_expression_3()
+        if self.would_accept1('('):
+            lambda_exp = self.speculate('parse_lambda_expression')
+            if lambda_exp is not SPECULATION_FAILED:
+                return lambda_exp
 
-                    return tree.Cast(type=cast_target,
-                                     expression=expression)
-            except JavaSyntaxError:
-                pass
+            cast = self.speculate('parse_cast')
+            if cast is not SPECULATION_FAILED:
+                return cast
 
         primary = self.parse_primary()
         primary.prefix_operators = prefix_operators
@@ -1978,7 +2127,7 @@ class Parser(object):
         primary.postfix_operators = list()
 
         token = self.tokens.look()
-        while token.value in '[.':
+        while token.value in ('[', '.'):
             selector = self.parse_selector()
             # selector._position = token.position
             primary.selectors.append(selector)
@@ -1991,13 +2140,23 @@ class Parser(object):
 
         return primary
 
+    @parse_debug
+    def parse_cast(self):
+        self.accept1('(')
+        cast_target = self.parse_type()
+        self.accept1(')')
+        expression = self.parse_expression_3()
+
+        return tree.Cast(type=cast_target,
+                         expression=expression)
+
     @parse_debug
     def parse_method_reference(self):
         type_arguments = list()
-        if self.would_accept('<'):
+        if self.would_accept1('<'):
             type_arguments = self.parse_nonwildcard_type_arguments()
-        if self.would_accept('new'):
-            method_reference = tree.MemberReference(member=self.accept('new'))
+        if self.would_accept1('new'):
+            method_reference = tree.MemberReference(member=self.accept1('new'))
         else:
             method_reference = self.parse_expression()
         return method_reference, type_arguments
@@ -2007,13 +2166,13 @@ class Parser(object):
         lambda_expr = None
         parameters = None
         if self.would_accept('(', Identifier, ','):
-            self.accept('(')
+            self.accept1('(')
             parameters = []
-            while not self.would_accept(')'):
+            while not self.would_accept1(')'):
                 parameters.append(tree.InferredFormalParameter(
                     name=self.parse_identifier()))
-                self.try_accept(',')
-            self.accept(')')
+                self.try_accept1(',')
+            self.accept1(')')
         else:
             parameters = self.parse_formal_parameters()
         body = self.parse_lambda_method_body()
@@ -2022,23 +2181,23 @@ class Parser(object):
 
     @parse_debug
     def parse_lambda_method_body(self):
-        if self.accept('->'):
-            if self.would_accept('{'):
+        if self.accept1('->'):
+            if self.would_accept1('{'):
                 return self.parse_block()
             else:
                 return self.parse_expression()
 
     @parse_debug
     def parse_infix_operator(self):
-        operator = self.accept(Operator)
+        operator = self.accept1(Operator)
 
         if not operator in Operator.INFIX:
             self.illegal("Expected infix operator")
 
-        if operator == '>' and self.try_accept('>'):
+        if operator == '>' and self.try_accept1('>'):
             operator = '>>'
 
-            if self.try_accept('>'):
+            if self.try_accept1('>'):
                 operator = '>>>'
 
         return operator
@@ -2058,28 +2217,28 @@ class Parser(object):
         elif token.value == '(':
             return self.parse_par_expression()
 
-        elif self.try_accept('this'):
+        elif self.try_accept1('this'):
             arguments = None
 
-            if self.would_accept('('):
+            if self.would_accept1('('):
                 arguments = self.parse_arguments()
                 return tree.ExplicitConstructorInvocation(arguments=arguments)
 
             return tree.This()
         elif self.would_accept('super', '::'):
-            self.accept('super')
+            self.accept1('super')
             return token
-        elif self.try_accept('super'):
+        elif self.try_accept1('super'):
             super_suffix = self.parse_super_suffix()
             return super_suffix
 
-        elif self.try_accept('new'):
+        elif self.try_accept1('new'):
             return self.parse_creator()
 
         elif token.value == '<':
             type_arguments = self.parse_nonwildcard_type_arguments()
 
-            if self.try_accept('this'):
+            if self.try_accept1('this'):
                 arguments = self.parse_arguments()
                 return tree.ExplicitConstructorInvocation(type_arguments=type_arguments,
                                                           arguments=arguments)
@@ -2096,7 +2255,7 @@ class Parser(object):
             qualified_identifier = [self.parse_identifier()]
 
             while self.would_accept('.', Identifier):
-                self.accept('.')
+                self.accept1('.')
                 identifier = self.parse_identifier()
                 qualified_identifier.append(identifier)
 
@@ -2123,7 +2282,7 @@ class Parser(object):
 
             return tree.ClassReference(type=base_type)
 
-        elif self.try_accept('void'):
+        elif self.try_accept1('void'):
             self.accept('.', 'class')
             return tree.VoidClassReference()
 
@@ -2131,14 +2290,14 @@ class Parser(object):
 
     @parse_debug
     def parse_literal(self):
-        literal = self.accept(Literal)
+        literal = self.accept1(Literal)
         return tree.Literal(value=literal)
 
     @parse_debug
     def parse_par_expression(self):
-        self.accept('(')
+        self.accept1('(')
         expression = self.parse_expression()
-        self.accept(')')
+        self.accept1(')')
 
         return expression
 
@@ -2146,19 +2305,19 @@ class Parser(object):
     def parse_arguments(self):
         expressions = list()
 
-        self.accept('(')
+        self.accept1('(')
 
-        if self.try_accept(')'):
+        if self.try_accept1(')'):
             return expressions
 
         while True:
             expression = self.parse_expression()
             expressions.append(expression)
 
-            if not self.try_accept(','):
+            if not self.try_accept1(','):
                 break
 
-        self.accept(')')
+        self.accept1(')')
 
         return expressions
 
@@ -2168,13 +2327,13 @@ class Parser(object):
         type_arguments = None
         arguments = None
 
-        if self.try_accept('.'):
-            if self.would_accept('<'):
+        if self.try_accept1('.'):
+            if self.would_accept1('<'):
                 type_arguments = self.parse_nonwildcard_type_arguments()
 
             identifier = self.parse_identifier()
 
-            if self.would_accept('('):
+            if self.would_accept1('('):
                 arguments = self.parse_arguments()
         else:
             arguments = self.parse_arguments()
@@ -2192,7 +2351,7 @@ class Parser(object):
     def parse_explicit_generic_invocation_suffix(self):
         identifier = None
         arguments = None
-        if self.try_accept('super'):
+        if self.try_accept1('super'):
             return self.parse_super_suffix()
         else:
             identifier_position = self.tokens.look().position
@@ -2210,18 +2369,18 @@ class Parser(object):
     def parse_creator(self):
         constructor_type_arguments = None
 
-        if self.would_accept(BasicType):
+        if self.would_accept1(BasicType):
             created_name = self.parse_basic_type()
             rest = self.parse_array_creator_rest()
             rest.type = created_name
             return rest
 
-        if self.would_accept('<'):
+        if self.would_accept1('<'):
             constructor_type_arguments = self.parse_nonwildcard_type_arguments()
 
         created_name = self.parse_created_name()
 
-        if self.would_accept('['):
+        if self.would_accept1('['):
             if constructor_type_arguments:
                 self.illegal("Array creator not allowed with generic constructor type arguments")
 
@@ -2249,10 +2408,10 @@ class Parser(object):
             tail.name = self.parse_identifier()
             tail._position = name_position
 
-            if self.would_accept('<'):
+            if self.would_accept1('<'):
                 tail.arguments = self.parse_type_arguments_or_diamond()
 
-            if self.try_accept('.'):
+            if self.try_accept1('.'):
                 tail.sub_type = tree.ReferenceType()
 
                 # Added functionality to include position with reference type
@@ -2269,7 +2428,7 @@ class Parser(object):
         arguments = self.parse_arguments()
         class_body = None
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             class_body = self.parse_class_body()
 
         return (arguments, class_body)
@@ -2286,11 +2445,11 @@ class Parser(object):
         else:
             array_dimensions = list()
 
-            while self.would_accept('[') and not self.would_accept('[', ']'):
-                self.accept('[')
+            while self.would_accept1('[') and not self.would_accept('[', ']'):
+                self.accept1('[')
                 expression = self.parse_expression()
                 array_dimensions.append(expression)
-                self.accept(']')
+                self.accept1(']')
 
             array_dimensions += self.parse_array_dimension()
             return tree.ArrayCreator(dimensions=array_dimensions)
@@ -2302,7 +2461,7 @@ class Parser(object):
             self.accept('.', 'class')
             return tree.ClassReference(type=tree.Type(dimensions=array_dimension))
 
-        elif self.would_accept('('):
+        elif self.would_accept1('('):
             arguments = self.parse_arguments()
             return tree.MethodInvocation(arguments=arguments)
 
@@ -2319,7 +2478,7 @@ class Parser(object):
         elif self.try_accept('.', 'new'):
             type_arguments = None
 
-            if self.would_accept('<'):
+            if self.would_accept1('<'):
                 type_arguments = self.parse_nonwildcard_type_arguments()
 
             inner_creator = self.parse_inner_creator()
@@ -2352,7 +2511,7 @@ class Parser(object):
         identifier = self.parse_identifier()
         type_arguments = None
 
-        if self.would_accept('<'):
+        if self.would_accept1('<'):
             type_arguments = self.parse_nonwildcard_type_arguments_or_diamond()
 
         java_type = tree.ReferenceType(name=identifier,
@@ -2366,12 +2525,12 @@ class Parser(object):
 
     @parse_debug
     def parse_selector(self):
-        if self.try_accept('['):
+        if self.try_accept1('['):
             expression = self.parse_expression()
-            self.accept(']')
+            self.accept1(']')
             return tree.ArraySelector(index=expression)
 
-        elif self.try_accept('.'):
+        elif self.try_accept1('.'):
 
             token = self.tokens.look()
             if isinstance(token, Identifier):
@@ -2380,7 +2539,7 @@ class Parser(object):
                 identifier = self.tokens.next().value
                 arguments = None
 
-                if self.would_accept('('):
+                if self.would_accept1('('):
                     arguments = self.parse_arguments()
                     result = tree.MethodInvocation(member=identifier, arguments=arguments)
                     result._position = identifier_position
@@ -2390,18 +2549,18 @@ class Parser(object):
                     result._position = identifier_position
                     return result
             elif self.would_accept('super', '::'):
-                self.accept('super')
+                self.accept1('super')
                 return token
-            elif self.would_accept('<'):
+            elif self.would_accept1('<'):
                 return self.parse_explicit_generic_invocation()
-            elif self.try_accept('this'):
+            elif self.try_accept1('this'):
                 return tree.This()
-            elif self.try_accept('super'):
+            elif self.try_accept1('super'):
                 return self.parse_super_suffix()
-            elif self.try_accept('new'):
+            elif self.try_accept1('new'):
                 type_arguments = None
 
-                if self.would_accept('<'):
+                if self.would_accept1('<'):
                     type_arguments = self.parse_nonwildcard_type_arguments()
 
                 inner_creator = self.parse_inner_creator()
@@ -2419,24 +2578,24 @@ class Parser(object):
         constants = list()
         body_declarations = list()
 
-        self.accept('{')
+        self.accept1('{')
 
-        if not self.try_accept(','):
-            while not (self.would_accept(';') or self.would_accept('}')):
+        if not self.try_accept1(','):
+            while not (self.would_accept1(';') or self.would_accept1('}')):
                 constant = self.parse_enum_constant()
                 constants.append(constant)
 
-                if not self.try_accept(','):
+                if not self.try_accept1(','):
                     break
 
-        if self.try_accept(';'):
-            while not self.would_accept('}'):
+        if self.try_accept1(';'):
+            while not self.would_accept1('}'):
                 declaration = self.parse_class_body_declaration()
 
                 if declaration:
                     body_declarations.append(declaration)
 
-        self.accept('}')
+        self.accept1('}')
 
         return tree.EnumBody(constants=constants,
                              declarations=body_declarations)
@@ -2453,15 +2612,15 @@ class Parser(object):
         if next_token:
             javadoc = next_token.javadoc
 
-        if self.would_accept(Annotation):
+        if self.would_accept1(Annotation):
             annotations = self.parse_annotations()
 
         constant_name = self.parse_identifier()
 
-        if self.would_accept('('):
+        if self.would_accept1('('):
             arguments = self.parse_arguments()
 
-        if self.would_accept('{'):
+        if self.would_accept1('{'):
             body = self.parse_class_body()
 
         enum_constant_declaration = tree.EnumConstantDeclaration(annotations=annotations,
@@ -2476,9 +2635,9 @@ class Parser(object):
     def parse_annotation_type_body(self):
         declarations = None
 
-        self.accept('{')
+        self.accept1('{')
         declarations = self.parse_annotation_type_element_declarations()
-        self.accept('}')
+        self.accept1('}')
 
         return declarations
 
@@ -2486,7 +2645,7 @@ class Parser(object):
     def parse_annotation_type_element_declarations(self):
         declarations = list()
 
-        while not self.would_accept('}'):
+        while not self.would_accept1('}'):
             declaration = self.parse_annotation_type_element_declaration()
             declarations.append(declaration)
 
@@ -2499,11 +2658,11 @@ class Parser(object):
         declaration = None
 
         token = self.tokens.look()
-        if self.would_accept('class'):
+        if self.would_accept1('class'):
             declaration = self.parse_normal_class_declaration()
-        elif self.would_accept('interface'):
+        elif self.would_accept1('interface'):
             declaration = self.parse_normal_interface_declaration()
-        elif self.would_accept('enum'):
+        elif self.would_accept1('enum'):
             declaration = self.parse_enum_declaration()
         elif self.is_annotation_declaration():
             declaration = self.parse_annotation_type_declaration()
@@ -2512,7 +2671,7 @@ class Parser(object):
             name_position = self.tokens.look().position
             attribute_name = self.parse_identifier()
             declaration = self.parse_annotation_method_or_constant_rest()
-            self.accept(';')
+            self.accept1(';')
 
             if isinstance(declaration, tree.AnnotationMethod):
                 declaration.name = attribute_name
@@ -2533,13 +2692,13 @@ class Parser(object):
 
     @parse_debug
     def parse_annotation_method_or_constant_rest(self):
-        if self.try_accept('('):
-            self.accept(')')
+        if self.try_accept1('('):
+            self.accept1(')')
 
             array_dimension = self.parse_array_dimension()
             default = None
 
-            if self.try_accept('default'):
+            if self.try_accept1('default'):
                 default = self.parse_element_value()
 
             # Added functionality to include position with annotation method
@@ -0,0 +1,231 @@
+import io
+import pickle
+import unittest
+
+from .. import ast, parse, parser, tokenizer, tree
+
+
+SOURCE = """package a;
+
+public @interface A {
+    /** The value. */
+    int value() default (1);
+}
+
+class B {
+    int x = (a + b).c;
+}
+"""
+
+
+class NodeTest(unittest.TestCase):
+
+    """ Contains tests for the generated node classes. """
+
+    def test_slots(self):
+        """ tests that nodes keep their attrs in slots, not a __dict__. """
+        node = tree.MethodInvocation(member='m', arguments=[])
+
+        self.assertFalse(hasattr(node, '__dict__'))
+        self.assertEqual(node.member, 'm')
+        self.assertIsNone(node.qualifier)
+        self.assertIsNone(node.position)
+        self.assertFalse(hasattr(node, '_modifier_position'))
+
+    def test_extraneous_arguments(self):
+        with self.assertRaises(ValueError):
+            tree.Import(path='a', name='b')
+
+    def test_dump_load(self):
+        """ tests that parsed trees, including positions and values set
+            outside of the attrs, survive ast.dump and ast.load.
+        """
+        compilation_unit = parse.parse(SOURCE)
+        buf = io.BytesIO()
+        ast.dump(compilation_unit, buf)
+        buf.seek(0)
+        loaded = ast.load(buf)
+
+        self.assertEqual(repr(loaded), repr(compilation_unit))
+        for (_, expected), (_, node) in zip(compilation_unit, loaded):
+            self.assertEqual(node.position, expected.position)
+
+        method = loaded.types[0].body[0]
+        self.assertEqual(method.documentation, '/** The value. */')
+        self.assertEqual(method._modifier_position, (5, 5))
+        initializer = loaded.types[1].fields[0].declarators[0].initializer
+        self.assertEqual(initializer.selectors[0].member, 'c')
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copied = pickle.loads(pickle.dumps(method, protocol))
+            self.assertEqual(repr(copied), repr(method))
+            self.assertEqual(copied.documentation, method.documentation)
+
+
+class WalkTreeTest(unittest.TestCase):
+
+    """ Contains tests for the tree walkers. """
+
+    def test_order_and_paths(self):
+        """ tests that nodes are walked in pre-order with their enclosing
+            nodes and lists as the path.
+        """
+        statement = parse.parse_expression("a + b * c")
+        walked = list(ast.walk_tree(statement))
+
+        self.assertEqual([type(node).__name__ for _, node in walked],
+                         ['BinaryOperation', 'MemberReference',
+                          'BinaryOperation', 'MemberReference',
+                          'MemberReference'])
+        path, node = walked[4]
+        self.assertEqual(node.member, 'c')
+        self.assertEqual(path, (statement, walked[2][1]))
+
+        self.assertEqual(list(statement), walked)
+
+    def test_walkers_agree(self):
+        compilation_unit = parse.parse(SOURCE)
+        walked = list(compilation_unit)
+
+        self.assertEqual(list(ast.walk_nodes(compilation_unit)),
+                         [node for _, node in walked])
+
+        parents = list(ast.walk_parents(compilation_unit))
+        self.assertEqual(len(parents), len(walked))
+        for (parent, depth, node), (path, expected) in zip(parents, walked):
+            enclosing = [item for item in path if isinstance(item, ast.Node)]
+            self.assertIs(node, expected)
+            self.assertEqual(depth, len(enclosing))
+            self.assertIs(parent, enclosing[-1] if enclosing else None)
+
+    def test_walk_pair(self):
+        """ tests that walk_pair zips the pre-order of both trees. """
+        tree_1 = parse.parse(SOURCE)
+        tree_2 = parse.parse(SOURCE.replace('int x', 'int y'))
+        pairs = list(ast.walk_pair(tree_1, tree_2))
+
+        self.assertEqual(pairs, list(zip(ast.walk_nodes(tree_1),
+                                         ast.walk_nodes(tree_2))))
+
+        short = parse.parse_expression("a")
+        self.assertEqual(len(list(ast.walk_pair(tree_1, short))), 1)
+
+    def test_deep_tree(self):
+        """ tests walking a tree deeper than the recursion limit. """
+        expression = parse.parse_expression(' + '.join(['a'] * 5000))
+
+        self.assertEqual(len(list(expression)), 9999)
+        self.assertEqual(max(depth for _, depth, _ in
+                             ast.walk_parents(expression)), 4999)
+
+
+class ParentsTest(unittest.TestCase):
+
+    """ Contains tests for parent, depth and enclosing declaration links. """
+
+    def test_links(self):
+        code = """
+class A {
+    void m() {
+        new Object() { int n() { return x; } };
+    }
+}
+"""
+        compilation_unit = parse.parse(code, parents=True)
+
+        for parent, depth, node in ast.walk_parents(compilation_unit):
+            self.assertIs(node.parent, parent)
+            self.assertEqual(node.depth, depth)
+
+        class_declaration = compilation_unit.types[0]
+        method = class_declaration.methods[0]
+        self.assertIsNone(compilation_unit.enclosing_declaration)
+        self.assertIs(method.enclosing_declaration, class_declaration)
+        self.assertIs(class_declaration.enclosing_declaration, None)
+
+        _, reference = next(compilation_unit.filter(tree.MemberReference))
+        inner = reference.enclosing_declaration
+        self.assertEqual(inner.name, 'n')
+        self.assertIs(inner.enclosing_declaration, method)
+
+    def test_unlinked(self):
+        compilation_unit = parse.parse(SOURCE)
+
+        for _, node in compilation_unit:
+            self.assertIsNone(node.parent)
+            self.assertIsNone(node.depth)
+            self.assertIsNone(node.enclosing_declaration)
+
+    def test_members(self):
+        members = parse.parse_members("int x; void m() { y(); }", parents=True)
+
+        self.assertIsNone(members[1].parent)
+        self.assertEqual(members[1].depth, 0)
+        statement = members[1].body[0]
+        self.assertIs(statement.parent, members[1])
+        self.assertIs(statement.enclosing_declaration, members[1])
+
+    def test_reparse(self):
+        """ tests that an incrementally reparsed tree is linked again. """
+        source = SOURCE
+        tokens = tokenizer.tokenize_array(source)
+        previous_tree = parser.Parser(tokens, parents=True).parse()
+
+        start = source.index('a + b')
+        compilation_unit, _ = parse.reparse(previous_tree, tokens, source,
+                                            start, start + 1, 'aa')
+
+        self.assertIsNot(compilation_unit.types[1], previous_tree.types[1])
+        for parent, depth, node in ast.walk_parents(compilation_unit):
+            self.assertIs(node.parent, parent)
+            self.assertEqual(node.depth, depth)
+
+
+class NodeIndexTest(unittest.TestCase):
+
+    """ Contains tests for the node index of a compilation unit. """
+
+    def test_find(self):
+        """ tests that the index finds the nodes of a walk in order. """
+        compilation_unit = parse.parse(SOURCE)
+        index = compilation_unit.index
+
+        self.assertIs(compilation_unit.index, index)
+        for node_type in (tree.MemberReference, tree.Declaration,
+                          (tree.ClassDeclaration, tree.Literal)):
+            expected = [node for _, node in compilation_unit
+                        if isinstance(node, node_type)]
+            self.assertEqual(index.find(node_type), expected)
+        self.assertEqual(index.find(tree.SwitchStatement), [])
+
+    def test_between(self):
+        compilation_unit = parse.parse(SOURCE)
+        references = compilation_unit.index.between(tree.MemberReference,
+                                                    (9, 0), (10, 0))
+
+        self.assertEqual([reference.member for reference in references],
+                         ['a', 'b'])
+        self.assertEqual(compilation_unit.index.between(tree.MemberReference,
+                                                        (1, 0), (9, 0)), [])
+
+    def test_reparse(self):
+        """ tests that a reparsed tree gets an index of its own. """
+        source = SOURCE
+        tokens = tokenizer.tokenize_array(source)
+        previous_tree = parser.Parser(tokens).parse()
+        self.assertEqual(len(previous_tree.index.find(tree.MemberReference)), 2)
+
+        start = source.index('a + b')
+        compilation_unit, _ = parse.reparse(previous_tree, tokens, source,
+                                            start, start + 1, 'x.y + a')
+
+        members = [reference.member for reference in
+                   compilation_unit.index.find(tree.MemberReference)]
+        self.assertEqual(members, ['y', 'a', 'b'])
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+import unittest
+
+from .. import cache, parser, tokenizer, tree
+
+
+SOURCE = "class A { int x = 1; }"
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    """ Contains tests for the parse tree cache. """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_hits(self):
+        parse_cache = cache.ParseCache()
+        compilation_unit = parse_cache.parse(SOURCE)
+
+        self.assertIsInstance(compilation_unit, tree.CompilationUnit)
+        self.assertIs(parse_cache.parse(SOURCE), compilation_unit)
+        self.assertEqual(parse_cache.info(), cache.CacheInfo(1, 0, 1, 1, 16))
+
+        linked = parse_cache.parse(SOURCE, parents=True)
+        self.assertIsNot(linked, compilation_unit)
+        self.assertEqual(linked.depth, 0)
+        self.assertEqual(parse_cache.misses, 2)
+
+    def test_linked_hits(self):
+        """ tests that a linked tree is returned for an unlinked lookup. """
+        parse_cache = cache.ParseCache(directory=self.directory)
+        linked = parse_cache.parse(SOURCE, parents=True)
+        self.assertIs(parse_cache.parse(SOURCE), linked)
+        self.assertEqual(parse_cache.info(), cache.CacheInfo(1, 0, 1, 1, 16))
+
+        parse_cache = cache.ParseCache(directory=self.directory)
+        self.assertEqual(parse_cache.parse(SOURCE).depth, 0)
+        self.assertEqual(parse_cache.info(), cache.CacheInfo(0, 1, 0, 1, 16))
+
+    def test_eviction(self):
+        parse_cache = cache.ParseCache(maxsize=2)
+        first = parse_cache.parse("class A {}")
+        parse_cache.parse("class B {}")
+        parse_cache.parse("class A {}")
+        parse_cache.parse("class C {}")
+
+        self.assertIs(parse_cache.parse("class A {}"), first)
+        parse_cache.parse("class B {}")
+        self.assertEqual((parse_cache.hits, parse_cache.misses), (2, 4))
+        self.assertEqual(len(parse_cache.entries), 2)
+
+    def test_errors(self):
+        """ tests that failures are remembered and raised again. """
+        parse_cache = cache.ParseCache(directory=self.directory)
+
+        for _ in range(2):
+            with self.assertRaises(parser.JavaSyntaxError) as context:
+                parse_cache.parse("class A { int x = ; }")
+            self.assertEqual(context.exception.at.value, ';')
+
+            with self.assertRaises(tokenizer.LexerError):
+                parse_cache.parse("class A { char c = 'ab; }")
+
+        self.assertEqual((parse_cache.hits, parse_cache.misses), (2, 2))
+
+        parse_cache = cache.ParseCache(directory=self.directory)
+        with self.assertRaises(parser.JavaSyntaxError) as context:
+            parse_cache.parse("class A { int x = ; }")
+        self.assertEqual(context.exception.description, 'Expected expression')
+        self.assertEqual(context.exception.at.position, (1, 19))
+        self.assertEqual(parse_cache.disk_hits, 1)
+
+    def test_disk(self):
+        compilation_unit = cache.ParseCache(directory=self.directory).parse(SOURCE)
+
+        parse_cache = cache.ParseCache(directory=self.directory)
+        loaded = parse_cache.parse(SOURCE)
+        self.assertEqual(repr(loaded), repr(compilation_unit))
+        self.assertEqual(loaded.types[0].position, compilation_unit.types[0].position)
+        self.assertEqual(parse_cache.info(), cache.CacheInfo(0, 1, 0, 1, 16))
+
+        self.assertIs(parse_cache.parse(SOURCE), loaded)
+        self.assertEqual(parse_cache.hits, 1)
+
+    def test_clear(self):
+        parse_cache = cache.ParseCache()
+        compilation_unit = parse_cache.parse(SOURCE)
+        parse_cache.clear()
+
+        self.assertIsNot(parse_cache.parse(SOURCE), compilation_unit)
+        self.assertEqual(parse_cache.info(), cache.CacheInfo(0, 0, 1, 1, 16))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import unittest
+
+from .. import parse, tree
+
+
+class BinaryOperationTest(unittest.TestCase):
+
+    """ Contains tests for building binary operation trees. """
+
+    def assert_operation(self, node, operator, operandl, operandr):
+        self.assertIsInstance(node, tree.BinaryOperation)
+        self.assertEqual(node.operator, operator)
+        for operand, member in ((node.operandl, operandl),
+                                (node.operandr, operandr)):
+            if member is not None:
+                self.assertEqual(operand.member, member)
+
+    def test_precedence(self):
+        """ tests that tighter binding operators are grouped first. """
+        expression = parse.parse_expression("a || b && c == d + e * f")
+
+        self.assert_operation(expression, '||', 'a', None)
+        expression = expression.operandr
+        self.assert_operation(expression, '&&', 'b', None)
+        expression = expression.operandr
+        self.assert_operation(expression, '==', 'c', None)
+        expression = expression.operandr
+        self.assert_operation(expression, '+', 'd', None)
+        self.assert_operation(expression.operandr, '*', 'e', 'f')
+
+    def test_left_associative(self):
+        """ tests that operators of equal precedence group to the left. """
+        expression = parse.parse_expression("a - b + c * d / e")
+
+        self.assert_operation(expression, '+', None, None)
+        self.assert_operation(expression.operandl, '-', 'a', 'b')
+        self.assert_operation(expression.operandr, '/', None, 'e')
+        self.assert_operation(expression.operandr.operandl, '*', 'c', 'd')
+
+    def test_instanceof(self):
+        """ tests that instanceof binds like a relational operator. """
+        expression = parse.parse_expression("a + b instanceof T == c")
+
+        self.assert_operation(expression, '==', None, 'c')
+        expression = expression.operandl
+        self.assertEqual(expression.operator, 'instanceof')
+        self.assertEqual(expression.operandr.name, 'T')
+        self.assert_operation(expression.operandl, '+', 'a', 'b')
+
+    def test_long_chain(self):
+        """ tests a 10,000 operand expression, which must neither recurse
+            per operand nor rescan the operands for each operator.
+        """
+        operands = 10000
+        code = ' + '.join('a%d * b' % (i,) for i in range(operands))
+        expression = parse.parse_expression(code)
+
+        for i in reversed(range(1, operands)):
+            self.assert_operation(expression, '+', None, None)
+            self.assert_operation(expression.operandr, '*', 'a%d' % (i,), 'b')
+            expression = expression.operandl
+        self.assert_operation(expression, '*', 'a0', 'b')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
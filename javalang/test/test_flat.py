@@ -0,0 +1,114 @@
+import pickle
+import unittest
+
+from .. import flat, parse, tree
+
+
+SOURCE = """package a;
+
+import b.C;
+
+public class A<T> extends B implements C, D {
+    /** Docs. */
+    @Deprecated
+    private static final int[] x = {1, 2}, y[] = null;
+
+    void m(String... args) throws E {
+        int z = (a + b).c + (int) -x[0];
+        for (String s : args) { System.out.println("\\u00e9" + s); }
+        new Object() { public String toString() { return "o"; } };
+    }
+}
+
+@interface Marked {
+    /** Value. */
+    String value() default "v";
+}
+"""
+
+
+def dump(node):
+    """ returns the fields and positions of node and the nodes below it, with
+        sets sorted
+    """
+    if isinstance(node, tree.Node):
+        return (type(node).__name__, node.position,
+                getattr(node, '_modifier_position', None),
+                tuple((field, dump(getattr(node, field, flat.MISSING)))
+                      for field in flat.fields(type(node))))
+    elif isinstance(node, (list, tuple)):
+        return (type(node).__name__,) + tuple(dump(item) for item in node)
+    elif isinstance(node, set):
+        return ('set',) + tuple(sorted(node))
+    return node
+
+
+class FlatTreeTest(unittest.TestCase):
+
+    """ Contains tests for flat, array backed trees. """
+
+    def setUp(self):
+        self.compilation_unit = parse.parse(SOURCE)
+        self.flat = flat.flatten(self.compilation_unit)
+
+    def test_round_trip(self):
+        """ tests that a flattened tree is rebuilt with all fields and
+            positions, including values set outside of the attrs.
+        """
+        rebuilt = self.flat.to_tree()
+
+        self.assertEqual(dump(rebuilt), dump(self.compilation_unit))
+        field = rebuilt.types[0].fields[0]
+        self.assertEqual(field._modifier_position, (7, 5))
+        self.assertEqual(rebuilt.types[1].body[0].documentation,
+                         '/** Value. */')
+
+    def test_structure(self):
+        """ tests reading the structure without building nodes. """
+        nodes = [node for _, node in self.compilation_unit]
+
+        # The selector of (a + b).c is not among the attrs of the
+        # BinaryOperation, so walk_tree does not reach it
+        self.assertEqual(len(self.flat), len(nodes) + 1)
+        self.assertIs(self.flat.kind(0), tree.CompilationUnit)
+        self.assertEqual(self.flat.parent(0), -1)
+
+        for i in range(len(self.flat)):
+            for child in self.flat.children(i):
+                self.assertEqual(self.flat.parent(child), i)
+
+        methods = self.flat.find(tree.MethodDeclaration)
+        self.assertEqual([self.flat.value(i, 'name') for i in methods],
+                         ['m', 'toString'])
+        self.assertEqual(self.flat.position(methods[0]), (10, 10))
+        self.assertEqual(self.flat.kind(self.flat.value(methods[0], 'body')[0]),
+                         tree.LocalVariableDeclaration)
+
+    def test_pickle(self):
+        copied = pickle.loads(pickle.dumps(self.flat))
+
+        self.assertEqual(copied.nbytes, self.flat.nbytes)
+        self.assertEqual(dump(copied.to_tree()), dump(self.compilation_unit))
+
+    @unittest.skipIf(flat.shared_memory is None,
+                     'multiprocessing.shared_memory is not available')
+    def test_shared_memory(self):
+        name = self.flat.share()
+
+        with flat.FlatTree.attach(name) as shared:
+            self.assertEqual(dump(shared.to_tree()),
+                             dump(self.compilation_unit))
+
+        with self.assertRaises(Exception):
+            flat.FlatTree.attach(name)
+
+    def test_invalid(self):
+        with self.assertRaises(flat.FlatTreeError):
+            flat.FlatTree(b'\0' * 64)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -234,6 +234,40 @@ interface Foo {
         """)
 
 
+class MemoizedParsingTest(unittest.TestCase):
+
+    """ Contains tests for the memoizing (packrat) parser mode. """
+
+    def assert_same_tree(self, code):
+        plain = parse.parse(code)
+        memoized = parse.parse(code, memoize=True)
+        self.assertEqual(repr(plain), repr(memoized))
+        return memoized
+
+    def test_memoized_tree_matches(self):
+        """ tests that memoizing does not change the parsed tree. """
+        code = setup_java_class("""
+            Runnable r = () -> { int x = (int) (long) y; };
+            for (String s : names) { Object o = (Object) (s) + (t); }
+            for (i = 0; i < n; i++) { f((a, b) -> (A) b, (c) -> c); }
+        """)
+        clazz = self.assert_same_tree(code)
+        self.assertEqual(len(list(clazz.filter(tree.LambdaExpression))), 3)
+
+    def test_nested_casts_in_parentheses(self):
+        """ tests that failing speculation on nested casts is not retried;
+            without memoization this input takes exponential time.
+        """
+        depth = 40
+        code = "(a) + (" * depth + "]" + ")" * depth
+        with self.assertRaises(parser.JavaSyntaxError):
+            parse.parse(setup_java_class("Object o = %s;" % code),
+                        memoize=True)
+
+        code = "(a) + (" * depth + "x" + ")" * depth
+        self.assert_same_tree(setup_java_class("Object o = %s;" % code))
+
+
 def main():
     unittest.main()
 
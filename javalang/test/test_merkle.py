@@ -0,0 +1,109 @@
+import unittest
+
+from .. import merkle, parse, tree
+
+
+SOURCE = """
+class A {
+    private int count = 0;
+
+    int add(int value) {
+        count += value;
+        return count * 2;
+    }
+}
+"""
+
+
+class StructureHashTest(unittest.TestCase):
+
+    """ Contains tests for structural hashes of subtrees. """
+
+    def assertSameStructure(self, source_1, source_2):
+        self.assertEqual(merkle.structure_hash(parse.parse(source_1)),
+                         merkle.structure_hash(parse.parse(source_2)))
+
+    def assertDifferentStructure(self, source_1, source_2):
+        self.assertNotEqual(merkle.structure_hash(parse.parse(source_1)),
+                            merkle.structure_hash(parse.parse(source_2)))
+
+    def test_renamed(self):
+        """ tests that renaming identifiers keeps the hash. """
+        renamed = (SOURCE.replace('count', 'total').replace('value', 'v')
+                   .replace('add', 'plus').replace('class A', 'class B'))
+        self.assertSameStructure(SOURCE, renamed)
+
+    def test_changed(self):
+        for old, new in (('*', '/'), ('2', '3'), ('private', 'public'),
+                         ('int add', 'long add'), ('+=', '-='),
+                         ('return count', 'return (long) count')):
+            self.assertDifferentStructure(SOURCE, SOURCE.replace(old, new))
+
+    def test_qualified_names(self):
+        self.assertSameStructure("import a.b; class A {}",
+                                 "import c.d; class A {}")
+        self.assertDifferentStructure("import a.b; class A {}",
+                                      "import a.b.c; class A {}")
+
+    def test_deep_tree(self):
+        expression = parse.parse_expression(' + '.join(['a'] * 5000))
+        self.assertEqual(len(merkle.structure_hash(expression)),
+                         merkle.DIGEST_SIZE)
+
+    def test_hashes(self):
+        """ tests that the hashes of subtrees are kept for later calls. """
+        compilation_unit = parse.parse(SOURCE)
+        hashes = dict()
+        digest = merkle.structure_hash(compilation_unit, hashes)
+
+        method = compilation_unit.types[0].methods[0]
+        self.assertIn(id(method), hashes)
+        self.assertEqual(merkle.structure_hash(compilation_unit, hashes), digest)
+        self.assertEqual(merkle.structure_hash(method, hashes),
+                         merkle.structure_hash(method))
+
+    def test_changed_in_place(self):
+        """ tests that hashes are not kept on the nodes, so a tree changed in
+            place hashes differently.
+        """
+        compilation_unit = parse.parse(SOURCE)
+        digest = merkle.structure_hash(compilation_unit)
+
+        compilation_unit.types[0].fields[0].modifiers = set(['public'])
+        self.assertNotEqual(merkle.structure_hash(compilation_unit), digest)
+
+
+class MismatchesTest(unittest.TestCase):
+
+    """ Contains tests for locating structural differences. """
+
+    def test_mismatches(self):
+        tree_1 = parse.parse(SOURCE)
+        tree_2 = parse.parse(SOURCE.replace('count * 2', 'count / 2')
+                             .replace('= 0', '= 1').replace('count', 'c'))
+
+        pairs = list(merkle.mismatches(tree_1, tree_2))
+        self.assertEqual([type(node).__name__ for node, _ in pairs],
+                         ['Literal', 'BinaryOperation'])
+        self.assertEqual(pairs[0][1].value, '1')
+        self.assertEqual(pairs[1][1].operator, '/')
+
+    def test_same_structure(self):
+        tree_1 = parse.parse(SOURCE)
+        tree_2 = parse.parse(SOURCE.replace('count', 'c'))
+        self.assertEqual(list(merkle.mismatches(tree_1, tree_2)), [])
+
+    def test_child_count(self):
+        tree_1 = parse.parse("class A { void m() { a(); } }")
+        tree_2 = parse.parse("class A { void m() { a(); b(); } }")
+
+        pairs = list(merkle.mismatches(tree_1, tree_2))
+        self.assertEqual(len(pairs), 1)
+        self.assertIsInstance(pairs[0][0], tree.MethodDeclaration)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
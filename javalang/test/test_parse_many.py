@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from .. import flat, parse, tree
+
+
+SOURCES = [
+    "package a; import b.C; class A { int x, y; void m() {} }",
+    "interface I { void run(); }",
+    "class Broken { void m() { int = 1; } }",
+    "enum E { ONE }",
+]
+
+
+def count_types(compilation_unit, source):
+    return len(compilation_unit.types)
+
+
+class ParseManyTest(unittest.TestCase):
+
+    """ Contains tests for parsing many compilation units at once. """
+
+    def check_results(self, results):
+        results = sorted(results)
+        self.assertEqual([result.index for result in results], [0, 1, 2, 3])
+
+        self.assertIsInstance(results[0].value, tree.CompilationUnit)
+        self.assertIsNone(results[0].error)
+
+        failure = results[2].error
+        self.assertIsNone(results[2].value)
+        self.assertEqual(failure.type, 'JavaSyntaxError')
+        self.assertEqual(failure.position, (1, 33))
+
+    def test_single_process(self):
+        self.check_results(parse.parse_many(SOURCES, workers=1))
+
+    def test_process_pool(self):
+        self.check_results(parse.parse_many(SOURCES, workers=2))
+
+    def test_paths(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'A.java')
+            with open(path, 'w') as f:
+                f.write(SOURCES[0])
+
+            result, = parse.parse_many([path], workers=1)
+            self.assertEqual(result.value.types[0].name, 'A')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_summary(self):
+        results = sorted(parse.parse_many(SOURCES, workers=2, mode='summary'))
+        summary = results[0].value
+
+        self.assertEqual(summary.line_count, 1)
+        self.assertEqual(summary.package, 'a')
+        self.assertEqual(summary.imports, ['b.C'])
+        self.assertEqual([declaration[:2] for declaration in summary.declarations],
+                         [('ClassDeclaration', 'A'), ('FieldDeclaration', 'x'),
+                          ('FieldDeclaration', 'y'), ('MethodDeclaration', 'm')])
+
+    def test_custom_mode(self):
+        results = sorted(parse.parse_many(SOURCES, workers=2, mode=count_types))
+        self.assertEqual([result.value for result in results], [1, 1, None, 1])
+
+        with self.assertRaises(ValueError):
+            list(parse.parse_many(SOURCES, mode='labels'))
+
+    def test_flat(self):
+        for workers in (1, 2):
+            results = sorted(parse.parse_many(SOURCES, workers=workers,
+                                              mode='flat'))
+            try:
+                compilation_unit = results[0].value.to_tree()
+                self.assertEqual(repr(compilation_unit),
+                                 repr(parse.parse(SOURCES[0])))
+                self.assertIsNone(results[2].value)
+            finally:
+                for result in results:
+                    if result.value is not None:
+                        result.value.close()
+
+    @unittest.skipIf(flat.shared_memory is None or not os.path.isdir('/dev/shm'),
+                     'shared memory blocks are not listed in /dev/shm')
+    def test_flat_stopped_early(self):
+        """ tests that blocks are freed when iteration stops early. """
+        def blocks():
+            return set(os.listdir('/dev/shm'))
+
+        before = blocks()
+        sources = ["class A%d { void m() { int x = %d; } }" % (i, i)
+                   for i in range(60)]
+        results = parse.parse_many(sources, workers=2, mode='flat', chunksize=4)
+        next(results).value.close()
+        results.close()
+
+        self.assertEqual(blocks() - before, set())
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import unittest
+
+from .. import parse, parser, tree
+
+
+SOURCE = """package a;
+
+public class A {
+    int x;
+
+    void m() {
+        int y = 1;
+    }
+
+    /** Creates an A. */
+    public A() {
+        this.x = 2;
+    }
+}
+"""
+
+
+class ParseMembersTest(unittest.TestCase):
+
+    """ Contains tests for parsing segments of a file. """
+
+    def test_members_match_full_parse(self):
+        """ tests that a segment parses to the same members, at the same
+            positions, as in a parse of the whole file.
+        """
+        body = parse.parse(SOURCE).types[0].body
+        lines = SOURCE.split('\n')
+        segment = '\n'.join(lines[5:13]) + '\n'
+        members = parse.parse_members(segment, line=6)
+
+        self.assertEqual(len(members), 2)
+        for expected, member in zip(body[1:], members):
+            self.assertEqual(repr(member), repr(expected))
+            self.assertEqual(member.position, expected.position)
+            self.assertEqual(member._modifier_position,
+                             expected._modifier_position)
+        self.assertEqual(members[1].documentation, '/** Creates an A. */')
+
+        statement = members[1].body[0]
+        self.assertEqual(statement.position,
+                         body[2].body[0].position)
+
+    def test_column_offset(self):
+        """ tests that the column only shifts tokens on the first line. """
+        members = parse.parse_members("int x;\nint y;", line=4, column=5)
+
+        self.assertEqual(members[0].position, (4, 9))
+        self.assertEqual(members[1].position, (5, 5))
+
+    def test_types(self):
+        """ tests parsing top level type declarations. """
+        types = parse.parse_members("class B {} ; interface C {}",
+                                    context='types')
+
+        self.assertIsInstance(types[0], tree.ClassDeclaration)
+        self.assertIsInstance(types[1], tree.InterfaceDeclaration)
+
+    def test_invalid_segment(self):
+        with self.assertRaises(parser.JavaSyntaxError):
+            parse.parse_members("void m() { int y = ; }")
+        with self.assertRaises(ValueError):
+            parse.parse_members("int x;", context='statements')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
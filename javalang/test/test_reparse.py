@@ -0,0 +1,144 @@
+import random
+import unittest
+
+from .. import parse, parser, tokenizer
+from ..ast import Node
+
+
+SOURCE = """package a.b;
+
+import java.util.List;
+
+/** The first class. */
+public class A<T> extends B implements C {
+    private int x = 1;
+
+    @Deprecated
+    public A(int x) {
+        this.x = x;
+    }
+
+    /** Adds. */
+    int add(int a, int b) {
+        return a + b * x;
+    }
+
+    static {
+        System.out.println("static");
+    }
+
+    class Inner {
+        void run() {
+            for (int i = 0; i < 10; i++) {
+                list.add((T) null);
+            }
+        }
+    };
+
+    interface Callback {
+        void call(String s);
+    }
+}
+
+enum E {
+    ONE, TWO;
+
+    int value() { return 1; }
+}
+"""
+
+SNIPPETS = ['x', ' ', '\n', ';', '}', '{', '(', ')', 'int q;', 'void z() {}',
+            '/** d */', '// c\n', 'a.b()', '"s"', 'class K {}', '@A ', '']
+
+
+def dump(node):
+    """ returns the structure of a tree, positions included. """
+    if isinstance(node, Node):
+        return (type(node).__name__,
+                getattr(node, '_position', None),
+                getattr(node, '_modifier_position', None),
+                tuple((attr, dump(getattr(node, attr))) for attr in node.attrs))
+    if isinstance(node, (list, tuple)):
+        return tuple(dump(item) for item in node)
+    if isinstance(node, set):
+        return tuple(sorted(node))
+    return node
+
+
+def parse_source(source):
+    tokens = tokenizer.tokenize_array(source)
+    return parser.Parser(tokens).parse(), tokens
+
+
+class ReparseTest(unittest.TestCase):
+
+    """ Contains tests for incremental reparsing. """
+
+    def assert_reparse(self, source, edit_start, edit_end, new_text):
+        previous_tree, previous_tokens = parse_source(source)
+        previous_dump = dump(previous_tree)
+        new_source = source[:edit_start] + new_text + source[edit_end:]
+
+        try:
+            expected = dump(parse.parse(new_source))
+        except (parser.JavaSyntaxError, tokenizer.LexerError) as e:
+            with self.assertRaises(type(e)):
+                parse.reparse(previous_tree, previous_tokens, source,
+                              edit_start, edit_end, new_text)
+            return None
+
+        tree, tokens = parse.reparse(previous_tree, previous_tokens, source,
+                                     edit_start, edit_end, new_text)
+        self.assertEqual(dump(tree), expected)
+        self.assertEqual(tokens.data, new_source)
+        self.assertEqual(dump(previous_tree), previous_dump)
+        return tree, previous_tree
+
+    def test_edit_inside_method(self):
+        """ tests that only the edited method is parsed again. """
+        start = SOURCE.index('a + b')
+        tree, previous_tree = self.assert_reparse(SOURCE, start, start + 5,
+                                                  'a\n - b')
+
+        previous_body = previous_tree.types[0].body
+        body = tree.types[0].body
+        self.assertIs(body[0], previous_body[0])
+        self.assertIsNot(body[2], previous_body[2])
+        self.assertEqual(tree.types[0].body[2].name, 'add')
+        self.assertEqual(tree.types[1].position.line,
+                         previous_tree.types[1].position.line + 1)
+
+    def test_edit_without_new_lines_keeps_later_declarations(self):
+        """ tests that declarations on later lines are reused as they are. """
+        start = SOURCE.index('this.x = x')
+        tree, previous_tree = self.assert_reparse(SOURCE, start, start + 6, 'x')
+
+        for declaration, previous in zip(tree.types[0].body[2:],
+                                         previous_tree.types[0].body[2:]):
+            self.assertIs(declaration, previous)
+        self.assertIs(tree.types[1], previous_tree.types[1])
+
+    def test_edit_adding_members(self):
+        start = SOURCE.index('    class Inner')
+        self.assert_reparse(SOURCE, start, start, 'int y;\n    void m() {}\n')
+        self.assert_reparse(SOURCE, len(SOURCE), len(SOURCE), 'class Z {}\n')
+
+    def test_edit_outside_declarations(self):
+        start = SOURCE.index('java.util')
+        self.assert_reparse(SOURCE, start, start + 9, 'java.io')
+
+    def test_random_edits(self):
+        """ tests that reparsing matches a fresh parse over random edits. """
+        rng = random.Random(9)
+        for _ in range(300):
+            edit_start = rng.randrange(len(SOURCE) + 1)
+            edit_end = min(len(SOURCE), edit_start + rng.choice([0, 0, 1, 4, 12]))
+            self.assert_reparse(SOURCE, edit_start, edit_end,
+                                rng.choice(SNIPPETS))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 import unittest
+
+import six
+
 from .. import tokenizer
 
 
@@ -188,5 +191,191 @@ int k;
         self.assertEqual(token[0].position.column, 1)
         self.assertEqual(token[3].position.column, 1)
 
+    def test_unicode_identifiers(self):
+        code = u"int z\u00e4hler\u0300_1 = \u03bb\u0660;"
+        tokens = list(tokenizer.tokenize(code, engine='classic'))
+
+        self.assertEqual(tokens[1].value, u"z\u00e4hler\u0300_1")
+        self.assertEqual(type(tokens[1]), tokenizer.Identifier)
+        self.assertEqual(tokens[3].value, u"\u03bb\u0660")
+        self.assertEqual(len(tokens), 5)
+
+    def test_identifier_class_matches_categories(self):
+        import unicodedata
+
+        for code in list(range(0, 0x3000, 7)) + [0x1d400, 0x20000, 0x10ffff]:
+            c = six.unichr(code)
+            category = unicodedata.category(c)
+            flags = tokenizer.identifier_class(c)
+
+            self.assertEqual(bool(flags & tokenizer.IDENT_START),
+                             category in tokenizer.IDENT_START_CATEGORIES)
+            self.assertEqual(bool(flags & tokenizer.IDENT_PART),
+                             category in tokenizer.IDENT_PART_CATEGORIES)
+
+
+class TestTokenizerEngines(unittest.TestCase):
+
+    def assert_engines_agree(self, code, ignore_errors=False):
+        def run(engine):
+            result = list()
+            try:
+                for token in tokenizer.tokenize(code, ignore_errors, engine=engine):
+                    result.append((type(token), token.value, token.position, token.javadoc))
+            except tokenizer.LexerError as e:
+                result.append(str(e))
+            return result
+
+        self.assertEqual(run('classic'), run('regex'))
+
+    def test_engines_agree_on_class(self):
+        code = """package a.b;
+
+/** Javadoc */
+@SuppressWarnings("unchecked")
+public final class Foo<T extends Comparable<T>> implements Bar {
+    private static final long ID = 0x1F_FFL + 017 + 0b101 + 1_000;
+    private double d = .5e-3 + 1.0f + 2d + 0x1.8p1;
+    char c = '\\n', q = '\\'', o = '\\101';
+
+    // line comment
+    public int fn(int... args) {
+        int x = a >>>= 2; x <<= 1; /* block
+        comment */ x = (x > 0) ? x : -x;
+        Runnable r = () -> System.out.println("hi \\"there\\"");
+        java.util.function.Function<String, Integer> f = String::length;
+        return x >= 0 && x != 1 || !true ? null : x;
+    }
+}
+"""
+        self.assert_engines_agree(code)
+
+    def test_engines_agree_on_unicode(self):
+        self.assert_engines_agree("int caf\u00e9 = 1; String \u03bb\u2028x = \"\u00e9\";")
+        self.assert_engines_agree("int Y\u00e9Z = .\u0663 + \\u0041;")
+
+    def test_engines_agree_on_errors(self):
+        for code in ("int a = 'abc", "x = \"\\q\";", "a /* open", "x # y", "a = 08_;"):
+            self.assert_engines_agree(code)
+            self.assert_engines_agree(code, ignore_errors=True)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            tokenizer.tokenize("int j;", engine='unknown')
+
+class TestTokenArray(unittest.TestCase):
+
+    code = """/** Doc */
+public class Foo {
+    String s = "a\\"b", t = "x";
+    int /* c */ j = 0x1F;
+
+    /** Method doc */
+    void m() { return; }
+}
+"""
+
+    def test_matches_token_stream(self):
+        tokens = list(tokenizer.tokenize(self.code))
+        token_array = tokenizer.tokenize_array(self.code)
+
+        self.assertEqual(len(token_array), len(tokens))
+
+        for token, view in zip(tokens, token_array):
+            self.assertTrue(isinstance(view, type(token)))
+            self.assertEqual(view.value, token.value)
+            self.assertEqual(view.position, token.position)
+            self.assertEqual(view.javadoc, token.javadoc)
+
+        for token, materialized in zip(tokens, token_array.to_tokens()):
+            self.assertEqual(type(materialized), type(token))
+            self.assertEqual(materialized.position, token.position)
+
+    def test_values_are_shared(self):
+        token_array = tokenizer.tokenize_array("a = a + a;")
+
+        self.assertTrue(token_array[0].value is token_array[2].value)
+        self.assertTrue(token_array[2].value is token_array[4].value)
+        self.assertEqual(token_array.token_type(1), tokenizer.Operator)
+
+    def test_views_are_reused(self):
+        token_array = tokenizer.tokenize_array("int j;")
+
+        self.assertTrue(token_array[1] is token_array[1])
+        self.assertTrue(token_array[-1] is token_array[2])
+
+    def test_parse_compact(self):
+        from .. import parse
+
+        tree = parse.parse(self.code)
+        compact_tree = parse.parse(self.code, compact=True)
+
+        nodes = [(type(node), node.position) for _, node in tree]
+        compact_nodes = [(type(node), node.position) for _, node in compact_tree]
+        self.assertEqual(nodes, compact_nodes)
+        self.assertEqual(compact_tree.types[0].documentation, "/** Doc */")
+
+
+class TestRetokenize(unittest.TestCase):
+
+    code = """/** Doc */
+public class Foo {
+    int a = 1;
+
+    /** Method doc */
+    void m() {
+        String s = "x";
+    }
+
+    int b = 2;
+}
+"""
+
+    def assert_retokenize(self, source, edit_start, edit_end, new_text):
+        previous = tokenizer.tokenize_array(source)
+        result = tokenizer.retokenize(previous, source, edit_start, edit_end, new_text)
+        expected = tokenizer.tokenize_array(source[:edit_start] + new_text + source[edit_end:])
+
+        self.assertEqual(list(result.kinds), list(expected.kinds))
+        self.assertEqual(list(result.starts), list(expected.starts))
+        self.assertEqual(list(result.ends), list(expected.ends))
+        self.assertEqual(result.values, expected.values)
+        self.assertEqual(result.javadocs, expected.javadocs)
+        self.assertEqual([token.position for token in result],
+                         [token.position for token in expected])
+
+    def test_replace_member(self):
+        start = self.code.index('    void m()')
+        end = self.code.index('    int b')
+        self.assert_retokenize(self.code, start, end,
+                               "    void renamed() {\n        return;\n    }\n\n\n")
+
+    def test_extend_identifier(self):
+        start = self.code.index(' = 1') - 1
+        self.assert_retokenize(self.code, start, start, "bc")
+
+    def test_open_comment(self):
+        start = self.code.index('    int a')
+        self.assert_retokenize(self.code, start, start, "/* ")
+
+    def test_edit_before_first_token(self):
+        self.assert_retokenize(self.code, 3, 4, "")
+        self.assert_retokenize(self.code, 0, 0, "int x; ")
+
+    def test_edit_at_end(self):
+        self.assert_retokenize(self.code, len(self.code), len(self.code), "class Bar {}")
+
+    def test_unicode_escapes(self):
+        code = "int \\u0061 = 1; int b = 2;"
+        start = code.index('b')
+        self.assert_retokenize(code, start, start + 1, "c")
+
+    def test_source_mismatch(self):
+        previous = tokenizer.tokenize_array("int a;")
+
+        with self.assertRaises(ValueError):
+            tokenizer.retokenize(previous, "int b;", 0, 0, "")
+
+
 if __name__=="__main__":
     unittest.main()
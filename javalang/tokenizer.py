@@ -1,15 +1,26 @@
+import bisect
 import re
 import unicodedata
+from array import array
 from collections import namedtuple
 
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 import six
 
+from . import util
+
 
 class LexerError(Exception):
     pass
 
 Position = namedtuple('Position', ['line', 'column'])
 
+NEW_LINE = re.compile('\n')
+
 class JavaToken(object):
     def __init__(self, value, position=None, javadoc=None):
         self.value = value
@@ -143,11 +154,57 @@ class Identifier(JavaToken):
     pass
 
 
+IDENT_START_CATEGORIES = set(['Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Nl', 'Pc', 'Sc'])
+
+IDENT_PART_CATEGORIES = set(['Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Mc', 'Mn', 'Nd', 'Nl', 'Pc', 'Sc'])
+
+IDENT_START = 1
+IDENT_PART = 2
+
+def _identifier_class(c):
+    category = unicodedata.category(c)
+    flags = 0
+
+    if category in IDENT_START_CATEGORIES:
+        flags |= IDENT_START
+    if category in IDENT_PART_CATEGORIES:
+        flags |= IDENT_PART
+
+    return flags
+
+# Identifier flags of every ASCII character, and of the whole Basic
+# Multilingual Plane once the first non-ASCII character is looked up
+ASCII_IDENT_CLASSES = bytes(bytearray(_identifier_class(six.unichr(i)) for i in range(0x80)))
+_bmp_ident_classes = None
+
+ASCII_IDENT_PART_RUN = re.compile(r'[A-Za-z0-9_$]*')
+
+def bmp_identifier_classes():
+    global _bmp_ident_classes
+
+    if _bmp_ident_classes is None:
+        _bmp_ident_classes = bytes(bytearray(
+            _identifier_class(six.unichr(i)) for i in range(0x10000)))
+
+    return _bmp_ident_classes
+
+def identifier_class(c):
+    """ Returns the IDENT_START/IDENT_PART flags of a single character """
+    code = ord(c)
+
+    if code < 0x80:
+        return ASCII_IDENT_CLASSES[code]
+    elif code < 0x10000:
+        return bmp_identifier_classes()[code]
+    else:
+        return _identifier_class(c)
+
+
 class JavaTokenizer(object):
 
-    IDENT_START_CATEGORIES = set(['Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Nl', 'Pc', 'Sc'])
+    IDENT_START_CATEGORIES = IDENT_START_CATEGORIES
 
-    IDENT_PART_CATEGORIES = set(['Lu', 'Ll', 'Lt', 'Lm', 'Lo', 'Mc', 'Mn', 'Nd', 'Nl', 'Pc', 'Sc'])
+    IDENT_PART_CATEGORIES = IDENT_PART_CATEGORIES
 
     def __init__(self, data, ignore_errors=False):
         self.data = data
@@ -402,13 +459,24 @@ class JavaTokenizer(object):
         self.error('Could not decode input data')
 
     def is_java_identifier_start(self, c):
-        return unicodedata.category(c) in self.IDENT_START_CATEGORIES
+        return identifier_class(c) & IDENT_START
 
     def read_identifier(self):
-        self.j = self.i + 1
+        data = self.data
+        length = self.length
+        j = self.i + 1
 
-        while self.j < len(self.data) and unicodedata.category(self.data[self.j]) in self.IDENT_PART_CATEGORIES:
-            self.j += 1
+        # Skip over runs of ASCII identifier characters, only looking up
+        # the characters that end a run
+        while True:
+            j = ASCII_IDENT_PART_RUN.match(data, j).end()
+
+            if j >= length or not identifier_class(data[j]) & IDENT_PART:
+                break
+
+            j += 1
+
+        self.j = j
 
         ident = self.data[self.i:self.j]
         if ident in Keyword.VALUES:
@@ -486,77 +554,109 @@ class JavaTokenizer(object):
         self.data = ''.join(new_data)
         self.length = len(self.data)
 
-    def tokenize(self):
-        self.reset()
+    def read_token(self):
+        """ Reads the lexical element starting at self.i. Returns the token
+        type with the token spanning self.i:self.j, or None if nothing is to
+        be emitted (whitespace, comments and skipped errors), in which case
+        self.i has already been advanced.
 
-        # Convert unicode escapes
-        self.pre_tokenize()
+        """
 
-        while self.i < self.length:
-            token_type = None
+        token_type = None
 
-            c = self.data[self.i]
-            c_next = None
-            startswith = c
+        c = self.data[self.i]
+        c_next = None
+        startswith = c
 
-            if self.i + 1 < self.length:
-                c_next = self.data[self.i + 1]
-                startswith = c + c_next
+        if self.i + 1 < self.length:
+            c_next = self.data[self.i + 1]
+            startswith = c + c_next
 
-            if c.isspace():
-                self.consume_whitespace()
-                continue
+        if c.isspace():
+            self.consume_whitespace()
+            return None
 
-            elif startswith in ("//", "/*"):
-                comment = self.read_comment()
-                if comment.startswith("/**"):
-                    self.javadoc = comment
-                continue
+        elif startswith in ("//", "/*"):
+            comment = self.read_comment()
+            if comment.startswith("/**"):
+                self.javadoc = comment
+            return None
 
-            elif startswith == '..' and self.try_operator():
-                # Ensure we don't mistake a '...' operator as a sequence of
-                # three '.' separators. This is done as an optimization instead
-                # of moving try_operator higher in the chain because operators
-                # aren't as common and try_operator is expensive
-                token_type = Operator
+        elif startswith == '..' and self.try_operator():
+            # Ensure we don't mistake a '...' operator as a sequence of
+            # three '.' separators. This is done as an optimization instead
+            # of moving try_operator higher in the chain because operators
+            # aren't as common and try_operator is expensive
+            token_type = Operator
 
-            elif c == '@':
-                token_type = Annotation
-                self.j = self.i + 1
+        elif c == '@':
+            token_type = Annotation
+            self.j = self.i + 1
 
-            elif c == '.' and c_next and c_next.isdigit():
-                token_type = self.read_decimal_float_or_integer()
+        elif c == '.' and c_next and c_next.isdigit():
+            token_type = self.read_decimal_float_or_integer()
 
-            elif self.try_separator():
-                token_type = Separator
+        elif self.try_separator():
+            token_type = Separator
 
-            elif c in ("'", '"'):
-                token_type = String
-                self.read_string()
+        elif c in ("'", '"'):
+            token_type = String
+            self.read_string()
 
-            elif c in '0123456789':
-                token_type = self.read_integer_or_float(c, c_next)
+        elif c in '0123456789':
+            token_type = self.read_integer_or_float(c, c_next)
 
-            elif self.is_java_identifier_start(c):
-                token_type = self.read_identifier()
+        elif self.is_java_identifier_start(c):
+            token_type = self.read_identifier()
 
-            elif self.try_operator():
-                token_type = Operator
+        elif self.try_operator():
+            token_type = Operator
 
-            else:
-                self.error('Could not process token', c)
-                self.i = self.i + 1
+        else:
+            self.error('Could not process token', c)
+            self.i = self.i + 1
+            return None
+
+        return token_type
+
+    def scan(self):
+        """ Yields the type of every token in the input. While a type is
+        yielded the token spans self.i:self.j and self.javadoc, self.current_line
+        and self.start_of_line describe it.
+
+        """
+
+        self.reset()
+
+        # Convert unicode escapes
+        self.pre_tokenize()
+
+        return self.scan_tokens()
+
+    def scan_tokens(self):
+        """ Like scan, but continues from the current state of the tokenizer
+        without resetting it or converting unicode escapes.
+
+        """
+
+        while self.i < self.length:
+            token_type = self.read_token()
+
+            if token_type is None:
                 continue
 
-            position = Position(self.current_line, self.i - self.start_of_line)
-            token = token_type(self.data[self.i:self.j], position, self.javadoc)
-            yield token
+            yield token_type
 
             if self.javadoc:
                 self.javadoc = None
 
             self.i = self.j
 
+    def tokenize(self):
+        for token_type in self.scan():
+            position = Position(self.current_line, self.i - self.start_of_line)
+            yield token_type(self.data[self.i:self.j], position, self.javadoc)
+
     def error(self, message, char=None):
         # Provide additional information in the errors message
         line_start = self.data.rfind('\n', 0, self.i) + 1
@@ -575,10 +675,444 @@ class JavaTokenizer(object):
         if not self.ignore_errors:
             raise error
 
-def tokenize(code, ignore_errors=False):
-    tokenizer = JavaTokenizer(code, ignore_errors)
+def _operator_pattern():
+    operators = []
+
+    for value in sorted(Operator.VALUES, key=len, reverse=True):
+        if value == '/':
+            # A lone '/' must not swallow the start of an unterminated block
+            # comment, which is left to JavaTokenizer to report
+            operators.append(r'/(?!\*)')
+        else:
+            operators.append(re.escape(value))
+
+    return '|'.join(operators)
+
+
+def _word_types():
+    word_types = dict()
+
+    for word in Keyword.VALUES:
+        if word in BasicType.VALUES:
+            word_types[word] = BasicType
+        elif word in Modifier.VALUES:
+            word_types[word] = Modifier
+        else:
+            word_types[word] = Keyword
+
+    for word in Boolean.VALUES:
+        word_types[word] = Boolean
+
+    word_types['null'] = Null
+
+    return word_types
+
+
+class RegexJavaTokenizer(JavaTokenizer):
+    """ Tokenizer driven by a single compiled alternation. Runs of whitespace,
+    comments, ASCII identifiers, well-formed strings, separators and operators
+    are all matched in one pass by finditer. Numbers and anything the pattern
+    does not recognise are handed to JavaTokenizer.read_token, which keeps
+    the token types, positions and error reporting identical.
+
+    """
+
+    WORD_TYPES = _word_types()
+
+    TOKEN_PATTERN = re.compile(r"""
+          (?P<space>\s+)
+        | (?P<comment>//[^\n]*\n?|/\*[\s\S]*?\*/)
+        | (?P<identifier>[A-Za-z_$][A-Za-z0-9_$]*)(?![A-Za-z0-9_$\x80-\U0010FFFF])
+        | (?P<integer>(?:0|[1-9][0-9]*)(?=[^0-9A-Za-z_$.\x80-\U0010FFFF]))
+        | (?P<number>\.?[0-9])
+        | (?P<operator>%s)
+        | (?P<separator>[(){}\[\];,]|\.(?![0-9\x80-\U0010FFFF]))
+        | (?P<string>"(?:[^"\\]|\\[btnfru"'\\0-7])*"|'(?:[^'\\]|\\[btnfru"'\\0-7])*')
+        | (?P<annotation>@)
+        | (?P<other>[\s\S])
+        """ % (_operator_pattern(),), re.VERBOSE)
+
+    TOKEN_TYPES = {
+        'integer': DecimalInteger,
+        'separator': Separator,
+        'operator': Operator,
+        'string': String,
+        'annotation': Annotation,
+    }
+
+    def scan_tokens(self):
+        data = self.data
+        word_types = self.WORD_TYPES
+        token_types = self.TOKEN_TYPES
+
+        while self.i < self.length:
+            for match in self.TOKEN_PATTERN.finditer(data, self.i):
+                kind = match.lastgroup
+                i, j = match.span()
+
+                if kind == 'identifier':
+                    token_type = word_types.get(match.group(kind), Identifier)
+
+                elif kind == 'space' or kind == 'comment':
+                    if kind == 'comment' and data.startswith('/**', i):
+                        self.javadoc = match.group(kind)
+
+                    lines = data.count('\n', i, j)
+                    if lines:
+                        self.current_line += lines
+                        self.start_of_line = data.rfind('\n', i, j)
+
+                    continue
+
+                elif kind == 'number' or kind == 'other':
+                    # Fall back to the character driven reader for this token
+                    # and resume matching where it stopped
+                    self.i = i
+                    token_type = self.read_token()
+
+                    if token_type is not None:
+                        yield token_type
+
+                        if self.javadoc:
+                            self.javadoc = None
+
+                        self.i = self.j
+
+                    break
+
+                else:
+                    token_type = token_types[kind]
+
+                self.i = i
+                self.j = j
+
+                yield token_type
+
+                if self.javadoc:
+                    self.javadoc = None
+
+            else:
+                self.i = self.length
+
+
+TOKENIZER_ENGINES = {
+    'regex': RegexJavaTokenizer,
+    'classic': JavaTokenizer,
+}
+
+def tokenize(code, ignore_errors=False, engine='regex'):
+    """ Tokenizes code with the named engine. 'regex' matches most tokens with
+    one compiled pattern, 'classic' reads the input a character at a time.
+
+    """
+
+    if engine not in TOKENIZER_ENGINES:
+        raise ValueError('Unknown tokenizer engine %r' % (engine,))
+
+    tokenizer = TOKENIZER_ENGINES[engine](code, ignore_errors)
     return tokenizer.tokenize()
 
+# ------------------------------------------------------------------------------
+# ---- Compact token stream ----
+
+# Token types in kind order. The kind of a token is its index in this list
+TOKEN_TYPES = [EndOfInput, Keyword, Modifier, BasicType, Literal, Integer,
+               DecimalInteger, OctalInteger, BinaryInteger, HexInteger,
+               FloatingPoint, DecimalFloatingPoint, HexFloatingPoint, Boolean,
+               Character, String, Null, Separator, Operator, Annotation,
+               Identifier]
+
+TOKEN_KINDS = dict((token_type, kind) for kind, token_type in enumerate(TOKEN_TYPES))
+
+
+class TokenView(object):
+    """ Stand-in for the token at one index of a TokenArray. Views are
+    instances of the matching JavaToken subclass, so isinstance checks work
+    unchanged, but they read everything from the arrays on demand.
+
+    """
+
+    __slots__ = ('tokens', 'index', 'value')
+
+    def __init__(self, tokens, index):
+        self.tokens = tokens
+        self.index = index
+        self.value = tokens.values[index]
+
+    @property
+    def position(self):
+        tokens = self.tokens
+        start = tokens.starts[self.index]
+        line = bisect.bisect_left(tokens.line_starts, start)
+        return Position(line, start - tokens.line_starts[line - 1])
+
+    @property
+    def javadoc(self):
+        return self.tokens.javadocs.get(self.index)
+
+VIEW_TYPES = [type(token_type.__name__, (TokenView, token_type), {'__slots__': ()})
+              for token_type in TOKEN_TYPES]
+
+
+class TokenArray(Sequence):
+    """ Struct-of-arrays token stream. Kinds and start/end offsets into the
+    (unicode escape decoded) source are held in parallel integer arrays,
+    values are shared between equal tokens and positions are worked out from
+    a table of line starts when they are asked for. Indexing returns a
+    TokenView, which the parser accepts in place of a JavaToken.
+
+    """
+
+    def __init__(self, data, kinds, starts, ends, values, javadocs, line_starts):
+        self.data = data
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.values = values
+        self.javadocs = javadocs
+        self.line_starts = line_starts
+        self.views = [None] * len(kinds)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer):
+        kinds = array('i')
+        starts = array('i')
+        ends = array('i')
+        values = list()
+        javadocs = dict()
+        interned = dict()
+        string_lines = set()
+
+        add_kind, add_start, add_end, add_value = (
+            kinds.append, starts.append, ends.append, values.append)
+
+        for token_type in tokenizer.scan():
+            i, j = tokenizer.i, tokenizer.j
+            value = tokenizer.data[i:j]
+            value = interned.setdefault(value, value)
+
+            if tokenizer.javadoc:
+                javadocs[len(kinds)] = tokenizer.javadoc
+
+            # Line breaks inside string literals do not start a new line
+            if token_type is String and '\n' in value:
+                string_lines.update(m.start() + i for m in NEW_LINE.finditer(value))
+
+            add_kind(TOKEN_KINDS[token_type])
+            add_start(i)
+            add_end(j)
+            add_value(value)
+
+        data = tokenizer.data
+        line_starts = array('i', [-1])
+        line_starts.extend(m.start() for m in NEW_LINE.finditer(data)
+                           if m.start() not in string_lines)
+
+        return cls(data, kinds, starts, ends, values, javadocs, line_starts)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+
+        view = self.views[index]
+
+        if view is None:
+            view = VIEW_TYPES[self.kinds[index]](self, index)
+            self.views[index] = view
+
+        return view
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def token_type(self, index):
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def position(self, index):
+        start = self.starts[index]
+        line = bisect.bisect_left(self.line_starts, start)
+        return Position(line, start - self.line_starts[line - 1])
+
+    def to_tokens(self):
+        """ Materializes the stream as JavaToken instances """
+        return [self.token_type(i)(self.values[i], self.position(i), self.javadocs.get(i))
+                for i in range(len(self.kinds))]
+
+class TokenArrayIterator(util.LookAheadListIterator):
+    """ LookAheadListIterator over a TokenArray, creating each TokenView the
+    first time its index is reached.
+
+    """
+
+    def __init__(self, tokens):
+        super(TokenArrayIterator, self).__init__(tokens)
+        self.views = tokens.views
+
+    def __next__(self):
+        try:
+            self.value = self.views[self.marker] or self.list[self.marker]
+            self.marker += 1
+        except IndexError:
+            raise StopIteration()
+
+        return self.value
+
+    def look(self, i=0):
+        try:
+            self.value = self.views[self.marker + i] or self.list[self.marker + i]
+        except IndexError:
+            return self.default
+
+        return self.value
+
+def tokenize_array(code, ignore_errors=False, engine='regex'):
+    """ Tokenizes code into a TokenArray """
+
+    if engine not in TOKENIZER_ENGINES:
+        raise ValueError('Unknown tokenizer engine %r' % (engine,))
+
+    tokenizer = TOKENIZER_ENGINES[engine](code, ignore_errors)
+    return TokenArray.from_tokenizer(tokenizer)
+
+def retokenize(previous_tokens, source, edit_start, edit_end, new_text, ignore_errors=False):
+    """ Returns the TokenArray of source with source[edit_start:edit_end]
+    replaced by new_text, where previous_tokens is the TokenArray of source.
+
+    Only the edited window is lexed again. Lexing restarts one token before
+    the edit and stops at the first token past it that lines up with one of
+    the previous tokens, from where the previous tokens are reused with their
+    offsets shifted. Sources containing unicode escapes are tokenized from
+    scratch, since offsets into them do not match the decoded data.
+
+    """
+
+    tokens, _, _ = retokenize_window(previous_tokens, source, edit_start,
+                                     edit_end, new_text, ignore_errors)
+    return tokens
+
+def retokenize_window(previous_tokens, source, edit_start, edit_end, new_text, ignore_errors=False):
+    """ Same as retokenize(), but returns a (tokens, first, last) tuple. The
+    previous tokens first:last were replaced by the relexed ones, while those
+    before first are unchanged and those from last on are only shifted, both
+    in index and in offset.
+
+    """
+
+    new_source = source[:edit_start] + new_text + source[edit_end:]
+
+    if (not isinstance(new_source, six.text_type)
+            or '\\u' in source or '\\u' in new_source):
+        return tokenize_array(new_source, ignore_errors), 0, len(previous_tokens)
+
+    if previous_tokens.data != source:
+        raise ValueError('Previous tokens were not produced from source')
+
+    kinds = previous_tokens.kinds
+    starts = previous_tokens.starts
+    ends = previous_tokens.ends
+    javadocs = previous_tokens.javadocs
+    line_starts = previous_tokens.line_starts
+    count = len(kinds)
+
+    delta = len(new_text) - (edit_end - edit_start)
+    edit_new_end = edit_start + len(new_text)
+
+    # Restart one token before the first token touching the edit, since the
+    # lexer may have looked ahead past the end of that token. Edits before
+    # the second token are relexed from the start of the source
+    restart = bisect.bisect_left(ends, edit_start) - 1
+
+    if restart > 0:
+        restart_offset = starts[restart]
+        javadoc = javadocs.get(restart)
+    else:
+        restart = 0
+        restart_offset = 0
+        javadoc = None
+
+    tokenizer = RegexJavaTokenizer(new_source, ignore_errors)
+    tokenizer.reset()
+    tokenizer.length = len(new_source)
+    tokenizer.i = restart_offset
+    tokenizer.javadoc = javadoc
+
+    line = bisect.bisect_left(line_starts, restart_offset)
+    tokenizer.current_line = line
+    tokenizer.start_of_line = line_starts[line - 1]
+
+    new_kinds = array('i')
+    new_starts = array('i')
+    new_ends = array('i')
+    new_values = list()
+    new_javadocs = dict()
+    interned = dict()
+    string_lines = set()
+
+    # Index of the first previous token that is reused as is
+    resume = count
+
+    for token_type in tokenizer.scan_tokens():
+        i, j = tokenizer.i, tokenizer.j
+        kind = TOKEN_KINDS[token_type]
+
+        if i >= edit_new_end:
+            previous = bisect.bisect_left(starts, i - delta)
+
+            if (previous < count and starts[previous] == i - delta
+                    and ends[previous] == j - delta and kinds[previous] == kind
+                    and javadocs.get(previous) == tokenizer.javadoc):
+                resume = previous
+                break
+
+        value = new_source[i:j]
+        value = interned.setdefault(value, value)
+
+        if tokenizer.javadoc:
+            new_javadocs[restart + len(new_kinds)] = tokenizer.javadoc
+
+        if token_type is String and '\n' in value:
+            string_lines.update(m.start() + i for m in NEW_LINE.finditer(value))
+
+        new_kinds.append(kind)
+        new_starts.append(i)
+        new_ends.append(j)
+        new_values.append(value)
+
+    if resume < count:
+        resume_offset = starts[resume]
+    else:
+        resume_offset = len(source)
+
+    shift = delta.__add__
+
+    kinds = kinds[:restart] + new_kinds + kinds[resume:]
+    starts = starts[:restart] + new_starts + array('i', map(shift, starts[resume:]))
+    ends = ends[:restart] + new_ends + array('i', map(shift, ends[resume:]))
+    values = previous_tokens.values[:restart] + new_values + previous_tokens.values[resume:]
+
+    index_shift = restart + len(new_kinds) - resume
+    merged_javadocs = dict((index, javadoc) for index, javadoc in javadocs.items()
+                           if index < restart)
+    merged_javadocs.update(new_javadocs)
+    merged_javadocs.update((index + index_shift, javadoc) for index, javadoc in javadocs.items()
+                           if index >= resume)
+
+    # Line starts before the relexed window are kept, those after it shifted
+    low = bisect.bisect_left(line_starts, restart_offset)
+    high = bisect.bisect_left(line_starts, resume_offset)
+    merged_line_starts = line_starts[:low]
+    merged_line_starts.extend(m.start() for m in NEW_LINE.finditer(
+        new_source, restart_offset, resume_offset + delta) if m.start() not in string_lines)
+    merged_line_starts.extend(map(shift, line_starts[high:]))
+
+    tokens = TokenArray(new_source, kinds, starts, ends, values, merged_javadocs,
+                        merged_line_starts)
+    return tokens, restart, resume
+
 def reformat_tokens(tokens):
     indent = 0
     closed_block = False
@@ -1,19 +1,34 @@
 
-from .ast import Node
+from .ast import Node, NodeIndex
 
 # ------------------------------------------------------------------------------
 
 class CompilationUnit(Node):
     attrs = ("package", "imports", "types")
+    __slots__ = attrs + ("_index",)
+
+    @property
+    def index(self):
+        """ The NodeIndex of this tree, built on first use. """
+        index = getattr(self, '_index', None)
+        if index is None:
+            index = self._index = NodeIndex(self)
+        return index
+
+    def reset_index(self):
+        """ Drops the index, so that it is rebuilt for the current tree. """
+        self._index = None
 
 class Import(Node):
     attrs = ("path", "static", "wildcard")
 
 class Documented(Node):
     attrs = ("documentation",)
+    __slots__ = ()
 
 class Declaration(Node):
     attrs = ("modifiers", "annotations")
+    __slots__ = ()
 
 class TypeDeclaration(Declaration, Documented):
     attrs = ("name", "body")
@@ -193,6 +208,9 @@ class EnhancedForControl(Node):
 
 class Expression(Node):
     attrs = ()
+    # parse_expression_3 gives any parenthesized expression the operators
+    # and selectors of a Primary, even where they are not among its attrs
+    __slots__ = ("prefix_operators", "postfix_operators", "selectors")
 
 class Assignment(Expression):
     attrs = ("expressionl", "value", "type")
@@ -277,4 +295,7 @@ class EnumConstantDeclaration(Declaration, Documented):
 
 class AnnotationMethod(Declaration):
     attrs = ("name", "return_type", "dimensions", "default")
+    # parse_annotation_type_element_declaration sets documentation, which is
+    # not one of the attrs
+    __slots__ = tuple(Declaration.attrs) + attrs + ("documentation",)
 
@@ -1,3 +1,8 @@
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 
 
 class LookAheadIterator(object):
@@ -89,7 +94,11 @@ class LookAheadIterator(object):
 
 class LookAheadListIterator(object):
     def __init__(self, iterable):
-        self.list = list(iterable)
+        # Sequences such as a TokenArray are indexed in place
+        if isinstance(iterable, Sequence):
+            self.list = iterable
+        else:
+            self.list = list(iterable)
 
         self.marker = 0
         self.saved_markers = []
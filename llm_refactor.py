@@ -1,10 +1,10 @@
 import javalang
 from query import get_single_query
-from ast_comparator import compare_ast, IdentifierDifference, ASTComparatorError
+from ast_comparator import compare_ast_segment, compare_tokens, IdentifierDifference, ASTComparatorError
 from intelij_helpers import print_red
-from formatting_helpers import get_tab_replaced_source, SubstringBalancingError, remove_ending_braces, \
-    add_ending_braces, BalanceType, set_indentation
-from segmentation_helpers import temp_replace_segment
+from formatting_helpers import SubstringBalancingError, remove_ending_braces, add_ending_braces, BalanceType, \
+    set_indentation
+from segmentation_helpers import SegmentMap
 import common
 import time
 
@@ -13,22 +13,25 @@ class LLMRefactorError(Exception):
     pass
 
 
-def llm_refactor(source_segment: str, balance_result: tuple, original_indentation_level: int, standards: [str], source_index: int, segment_index: int, num_attempts=3, verbose=True) -> (str, [IdentifierDifference]):
+def llm_refactor(source_segment: str, balance_result: tuple, original_indentation_level: int, standards: [str], segment_map: SegmentMap, segment_index: int, num_attempts=3, verbose=True) -> (str, [IdentifierDifference]):
     """
     Refactors a source segment according to the standards.
     Returns refactored segment and a list of identifier differences.
     """
 
     # Load current source
-    source_path = common.file_manager.get_file_path(source_index)
-    # Replace tab
-    curr_source = get_tab_replaced_source(open(source_path, "r").read())
+    curr_source = segment_map.source
 
     try:
-        original_tree = javalang.parse.parse(curr_source)
+        # The same source is parsed again by refactor_changed_identifiers, so the tree is cached
+        original_tree = javalang.cache.parse(curr_source)
     except javalang.parser.JavaSyntaxError as e:
         raise LLMRefactorError('Failed to parse original segment')
 
+    # The segment as it is in the source, to check the tokens of responses against
+    original_segment = segment_map.segment(segment_index)
+    original_lines = segment_map.line_range(segment_index)
+
     prior_error_message = None
 
     for try_index in range(num_attempts):
@@ -85,9 +88,21 @@ def llm_refactor(source_segment: str, balance_result: tuple, original_indentatio
                 time.sleep(0.5)
                 continue
 
+        # Check the tokens first, which is much cheaper than parsing and comparing the trees
+        try:
+            token_diff = compare_tokens(original_segment, response, original_lines[0])
+        except :
+            # Tokens are stricter than compare_ast, and a segment may not tokenize on its own, so the trees decide
+            token_diff = None
+
+        # A response with the same tokens as the segment, up to the order of modifiers, only changed its layout, so
+        # its tree is the same
+        if token_diff == []:
+            return response, []
+
         # Parse the response
         # Create temp source with the new segment
-        temp_source = temp_replace_segment(curr_source, segment_index, response)
+        temp_source = segment_map.replaced_source(segment_index, response)
         try:
             response_tree = javalang.parse.parse(temp_source)
         except :
@@ -99,14 +114,18 @@ def llm_refactor(source_segment: str, balance_result: tuple, original_indentatio
 
         # Compare the trees
         try:
-            identifier_diff = compare_ast(original_tree, response_tree, curr_source)
+            # Only the segment changed, so only its subtrees are compared
+            # All mismatches are collected, so the next attempt can fix them at once
+            identifier_diff = compare_ast_segment(original_tree, response_tree, curr_source, original_lines,
+                                                  segment_map.line_range(segment_index, response),
+                                                  collect=True)
             return response, identifier_diff
         except ASTComparatorError as e:
             print(f'Failed AST verification in attempt {try_index} due to {e}')
-            prior_error_message = f'Previous response\'s AST did not match with original segment: {e}.'
+            prior_error_message = f'Previous response\'s AST did not match with original segment, {e}'
             # Wait for connection to settle?
             time.sleep(0.5)
         except ValueError:
-            LLMRefactorError('Failed to refactor segment due to incorrect original position.')
+            raise LLMRefactorError('Failed to refactor segment due to incorrect original position.')
 
     raise LLMRefactorError('Failed to refactor segment in all attempts')
@@ -1,5 +1,7 @@
 import shutil
 
+import javalang
+
 import common
 from file_system_helpers import *
 from segmentation_helpers import *
@@ -39,6 +41,9 @@ if __name__ == "__main__":
     refactor_segments_directory = os.path.abspath(REFACTOR_SEGMENTS_DIRECTORY)
     # Get absolute path of log directory
     log_directory = os.path.abspath(LOG_DIR)
+    # Keep parse trees on disk, so unchanged files are not parsed again in later runs
+    if common.parse_cache_directory:
+        javalang.cache.default_cache.directory = os.path.abspath(common.parse_cache_directory)
 
     # Change directory to project directory
     os.chdir(PROJECT_DIRECTORY)
@@ -86,26 +91,30 @@ if __name__ == "__main__":
 
             print(f'-> {file_path}')
 
-            # Replace tab
+            # Open file
             try:
-                replace_tab(file_path)
+                with open(file_path, 'r') as file:
+                    file_source = file.read()
             except:
                 print("Failed to open file.")
                 continue
 
+            # Replace tab, and remove labels left by an interrupted run
+            source = strip_labels(get_tab_replaced_source(file_source))
+
             # Process Java file
             try:
-                segment_count = insert_labels(file_path)
-            except LabelExistedError:
-                remove_labels(file_path)
-                segment_count = insert_labels(file_path)
-                pass
+                segment_map = SegmentMap.from_source(source)
             except LabelError:
                 print_red("Failed to parse file.", pause=False)
                 common.logger.log_error(f'File {file_path} failed to parse, skipping...')
                 close_file()
                 continue
 
+            # IntelliJ works on the file on disk, so it has to match the segment map
+            if source != file_source:
+                segment_map.write(file_path)
+
             # Create a directory for the file
             file_name = file_path.split('/')[-1][:-5]
             file_directory = os.path.join(refactor_segments_directory, file_name)
@@ -116,7 +125,7 @@ if __name__ == "__main__":
 
             try:
                 # Iterate through each segment except the first one, as it contains only imports and package declarations
-                for segment_index in range(1, segment_count):
+                for segment_index in range(1, len(segment_map)):
                     if contains_fault():
                         print_red('Fault detected.', pause=True)
                         raise ContainsFaultError('Fault detected.')
@@ -127,15 +136,14 @@ if __name__ == "__main__":
                     print(f'Segment {segment_index}:\n')
                     print(f'Running file count: {running_file_count + 1}/{file_count} Estimated progress: [{(processed_line_count/ESTIMATED_LINE_COUNT)*100}%]')
                     # Fetch segment
-                    # Replace tab
-                    segment = fetch_segment(file_path, segment_index)
+                    segment = segment_map.segment(segment_index)
 
                     # Add to line count
                     processed_line_count += segment.count('\n') + 1
 
                     # Balance braces
                     try:
-                        balance_result = balance_source(segment)
+                        balance_result = segment_map.balance(segment_index)
                     except SubstringBalancingError:
                         continue
                     balance_type = None
@@ -153,7 +161,7 @@ if __name__ == "__main__":
                         file.write(segment)
 
                     try:
-                        refactor_result = llm_refactor(segment, balance_result, original_indentation_level, standards, file_path_index, segment_index)
+                        refactor_result = llm_refactor(segment, balance_result, original_indentation_level, standards, segment_map, segment_index)
                     except LLMRefactorError as e:
                         # Store status
                         common.logger.log_error(f'Segment {segment_index} failed LLM refactoring due to: {e}')
@@ -179,7 +187,7 @@ if __name__ == "__main__":
 
                     # Refactor changed identifiers
                     try:
-                        contains_failed_refactor = refactor_changed_identifiers(file_path_index, segment_index, refactored_segment)
+                        contains_failed_refactor = refactor_changed_identifiers(file_path_index, segment_map, segment_index, refactored_segment)
                         common.logger.set_refactor_status(file_path_index, segment_index, RefactorStatus.IJ_SUCCESS)
                     except GlobalRefactorError as e:
                         common.logger.log_error(f'Segment {segment_index} failed inteliJ refactoring due to: {e}')
@@ -195,20 +203,18 @@ if __name__ == "__main__":
                     # Replace segment
                     if not contains_failed_refactor:
                         file_path = common.file_manager.get_file_path(file_path_index)
-                        replace_segment(file_path, segment_index, refactored_segment)
+                        segment_map.replace(segment_index, refactored_segment)
+                        # Written for IntelliJ, which renames identifiers of the next segments in the file
+                        segment_map.write(file_path)
                         time.sleep(0.2)
                         reload_from_file()
 
                 # Reload file path
                 file_path = common.file_manager.get_file_path(file_path_index)
                 close_file()
-                # Remove labels
-                remove_labels(file_path)
 
             except ContainsFaultError:
                 close_file()
-                # Remove labels
-                remove_labels(file_path)
                 common.logger.log_error(f'File {file_path} contains fault, skipping...')
 
             running_file_count += 1
@@ -221,6 +227,7 @@ if __name__ == "__main__":
 
     # Write out log
     common.logger.write_out(common.file_manager.file_system_snapshot())
+    print(f'Parse cache: {javalang.cache.default_cache.info()}')
 
     # Delete 'screenshot_pic.png' file
     if os.path.exists('screenshot_pic.png'):
@@ -1,6 +1,8 @@
 import common
 import statistics
 
+import javalang
+
 from file_system_helpers import *
 from segmentation_helpers import *
 from formatting_helpers import *
@@ -25,6 +27,13 @@ if __name__ == "__main__":
 
     segment_lengths = []
 
+    # Parse the sampled files up front in parallel, only sending back their labels
+    sampled_paths = [common.file_manager.get_file_path(i) for i in range(file_count) if i % SAMPLE_RATIO == 0]
+    precomputed_labels = {}
+    for result in javalang.parse.parse_many(sampled_paths, mode=get_segmentation_labels):
+        if result.error is None:
+            precomputed_labels[sampled_paths[result.index]] = result.value[0]
+
     # Iterate through each Java file
     for file_path_index in range(len(common.file_manager)):
         if file_path_index % SAMPLE_RATIO != 0:
@@ -36,30 +45,29 @@ if __name__ == "__main__":
         with open(file_path, 'r') as f:
             source = f.read()
             line_count += source.count('\n') + 1
-            del source
 
-        # Process Java file
+        # Process Java file, without writing labels to it
+        labels = precomputed_labels.get(file_path)
+        unlabeled_source = strip_labels(source)
+        if unlabeled_source != source:
+            # The labels were computed with the labels of an interrupted run in the source
+            labels = None
         try:
-            segment_count = insert_labels(file_path)
-        except LabelExistedError:
-            remove_labels(file_path)
-            segment_count = insert_labels(file_path)
-            pass
+            segment_map = SegmentMap.from_source(unlabeled_source, labels)
         except LabelError as e:
             # print(f'Label error: {e}')
             fault_count += 1
             continue
 
         # Iterate through each segment except the first one, as it contains only imports and package declarations
-        for segment_index in range(1, segment_count):
-            # Replace tab
-            segment = fetch_segment(file_path, segment_index)
+        for segment_index in range(1, len(segment_map)):
+            segment = segment_map.segment(segment_index)
 
             segment_lengths.append(segment.count('\n') + 1)
 
             # Balance braces
             try:
-                balanced_result = balance_source(segment)
+                balanced_result = segment_map.balance(segment_index)
             except SubstringBalancingError as e:
                 fault_count += 1
                 continue
@@ -77,9 +85,6 @@ if __name__ == "__main__":
             # Restore indentation
             refactored_segment = set_indentation(segment, original_indentation_level)
 
-        # Remove labels
-        remove_labels(file_path)
-
     print(f'Under sampling ratio: {SAMPLE_RATIO}')
     print(f'Attempted file count: {attempted_file_count}')
 
@@ -1,5 +1,8 @@
+import bisect
+import re
+
 import javalang
-from formatting_helpers import is_suitable_segment_after_cut
+from formatting_helpers import BraceIndex, balance_lines
 
 
 class LabelError(Exception):
@@ -10,6 +13,11 @@ class LabelExistedError(LabelError):
     pass
 
 
+LABEL_PREFIX = '// <Label:'
+# The label of a label line, if it is well-formed
+LABEL_PATTERN = re.compile(r'// <Label: (-?\d+)>')
+
+
 def get_labels(tree) -> (set, int):
     """Get all label locations"""
 
@@ -54,127 +62,296 @@ def get_labels(tree) -> (set, int):
 
 
 def breakdown_segments(labels: set, source_lines, min_segment_length=10, target_segment_length=30) -> set:
-    """Given existing major breakpoints, break long segments down"""
-    labels = list(labels)
-    labels.sort()
-    omitted_segments = set()
-
-    # Find all segments
-    segments = [(labels[i], labels[i+1]) for i in range(len(labels)-1)]
-    segments.append((labels[-1], labels[-1] + len(source_lines)))
-    # Rule out small segments
-    segments = [i for i in segments if i[1] - i[0] > target_segment_length]
-    # Rule out omitted
-    segments = [i for i in segments if i not in omitted_segments]
-
-    def binary_breakdown(s: int, e: int) -> int:
-        # Create temporary segment
-        curr_segment = source_lines[s:e]
-        # Find possible breakpoints
-        possible_breakpoints = [i for i, line in enumerate(curr_segment) if len(line.replace(' ', '')) == 0]
-
-        # Remove neighboring breakpoints
-        temp_breakpoints = set()
-        for i in possible_breakpoints:
-            if not (i-1 in temp_breakpoints or i+1 in temp_breakpoints):
-                temp_breakpoints.add(i)
-        possible_breakpoints = list(temp_breakpoints)
-        del temp_breakpoints
-
-        # Remove short segment breakpoints
-        possible_breakpoints.sort()
-        temp_breakpoints = []
-        # Iterate each breakpoint to filter out
-        for i, bp in enumerate(possible_breakpoints):
-            # If the breakpoint causes tail segment to be too small
-            if len(curr_segment) - bp < min_segment_length:
+    """
+    Given existing major breakpoints, break long segments down
+    A long segment is cut at its first suitable breakpoint, and both parts are broken down in turn. Breakpoints and
+    brace depths are found once for the whole source.
+    """
+    labels = sorted(labels)
+    line_count = len(source_lines)
+    brace_index = BraceIndex(source_lines)
+    # Blank lines, where segments may be cut
+    blank_lines = [i for i, line in enumerate(source_lines) if len(line.replace(' ', '')) == 0]
+
+    def find_breakpoint(s: int, e: int) -> int:
+        # Of consecutive blank lines, every other one is a possible breakpoint
+        previous_blank_line = None
+        previous_breakpoint = None
+        for i in range(bisect.bisect_left(blank_lines, s), bisect.bisect_left(blank_lines, e)):
+            line = blank_lines[i]
+            if previous_blank_line is not None and previous_blank_line == line - 1:
+                previous_blank_line = None
                 continue
+            previous_blank_line = line
 
-            # Initial point
-            if len(temp_breakpoints) == 0:
-                # Check if it results in head segment to be too small
-                if bp > min_segment_length:
-                    temp_breakpoints.append(bp)
-            # Rest of the points
-            else:
-                # Check distance to previous breakpoint
-                if bp - temp_breakpoints[-1] > min_segment_length:
-                    temp_breakpoints.append(bp)
-        possible_breakpoints = temp_breakpoints
-
-        # Test
-        # for i, line in enumerate(curr_segment):
-        #     if i in possible_breakpoints:
-        #         print('<<break>>')
-        #     print(f'{i:2d} |' + line, end='')
-        #     print(line)
-        # Endtest
-
-        # Iterate breakpoints
-        for bp in possible_breakpoints:
-            # Try splitting the segment
-            seg_1 = '\n'.join(source_lines[s:s+bp])
-            if not is_suitable_segment_after_cut(seg_1):
+            # Rule out breakpoints resulting in short segments
+            if e - line < min_segment_length:
                 continue
-            seg_2 = '\n'.join(source_lines[s+bp:e])
-            if not is_suitable_segment_after_cut(seg_2):
+            if line - (s if previous_breakpoint is None else previous_breakpoint) <= min_segment_length:
                 continue
-            # At this point, balancing is correct
-            return bp + s
+            previous_breakpoint = line
+
+            # Try splitting the segment
+            if brace_index.is_suitable_segment(s, line) and brace_index.is_suitable_segment(line, e):
+                return line
         return None
 
+    # Find all segments, the last one ending a source length after its start
+    segments = [(labels[i], labels[i + 1]) for i in range(len(labels) - 1)]
+    segments.append((labels[-1], labels[-1] + line_count))
+
     while len(segments) > 0:
-        # Iterate segments to break down using binary breakdown function
-        for start, end in segments:
-            additional_label = binary_breakdown(start, end)
-            # If additional label is available, add to labels and re-calculate
-            if additional_label:
-                labels.append(additional_label)
-                labels.sort()
-                break
-            # Else, omit this segment
-            else:
-                omitted_segments.add((start, end))
-        # Re-calculate segments list
-        segments = [(labels[i], labels[i + 1]) for i in range(len(labels) - 1)]
-        segments.append((labels[-1], labels[-1] + len(source_lines)))
+        start, end = segments.pop()
         # Rule out small segments
-        segments = [i for i in segments if i[1] - i[0] > target_segment_length]
-        segments = [i for i in segments if i not in omitted_segments]
+        if end - start <= target_segment_length:
+            continue
+        additional_label = find_breakpoint(start, min(end, line_count))
+        if additional_label is None:
+            continue
+        labels.append(additional_label)
+        segments.append((start, additional_label))
+        if end - start == line_count:
+            segments.append((additional_label, additional_label + line_count))
+        else:
+            segments.append((additional_label, end))
 
     return set(labels)
 
 
-def find_label(source_lines: [str], label: int) -> int:
-    # Iterate through the source lines
-    for i, line in enumerate(source_lines):
-        # Check if the line contains the label
-        if line.startswith(f'// <Label: {label}>'):
-            # Find the start of the segment
-            return i
-    return None
+def get_segmentation_labels(tree, source: str) -> (set, int):
+    """
+    Gets the segment start lines of a parsed source and its line count
+    Can be passed as the mode of javalang.parse.parse_many, so only the labels are sent back from the workers
+    """
+    source_lines = source.split('\n')
 
+    labels, label_count = get_labels(tree)
 
-def get_segment_from_source(source: str, label: int) -> str:
-    # Split the source into lines
-    source_lines = source.split('\n')
+    if len(labels) > 0:
+        labels = breakdown_segments(labels, source_lines)
+
+    return labels, len(source_lines)
+
+
+def split_segment(segment: str, last: bool) -> [str]:
+    """
+    Splits a segment into the lines replacing a segment of a source
+    A segment replacing the last one keeps the line break at its end as an empty last line
+    """
+    if not segment.endswith('\n'):
+        segment += '\n'
+    lines = segment.split('\n')
+    if not last:
+        lines.pop()
+    return lines
 
-    # Find the start of the segment
-    start = find_label(source_lines, label)
 
-    # If the label is not found, raise an error
-    if start is None:
+class SegmentMap:
+    """
+    The segments of a source, kept as the lines they start on rather than as label comments in the source.
+    Segments are numbered as by insert_labels: segment 0 starts on the first line, segment i on the i-th segment start
+    line. Segments are fetched and replaced by slicing the lines, replacing a segment moves the ones after it, and the
+    source only has to be written out when the file on disk is needed.
+    """
+
+    def __init__(self, lines: [str], starts: [int], label_lines: [str] = None):
+        self.lines = lines
+        # The line each segment starts on, counted from 0
+        self.starts = starts
+        # The label line of each segment, if the map was read from a labeled source, and the segment of each
+        # well-formed label in it. Otherwise segment i has label i.
+        self.label_lines = label_lines
+        self.label_indices = None
+        if label_lines is not None:
+            self.label_indices = {}
+            for i, line in enumerate(label_lines):
+                match = LABEL_PATTERN.match(line)
+                if match is not None:
+                    self.label_indices.setdefault(match.group(1), i)
+        # Built when a segment is first balanced, until the lines change
+        self._brace_index = None
+
+    @classmethod
+    def from_source(cls, source: str, labels: set = None) -> 'SegmentMap':
+        """
+        Maps the segments of a source without labels.
+        :param labels: Segment start lines from get_segmentation_labels, if the source was already parsed
+        """
+        if labels is None:
+            try:
+                tree = javalang.cache.parse(source)
+            except javalang.parser.JavaSyntaxError:
+                raise LabelError('Failed to parse source')
+            except javalang.tokenizer.LexerError:
+                raise LabelError('Failed to parse source')
+
+            labels, _ = get_segmentation_labels(tree, source)
+
+        lines = source.split('\n')
+        return cls(lines, [0] + sorted(label for label in labels if 0 <= label < len(lines)))
+
+    @classmethod
+    def from_labeled_source(cls, source: str) -> 'SegmentMap':
+        """
+        Maps the segments of a source with labels, as written by insert_labels, leaving the labels out of its lines.
+        Every label line starts a segment, and segments are found by the label in it rather than by their index.
+        """
+        lines = []
+        starts = []
+        label_lines = []
+        for line in source.split('\n'):
+            if line.startswith(LABEL_PREFIX):
+                starts.append(len(lines))
+                label_lines.append(line)
+            else:
+                lines.append(line)
+        if not starts:
+            raise LabelError('No labels found in source')
+        return cls(lines, starts, label_lines)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def index(self, label: int) -> int:
+        """
+        Gets the index of the segment with a label.
+        """
+        if self.label_indices is None:
+            if 0 <= label < len(self.starts):
+                return label
+        elif str(label) in self.label_indices:
+            return self.label_indices[str(label)]
         raise LabelError(f'Label {label} not found in source')
 
-    segment = ''
+    def bounds(self, label: int) -> (int, int):
+        """
+        Gets the (start, end) lines of a segment in self.lines, with end excluded.
+        """
+        index = self.index(label)
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else len(self.lines)
+        return self.starts[index], end
+
+    def label_line(self, label: int) -> int:
+        """
+        Gets the line of a label in the labeled source, counted from 0.
+        """
+        index = self.index(label)
+        return self.starts[index] + index
+
+    @property
+    def source(self) -> str:
+        return '\n'.join(self.lines)
+
+    def segment(self, label: int) -> str:
+        """
+        Gets a segment, as get_segment_from_source does for the labeled source.
+        """
+        start, end = self.bounds(label)
+        return ''.join(line + '\n' for line in self.lines[start:end])
+
+    def replaced_lines(self, label: int, new_segment: str) -> ([str], int, int):
+        """
+        Gets the lines replacing a segment, and its (start, end) lines.
+        """
+        start, end = self.bounds(label)
+        return split_segment(new_segment, self.index(label) + 1 == len(self.starts)), start, end
+
+    def replaced_source(self, label: int, new_segment: str) -> str:
+        """
+        Gets the source with a segment replaced, as temp_replace_segment does for the labeled source, but without
+        labels.
+        """
+        new_lines, start, end = self.replaced_lines(label, new_segment)
+        return '\n'.join(self.lines[:start] + new_lines + self.lines[end:])
+
+    def replace(self, label: int, new_segment: str):
+        """
+        Replaces a segment, moving the segments after it.
+        """
+        new_lines, start, end = self.replaced_lines(label, new_segment)
+        self.lines[start:end] = new_lines
+        self._brace_index = None
+        shift = len(new_lines) - (end - start)
+        for i in range(self.index(label) + 1, len(self.starts)):
+            self.starts[i] += shift
+
+    def line_range(self, label: int, new_segment: str = None) -> (int, int):
+        """
+        Gets the (first, end) lines of a segment in self.source, counted from 1 with end excluded, as used by
+        ast_comparator.compare_ast_segment.
+        :param new_segment: If given, the range of the segment in the source returned by replaced_source
+        """
+        start, end = self.bounds(label)
+        if new_segment is not None:
+            if not new_segment.endswith('\n'):
+                new_segment += '\n'
+            return start + 1, start + 1 + new_segment.count('\n')
+        return start + 1, end + 1
+
+    @property
+    def brace_index(self) -> BraceIndex:
+        if self._brace_index is None:
+            self._brace_index = BraceIndex(self.lines)
+        return self._brace_index
+
+    def balance(self, label: int) -> (int, int, str):
+        """
+        Balances a segment, as formatting_helpers.balance_source does, from the brace depths of the whole source.
+        """
+        start, end = self.bounds(label)
+        return balance_lines(self.brace_index, start, end, self.segment(label))
+
+    def update(self, source: str):
+        """
+        Takes over a source that was changed outside of the map without adding or removing lines, such as by renaming
+        identifiers in the IDE.
+        """
+        lines = source.split('\n')
+        if len(lines) != len(self.lines):
+            raise LabelError(f'Source has {len(lines)} lines instead of {len(self.lines)}, segments are lost')
+        if lines != self.lines:
+            self.lines = lines
+            self._brace_index = None
+
+    def labeled_source(self) -> str:
+        """
+        Gets the source with a label comment at the start of each segment, as written by insert_labels, or with the
+        label lines it was read from.
+        """
+        result_lines = self.lines[:self.starts[0]]
+        ends = self.starts[1:] + [len(self.lines)]
+        for index, (start, end) in enumerate(zip(self.starts, ends)):
+            result_lines.append(self.label_lines[index] if self.label_lines is not None else f'// <Label: {index}>')
+            result_lines += self.lines[start:end]
+        return '\n'.join(result_lines)
+
+    def write(self, source_path: str, labels=False):
+        """
+        Writes the source to a file, with label comments if labels is set.
+        """
+        with open(source_path, 'w') as f:
+            f.write(self.labeled_source() if labels else self.source)
+
+
+def strip_labels(source: str) -> str:
+    """
+    Removes label comments from a source
+    """
+    return '\n'.join(line for line in source.split('\n') if not line.startswith(LABEL_PREFIX))
+
+
+def find_label(source_lines: [str], label: int) -> int:
+    """
+    Finds the line of a label, or None
+    """
+    try:
+        return SegmentMap.from_labeled_source('\n'.join(source_lines)).label_line(label)
+    except LabelError:
+        return None
 
-    # Find the end of the segment
-    for i, line in enumerate(source_lines[start + 1:]):
-        if line.startswith('// <Label:'):
-            break
-        segment += line + '\n'
 
-    return segment
+def get_segment_from_source(source: str, label: int) -> str:
+    return SegmentMap.from_labeled_source(source).segment(label)
 
 
 def fetch_segment(source_path: str, label: int) -> str:
@@ -186,11 +363,12 @@ def fetch_segment(source_path: str, label: int) -> str:
     return get_segment_from_source(source, label)
 
 
-def insert_labels(source_path: str) -> int:
+def insert_labels(source_path: str, labels: set = None) -> int:
     """
     Inserts labels to divide source into segments
     Labels are zero-indexed, each label indicates the start of a segment with corresponding index
     Label ends are indicated by either the next label or the end of the file
+    :param labels: Segment start lines from get_segmentation_labels, if the source was already parsed
     :return: The number of labels inserted
     """
 
@@ -202,79 +380,24 @@ def insert_labels(source_path: str) -> int:
 
     # Check for existing labels
     for line in source_lines:
-        if line.startswith('// <Label:'):
+        if line.startswith(LABEL_PREFIX):
             raise LabelExistedError('Labels already exist in the source file')
 
-    # Parse the source file
-    try:
-        tree = javalang.parse.parse(source)
-    except javalang.parser.JavaSyntaxError:
-        raise LabelError('Failed to parse source')
-    except javalang.tokenizer.LexerError:
-        raise LabelError('Failed to parse source')
-
-    labels, label_count = get_labels(tree)
-
-    if len(labels) > 0:
-        labels = breakdown_segments(labels, source_lines)
-
-    line_count = len(source_lines)
-
-    result_source = '// <Label: 0>\n'
-    label_count = 1
-    # Iterate through the source lines
-    for i, line in enumerate(source_lines):
-        # Add a label if the line number is in the labels list
-        if i in labels:
-            result_source += f'// <Label: {label_count}>\n'
-            label_count += 1
-        result_source += line
-        if i != line_count - 1:
-            result_source += '\n'
+    segment_map = SegmentMap.from_source(source, labels)
 
     # Write the result to the source file
-    with open(source_path, 'w') as f:
-        f.write(result_source)
+    segment_map.write(source_path, labels=True)
 
-    return label_count
+    return len(segment_map)
 
 
 def temp_replace_segment(source: str, label: int, new_segment: str) -> str:
     """
     Replaces a segment in the source, and returns the result.
     """
-    # Split the source into lines
-    source_lines = source.split('\n')
-
-    # Find the start of the segment
-    start = find_label(source_lines, label)
-
-    # If the label is not found, raise an error
-    if start is None:
-        raise LabelError(f'Label {label} not found in source')
-
-    # Add previous lines to the result source
-    result_source = '\n'.join(source_lines[:start + 1]) + '\n'
-
-    # Add the new segment to the result source
-    result_source += new_segment
-
-    # Add an extra new line if the new segment does not end with a new line
-    if not new_segment.endswith('\n'):
-        result_source += '\n'
-
-    # Find the end of the segment
-    dist_to_next_label = None
-    for i, line in enumerate(source_lines[start + 1:]):
-        if line.startswith('// <Label:'):
-            dist_to_next_label = i + 1
-            break
-
-    # If end is not none, add the rest of the lines to the result source
-    if dist_to_next_label is not None:
-        result_source += '\n'.join(source_lines[start + dist_to_next_label:])
-
-    return result_source
+    segment_map = SegmentMap.from_labeled_source(source)
+    segment_map.replace(label, new_segment)
+    return segment_map.labeled_source()
 
 
 def replace_segment(source_path: str, label: int, new_segment: str):
@@ -285,11 +408,11 @@ def replace_segment(source_path: str, label: int, new_segment: str):
     source = open(source_path, 'r').read()
 
     # Replace the segment
-    result_source = temp_replace_segment(source, label, new_segment)
+    segment_map = SegmentMap.from_labeled_source(source)
+    segment_map.replace(label, new_segment)
 
     # Write the result to the source file
-    with open(source_path, 'w') as f:
-        f.write(result_source)
+    segment_map.write(source_path, labels=True)
 
 
 def remove_labels(source_path: str):
@@ -298,11 +421,7 @@ def remove_labels(source_path: str):
     """
     # Open the source file
     source = open(source_path, 'r').read()
-    # Split the source into lines
-    source_lines = source.split('\n')
-    # Filter out the lines that do not contain labels
-    source_lines = [line for line in source_lines if not line.startswith('// <Label:')]
 
     # Write the result to the source file
     with open(source_path, 'w') as f:
-        f.write('\n'.join(source_lines))
+        f.write(strip_labels(source))
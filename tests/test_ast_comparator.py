@@ -0,0 +1,173 @@
+import unittest
+
+import javalang
+from ast_comparator import ASTComparatorError, compare_ast, compare_ast_segment, compare_tokens
+
+SOURCE = '\n'.join(['class A {',
+                    '    void m() {',
+                    '        a();',
+                    '    }',
+                    '',
+                    '    void n() {',
+                    '        b();',
+                    '        c(1);',
+                    '    }',
+                    '}'])
+
+
+def replace_lines(source: str, start: int, end: int, segment: str) -> str:
+    """ Replaces lines start to end of a source, counted from 1 with end excluded """
+    lines = source.split('\n')
+    return '\n'.join(lines[:start - 1] + segment.split('\n') + lines[end - 1:])
+
+
+def names(identifier_diffs) -> list:
+    return [(diff.name_1, diff.name_2, diff.original_line, diff.original_index) for diff in identifier_diffs]
+
+
+class CompareASTSegmentTest(unittest.TestCase):
+
+    """ Contains tests for comparing the trees of sources differing in one segment. """
+
+    def compare(self, source_2, lines_1, lines_2, **kwargs):
+        return compare_ast_segment(javalang.parse.parse(SOURCE), javalang.parse.parse(source_2), SOURCE,
+                                   lines_1, lines_2, **kwargs)
+
+    def test_mid_method(self):
+        """ tests a segment starting and ending inside a method. """
+        source_2 = replace_lines(SOURCE, 7, 8, '        d();')
+        self.assertEqual(names(self.compare(source_2, (7, 8), (7, 8))), [('b', 'd', 7, 9)])
+        self.assertEqual(names(compare_ast(javalang.parse.parse(SOURCE), javalang.parse.parse(source_2), SOURCE)),
+                         [('b', 'd', 7, 9)])
+
+        # Identifiers of subtrees outside of the segment are not reported
+        self.assertEqual(names(self.compare(source_2, (7, 8), (7, 8), system_testing=True)),
+                         [('A', 'A', 1, 7), ('n', 'n', 6, 10), ('b', 'd', 7, 9), ('c', 'c', 8, 9)])
+
+    def test_line_count_change(self):
+        """ tests that nodes after a segment with a different number of lines are shifted. """
+        source_2 = replace_lines(SOURCE, 3, 4, '        e(\n        );')
+        self.assertEqual(names(self.compare(source_2, (3, 4), (3, 5))), [('a', 'e', 3, 9)])
+
+        # Ends that do not account for the change
+        with self.assertRaises(ASTComparatorError):
+            self.compare(source_2, (3, 4), (3, 4))
+
+    def test_taken_from_next_sibling(self):
+        """ tests a segment taking in code from the method after it. """
+        source_2 = replace_lines(SOURCE, 4, 8, '        b();\n    }\n\n    void n() {')
+        with self.assertRaises(ASTComparatorError):
+            self.compare(source_2, (4, 8), (4, 8))
+
+        with self.assertRaises(ASTComparatorError) as context:
+            self.compare(source_2, (4, 8), (4, 8), collect=True)
+        self.assertEqual(len(context.exception.mismatches), 6)
+        self.assertIn('MethodDeclaration child counts are not equivalent: 1 != 2',
+                      context.exception.mismatches[0].description)
+
+    def test_mismatch_outside(self):
+        """ tests changes outside of the segment. """
+        # A node type changed after the segment
+        source_2 = replace_lines(SOURCE, 7, 9, '        b();\n        int c = 1;')
+        with self.assertRaises(ASTComparatorError) as context:
+            self.compare(source_2, (3, 4), (3, 4), collect=True)
+        self.assertEqual(len(context.exception.mismatches), 1)
+        self.assertIn('Nodes outside of the segment are not equivalent',
+                      context.exception.mismatches[0].description)
+
+        # A node moved before the segment
+        source_2 = replace_lines(SOURCE, 2, 3, '    void  m() {')
+        with self.assertRaises(ASTComparatorError):
+            self.compare(source_2, (7, 8), (7, 8))
+
+        # Only the shape of subtrees outside of the segment is compared
+        source_2 = replace_lines(SOURCE, 8, 9, '        c(2);')
+        self.assertEqual(self.compare(source_2, (3, 4), (3, 4)), [])
+
+
+class CollectTest(unittest.TestCase):
+
+    """ Contains tests for collecting every mismatch of a comparison. """
+
+    def test_same_verdict(self):
+        """ tests that deleting the last statement of a method is rejected with and without collect. """
+        tree_1 = javalang.parse.parse(SOURCE)
+        tree_2 = javalang.parse.parse(replace_lines(SOURCE, 8, 9, ''))
+        for collect in (False, True):
+            with self.assertRaises(ASTComparatorError):
+                compare_ast(tree_1, tree_2, SOURCE, collect=collect)
+            with self.assertRaises(ASTComparatorError):
+                compare_ast(tree_2, tree_1, SOURCE, collect=collect)
+
+    def test_missing_position(self):
+        """ tests that a renamed node without a position does not discard the other mismatches. """
+        tree_1 = javalang.parse.parse(SOURCE)
+        tree_2 = javalang.parse.parse(SOURCE.replace('b();', 'd();').replace('c(1)', 'c(2)'))
+        invocation = tree_1.types[0].methods[1].body[0].expression
+        invocation._position = None
+
+        with self.assertRaises(ValueError):
+            compare_ast_segment(tree_1, tree_2, SOURCE, (7, 9), (7, 9))
+
+        with self.assertRaises(ASTComparatorError) as context:
+            compare_ast_segment(tree_1, tree_2, SOURCE, (7, 9), (7, 9), collect=True)
+        descriptions = [mismatch.description for mismatch in context.exception.mismatches]
+        self.assertEqual(len(descriptions), 2)
+        self.assertIn('Node position is not defined', descriptions[0])
+        self.assertIn('Literal values are not equivalent', descriptions[1])
+
+
+class CompareTokensTest(unittest.TestCase):
+
+    """ Contains tests for checking the tokens of a segment. """
+
+    def test_renames(self):
+        """ tests that renamed identifiers are aligned and positioned in the source. """
+        identifier_diffs = compare_tokens('int a = b;\nf(a);', 'int c =\n    b;\nf( c );', first_line=5)
+        self.assertEqual(names(identifier_diffs), [('a', 'c', 5, 5), ('a', 'c', 6, 3)])
+        self.assertEqual(compare_tokens('int a = b;', 'int  a=b;  // same'), [])
+
+    def test_package(self):
+        """ tests that package names are not identifiers to rename. """
+        self.assertEqual(names(compare_tokens('package a.b;\nimport c.d;', 'package a.b;\nimport c.e;')),
+                         [('d', 'e', 2, 10)])
+        with self.assertRaises(ASTComparatorError):
+            compare_tokens('package a.b;', 'package a.c;')
+
+    def test_modifier_order(self):
+        """ tests that modifiers may be reordered, as compare_ast compares them as sets. """
+        self.assertEqual(names(compare_tokens('static public int x;', 'public static int y;')), [('x', 'y', 1, 19)])
+        self.assertEqual(compare_tokens('@A public final\nint x;', '@A final public int x;'), [])
+        with self.assertRaises(ASTComparatorError):
+            compare_tokens('public @A static int x;', 'static @A public int x;')
+
+        source_1 = 'class A { static public int x; }'
+        source_2 = 'class A { public static int y; }'
+        self.assertEqual(names(compare_ast(javalang.parse.parse(source_1), javalang.parse.parse(source_2), source_1)),
+                         [('x', 'y', 1, 29)])
+
+    def test_changed(self):
+        for segment in ('int a = 2;', 'long a = 1;', 'int a = 1; int b;', 'int a;', 'int a = (1);'):
+            with self.assertRaises(ASTComparatorError):
+                compare_tokens('int a = 1;', segment)
+
+    def test_collect(self):
+        """ tests that every difference is reported with its position. """
+        with self.assertRaises(ASTComparatorError) as context:
+            compare_tokens('int a = 1;\nf(a);\ng();', 'int b = 2;\nf(b, 3);', first_line=10, collect=True)
+        self.assertEqual([mismatch.description for mismatch in context.exception.mismatches],
+                         ['"1" was changed to "2" @ Position(line=10, column=9)',
+                          '", 3" was added @ Position(line=11, column=4) of the response',
+                          '"g ( ) ;" is missing @ Position(line=12, column=1)'])
+        self.assertEqual(str(context.exception).split('\n')[0], '3 structural mismatches:')
+
+    def test_lexer_error(self):
+        with self.assertRaises(javalang.tokenizer.LexerError):
+            compare_tokens('int a = 1;', 'int a = 1 #;')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import unittest
+
+from formatting_helpers import BalanceType, BraceIndex, SubstringBalancingError, balance_lines, balance_source, \
+    find_first_unbalanced_closing_brace, is_suitable_segment_after_cut
+
+
+class BalanceSourceTest(unittest.TestCase):
+
+    """ Contains tests for balancing segments. """
+
+    def test_balanced(self):
+        self.assertIsNone(balance_source('void m() {\n    f();\n}\n'))
+
+    def test_unclosed(self):
+        self.assertEqual(balance_source('class A {\n    void m() {\n'),
+                         (BalanceType.UNCLOSED, 2, 'class A {\n    void m() {\n}}'))
+
+    def test_uninitiated(self):
+        segment = '        f();\n    }\n}\n'
+        self.assertEqual(balance_source(segment), (BalanceType.UNINITIATED, 2, '        f();\n    '))
+        self.assertEqual(find_first_unbalanced_closing_brace(segment), 17)
+
+    def test_format_error(self):
+        with self.assertRaises(SubstringBalancingError):
+            balance_source('}\nvoid m() {\n')
+
+    def test_skipped_braces(self):
+        """ tests that braces in comments and literals are not counted. """
+        for segment in ('String s = "{";\n',
+                        'String s = "\\"}";\n',
+                        "char c = '{';\n",
+                        "char c = '\\'';\n",
+                        'f(); // }\n',
+                        '/* { */ f();\n',
+                        '/**\n * {@link A}\n */\n',
+                        'String s = """\n    }\n    """;\n'):
+            self.assertIsNone(balance_source(segment), segment)
+
+        self.assertEqual(balance_source('void m() { // }\n'),
+                         (BalanceType.UNCLOSED, 1, 'void m() { // }\n}'))
+
+    def test_suitable_after_cut(self):
+        self.assertTrue(is_suitable_segment_after_cut('void m() {\n    f();'))
+        self.assertTrue(is_suitable_segment_after_cut('    f();\n}\n'))
+        self.assertTrue(is_suitable_segment_after_cut('    f("}");\n'))
+        self.assertFalse(is_suitable_segment_after_cut('    f();\n}\ng();\n'))
+        self.assertFalse(is_suitable_segment_after_cut('}\nvoid m() {\n'))
+
+
+class BraceIndexTest(unittest.TestCase):
+
+    """ Contains tests for balancing ranges of lines. """
+
+    LINES = ['class A {',
+             '    String s = "}";',
+             '    void m() {',
+             '        /* {',
+             '        } */',
+             '    }',
+             '}']
+
+    def setUp(self):
+        self.brace_index = BraceIndex(self.LINES)
+
+    def test_ranges(self):
+        self.assertIsNone(self.brace_index.balance(0, 7))
+        self.assertEqual(self.brace_index.balance(0, 3), (BalanceType.UNCLOSED, 2))
+        self.assertEqual(self.brace_index.balance(3, 7), (BalanceType.UNINITIATED, 2))
+        self.assertEqual(self.brace_index.first_unbalanced_closing_brace(3, 7), (5, 4))
+        self.assertIsNone(self.brace_index.balance(1, 2))
+
+    def test_context(self):
+        """ tests that a range starting inside a comment skips the rest of it. """
+        self.assertEqual(self.brace_index.balance(4, 7), (BalanceType.UNINITIATED, 2))
+        self.assertTrue(self.brace_index.is_suitable_segment(4, 7))
+
+    def test_suitable(self):
+        # The brace in the string does not end the class
+        self.assertTrue(self.brace_index.is_suitable_segment(1, 7))
+        self.assertFalse(BraceIndex(self.LINES + ['f();']).is_suitable_segment(5, 8))
+
+    def test_balance_lines(self):
+        segment = ''.join(line + '\n' for line in self.LINES[3:7])
+        self.assertEqual(balance_lines(self.brace_index, 3, 7, segment),
+                         (BalanceType.UNINITIATED, 2, '        /* {\n        } */\n    '))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import unittest
+
+from formatting_helpers import BalanceType
+from segmentation_helpers import LabelError, SegmentMap, breakdown_segments, find_label, get_segment_from_source, \
+    temp_replace_segment
+
+
+def field_block(value, count=15):
+    """ Lines of fields initialized to a string, with a blank line after every third """
+    lines = []
+    for i in range(count):
+        lines.append(f'    String s{i} = "{value}";')
+        if i % 3 == 2:
+            lines.append('')
+    return lines
+
+
+class BreakdownSegmentsTest(unittest.TestCase):
+
+    """ Contains tests for breaking long segments down. """
+
+    def test_braces_in_strings(self):
+        """ tests that braces in strings do not keep a segment from being cut. """
+        lines = ['class A {'] + field_block('x', 30) + ['}']
+        labels = breakdown_segments({0}, lines)
+        self.assertGreater(len(labels), 1)
+
+        for value in ('}', '{', '\\"}'):
+            lines = ['class A {'] + field_block(value, 30) + ['}']
+            self.assertEqual(breakdown_segments({0}, lines), labels, value)
+
+
+class SegmentMapBalanceTest(unittest.TestCase):
+
+    """ Contains tests for balancing the segments of a source. """
+
+    SOURCE = '\n'.join(['class A {',
+                        '    String s = "{";',
+                        '    void m() {',
+                        '        f(\'}\');',
+                        '    }',
+                        '}'])
+
+    def test_balance(self):
+        segment_map = SegmentMap.from_source(self.SOURCE, {2})
+        self.assertEqual(segment_map.balance(0),
+                         (BalanceType.UNCLOSED, 1, 'class A {\n    String s = "{";\n}'))
+        self.assertEqual(segment_map.balance(1),
+                         (BalanceType.UNINITIATED, 1, '    void m() {\n        f(\'}\');\n    }\n'))
+
+    def test_replaced(self):
+        """ tests that segments are balanced from the current lines. """
+        segment_map = SegmentMap.from_source(self.SOURCE, {2})
+        segment_map.balance(1)
+        segment_map.replace(1, '    void m() {\n    }\n    void n() {}\n}\n')
+        self.assertEqual(segment_map.balance(1),
+                         (BalanceType.UNINITIATED, 1, '    void m() {\n    }\n    void n() {}\n'))
+        segment_map.replace(0, 'class A {\n')
+        self.assertEqual(segment_map.balance(0), (BalanceType.UNCLOSED, 1, 'class A {\n}'))
+
+
+class LabeledSourceTest(unittest.TestCase):
+
+    """ Contains tests for the functions on labeled sources. """
+
+    SOURCE = '\n'.join(['// <Label: 0>',
+                        'class A {',
+                        '// <Label: 2>',
+                        '    int x;',
+                        '// <Label: 1>',
+                        '    int y;',
+                        '}'])
+
+    def test_segments(self):
+        """ tests that segments are found by their label rather than their order. """
+        self.assertEqual(get_segment_from_source(self.SOURCE, 1), '    int y;\n}\n')
+        self.assertEqual(get_segment_from_source(self.SOURCE, 2), '    int x;\n')
+        self.assertEqual(find_label(self.SOURCE.split('\n'), 1), 4)
+        self.assertIsNone(find_label(self.SOURCE.split('\n'), 3))
+        with self.assertRaises(LabelError):
+            get_segment_from_source(self.SOURCE, 3)
+
+    def test_replace(self):
+        """ tests that replacing a segment keeps the labels in place. """
+        segment_map = SegmentMap.from_labeled_source(self.SOURCE)
+        self.assertEqual(segment_map.labeled_source(), self.SOURCE)
+
+        replaced = temp_replace_segment(self.SOURCE, 2, '    int x;\n    int z;')
+        self.assertEqual(replaced, self.SOURCE.replace('int x;', 'int x;\n    int z;'))
+        self.assertEqual(get_segment_from_source(replaced, 1), '    int y;\n}\n')
+
+        # The last segment keeps the line break at its end
+        self.assertEqual(temp_replace_segment(self.SOURCE, 1, '}'),
+                         self.SOURCE[:self.SOURCE.index('    int y;')] + '}\n')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()